@@ -1,6 +1,6 @@
+import os
 import re
 import sys
-import json
 import base64
 import hashlib
 import subprocess
@@ -15,7 +15,22 @@ import streamlit as st
 import pandas as pd
 from docx import Document
 
-from src.llm.llm_client import generate_response
+from src.llm.explain_with_llm import (
+    MAX_JD_CHARS,
+    NUM_PREDICT,
+    TEMPERATURE,
+    TIMEOUT_SEC,
+    build_prompt,
+    cache_key,
+    candidate_text,
+    make_item,
+    open_excerpts,
+)
+from src.llm.llm_client import LLM_CONCURRENCY, stream_response
+from src.llm.prompt_cache import PromptCache
+from src.ranking.incremental import jd_hash
+from src.skills.matcher import SkillMatcher, load_dictionary
+from src.store.results_db import PAGE_SIZE, RESULTS_DB, ResultsDB
 from src.ui.config import APP_NAME, LOGO_PATH, OLLAMA_BASE_URL, OLLAMA_MODEL, TAGLINE
 from src.ui.theme import apply_theme
 
@@ -26,11 +41,15 @@ CVS_DIR = DATA_DIR / "samples" / "cvs"
 JD_DIR = DATA_DIR / "samples" / "jd"
 JD_HISTORY_DIR = JD_DIR / "history"
 JD_FILE = JD_DIR / "job.txt"
+MUST_HAVE_FILE = DATA_DIR / "samples" / "must_have.txt"
 
 OUT_DIR = DATA_DIR / "outputs"
 EXTRACTED_DIR = OUT_DIR / "extracted_text"
 CHUNKS_DIR = OUT_DIR / "chunks"
 RANKING_DIR = OUT_DIR / "ranking"
+SKILLS_DIR = OUT_DIR / "skills"
+DEDUPE_DIR = OUT_DIR / "dedupe"
+RESULTS_DB_PATH = REPO_ROOT / RESULTS_DB
 
 VECTORSTORE_DIR = DATA_DIR / "vectorstore"
 
@@ -84,6 +103,15 @@ def write_jd(text: str):
     JD_FILE.write_text(text.strip() + "\n", encoding="utf-8")
 
 
+def write_must_have(text: str) -> list[str]:
+    items = [t.strip() for t in re.split(r"[,;\n\u060C\u061B]", text or "") if t.strip()]
+    matcher = SkillMatcher(load_dictionary()) if items else None
+    unknown = [t for t in items if matcher.resolve(t) is None]
+    items = [t for t in items if t not in unknown]
+    MUST_HAVE_FILE.write_text("\n".join(items) + ("\n" if items else ""), encoding="utf-8")
+    return unknown
+
+
 def save_jd_version(text: str):
     JD_HISTORY_DIR.mkdir(parents=True, exist_ok=True)
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -112,9 +140,20 @@ def clear_outputs_fresh_run():
     errors = []
 
     _clear_dir_files(EXTRACTED_DIR, "*.txt", errors)
+    _clear_dir_files(EXTRACTED_DIR, "_manifest.json", errors)
     _clear_dir_files(CHUNKS_DIR, "*.txt", errors)
+    _clear_dir_files(CHUNKS_DIR, "*.jsonl", errors)
+    _clear_dir_files(CHUNKS_DIR, "*.json", errors)
     _clear_dir_files(RANKING_DIR, "*.csv", errors)
     _clear_dir_files(RANKING_DIR, "*.json", errors)
+    _clear_dir_files(RANKING_DIR / "batch", "*.csv", errors)
+    _clear_dir_files(RANKING_DIR / "batch", "*.json", errors)
+    _clear_dir_files(SKILLS_DIR, "*.json", errors)
+    _clear_dir_files(SKILLS_DIR, "*.npy", errors)
+    _clear_dir_files(DEDUPE_DIR, "*.json", errors)
+    _clear_dir_files(DEDUPE_DIR, "*.npy", errors)
+    for suffix in ["", "-wal", "-shm"]:
+        _try_unlink(RESULTS_DB_PATH.with_name(RESULTS_DB_PATH.name + suffix), errors)
 
     try:
         if VECTORSTORE_DIR.exists():
@@ -129,10 +168,11 @@ def clear_outputs_fresh_run():
     return errors
 
 
-def run_cmd(cmd_list, cwd: Path):
+def run_cmd(cmd_list, cwd: Path, env: dict | None = None):
     proc = subprocess.Popen(
         cmd_list,
         cwd=str(cwd),
+        env=env,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
         text=True,
@@ -149,13 +189,54 @@ def run_cmd(cmd_list, cwd: Path):
         raise RuntimeError(f"Command failed ({proc.returncode}): {' '.join(cmd_list)}")
 
 
-def load_json_any(path: Path):
-    if not path.exists():
-        return None
-    try:
-        return json.loads(path.read_text(encoding="utf-8", errors="replace"))
-    except Exception:
-        return None
+def stream_stats_caption(stats: dict) -> str:
+    return (
+        f"first token after {stats.get('ttft_sec') or '-'}s, prompt eval {stats.get('prompt_tokens') or '-'} tokens "
+        f"in {stats.get('prompt_eval_sec') or '-'}s, {stats.get('tokens') or 0} tokens, "
+        f"{stats.get('tokens_per_sec') or '-'} tokens/s, {stats.get('took_sec') or '-'}s total"
+    )
+
+
+def stream_explanation(db: ResultsDB, run: dict, row: dict):
+    jd_text = JD_FILE.read_text(encoding="utf-8", errors="replace").strip() if JD_FILE.exists() else ""
+    if jd_hash(jd_text) != run["jd_hash"]:
+        st.warning("The job description changed since this ranking. Run the pipeline again.")
+        return
+    source = row["cv_source"]
+    score = float(row.get("score") or 0.0)
+    cv_name = source.replace("_chunks", "")
+    cv_text = candidate_text(source, open_excerpts(jd_text))
+    if not cv_text:
+        st.warning(f"No extracted text for {cv_name}")
+        return
+
+    prompt = build_prompt(jd_text[:MAX_JD_CHARS], cv_text, score, cv_name)
+    key = cache_key(prompt)
+    with PromptCache() as cache:
+        hit = cache.get(key)
+        if hit is not None:
+            db.upsert_explanation(run["jd_hash"], make_item(source, score, run["run_id"], hit["response"], hit, key))
+            st.write(hit["response"])
+            st.caption("From prompt cache")
+            return
+
+        stats = {}
+        stream = stream_response(
+            prompt,
+            model=OLLAMA_MODEL,
+            timeout_sec=TIMEOUT_SEC,
+            num_predict=NUM_PREDICT,
+            temperature=TEMPERATURE,
+            stats=stats,
+        )
+        text = st.write_stream(stream)
+        item = make_item(source, score, run["run_id"], text if isinstance(text, str) else "", stats, key)
+        db.upsert_explanation(run["jd_hash"], item)
+        if item["status"] == "ok":
+            cache.put(key, OLLAMA_MODEL, item["llm_analysis"], stats)
+        else:
+            st.warning(item["error"])
+    st.caption(stream_stats_caption(stats))
 
 
 def inject_logo_as_data_url():
@@ -169,28 +250,10 @@ def inject_logo_as_data_url():
     return f"data:image/{mime};base64,{b64}"
 
 
-def find_latest(pattern: str, base: Path) -> Path | None:
-    files = list(base.rglob(pattern))
-    if not files:
-        return None
-    files.sort(key=lambda p: p.stat().st_mtime, reverse=True)
-    return files[0]
-
-
-def normalize_explanations(data):
-    if data is None:
-        return []
-    if isinstance(data, list):
-        return [x for x in data if isinstance(x, dict)]
-    if isinstance(data, dict):
-        out = []
-        for k, v in data.items():
-            if isinstance(v, dict):
-                vv = dict(v)
-                vv.setdefault("cv_source", k)
-                out.append(vv)
-        return out
-    return []
+def ranking_csv_bytes(db: ResultsDB, run_id: str) -> bytes:
+    buf = io.StringIO()
+    db.write_ranking_csv(run_id, buf)
+    return buf.getvalue().encode("utf-8-sig")
 
 
 def split_bullets(text: str):
@@ -340,6 +403,13 @@ def render_llm_item(item: dict):
     meta_cols[1].write(f"status: {status}" if status else "status: -")
     meta_cols[2].write(f"took_sec: {took}" if took is not None else "took_sec: -")
     meta_cols[3].write(f"error: {err}" if err else "error: -")
+    if item.get("ttft_sec") is not None:
+        st.caption(
+            f"first token after {item['ttft_sec']}s, prompt eval {item.get('prompt_tokens') or '-'} tokens "
+            f"in {item.get('prompt_eval_sec') or '-'}s, {item.get('tokens_per_sec') or '-'} tokens/s"
+        )
+    if status == "timeout" and (analysis or "").strip():
+        st.warning("Timed out: partial output")
 
     parsed = parse_llm_analysis(analysis) if (analysis or "").strip() else None
 
@@ -478,6 +548,12 @@ with tabs[0]:
     uploaded_cvs = st.file_uploader("Upload CV files (PDF/DOCX)", type=["pdf", "docx"], accept_multiple_files=True)
     existing_jd = JD_FILE.read_text(encoding="utf-8", errors="replace") if JD_FILE.exists() else ""
     jd_text = st.text_area("Paste Job Description", height=220, value=existing_jd)
+    existing_must = MUST_HAVE_FILE.read_text(encoding="utf-8", errors="replace") if MUST_HAVE_FILE.exists() else ""
+    must_have_text = st.text_input(
+        "Must-have skills (comma separated, optional)",
+        value=", ".join(t for t in existing_must.splitlines() if t.strip()),
+        help="CVs missing any of these skills are skipped before ranking and LLM analysis.",
+    )
 
     c1, c2, c3, c4 = st.columns([1, 1, 1, 1])
     with c1:
@@ -516,8 +592,11 @@ with tabs[0]:
             st.error("Job Description is empty")
         else:
             write_jd(jd_text)
+            unknown_skills = write_must_have(must_have_text)
             saved = save_uploaded_cvs(uploaded_cvs) if uploaded_cvs else []
             st.success("Inputs saved")
+            if unknown_skills:
+                st.warning("Ignored unknown must-have skills: " + ", ".join(unknown_skills))
             st.write("Saved JD:", str(JD_FILE))
             if saved:
                 st.write("Saved CVs:")
@@ -545,6 +624,19 @@ with tabs[1]:
     st.subheader("Run Screening")
 
     run_btn = st.button("Run Pipeline", type="primary")
+    full_rebuild = st.checkbox(
+        "Rebuild vector index from scratch",
+        value=False,
+        help="By default only new or changed CV chunks are indexed.",
+    )
+    llm_concurrency = st.number_input(
+        "Parallel LLM requests",
+        min_value=1,
+        max_value=16,
+        value=min(LLM_CONCURRENCY, 16),
+        step=1,
+        help="Match OLLAMA_NUM_PARALLEL on the Ollama server; extra requests only queue there.",
+    )
 
     jd_ok = JD_FILE.exists() and JD_FILE.read_text(encoding="utf-8", errors="replace").strip() != ""
     cv_ok = any(CVS_DIR.glob("*.pdf")) or any(CVS_DIR.glob("*.docx"))
@@ -564,12 +656,15 @@ with tabs[1]:
         steps = [
             [sys.executable, "src/01_ingest/extract_text.py"],
             [sys.executable, "src/02_preprocessing/chunk_text.py"],
-            [sys.executable, "src/04_vectorstore/reset_vectorstore.py"],
+            [sys.executable, "src/06_skills/extract_skills.py"],
             [sys.executable, "src/03_embeddings/embed_and_store.py"],
             [sys.executable, "src/07_ranking/rank_cvs.py"],
             [sys.executable, "-m", "src.llm.explain_with_llm"],
         ]
+        if full_rebuild:
+            steps.insert(2, [sys.executable, "src/04_vectorstore/reset_vectorstore.py"])
 
+        env = {**os.environ, "LLM_CONCURRENCY": str(int(llm_concurrency))}
         log_box = st.empty()
         logs = ""
         prog = st.progress(0)
@@ -577,7 +672,7 @@ with tabs[1]:
         try:
             for i, cmd in enumerate(steps, start=1):
                 st.write(f"Step {i}/{len(steps)}: {' '.join(cmd)}")
-                for line in run_cmd(cmd, cwd=REPO_ROOT):
+                for line in run_cmd(cmd, cwd=REPO_ROOT, env=env):
                     logs += line
                     log_box.code(logs[-5000:])
                 prog.progress(int(i / len(steps) * 100))
@@ -593,34 +688,67 @@ with tabs[1]:
 with tabs[2]:
     st.subheader("Results")
 
-    latest_csv = find_latest("ranking_results*.csv", RANKING_DIR)
-    if latest_csv and latest_csv.exists():
-        try:
-            df = pd.read_csv(latest_csv)
-            st.write(str(latest_csv))
-            st.dataframe(df, use_container_width=True)
-        except Exception as e:
-            st.error(f"Failed to read ranking CSV: {e}")
+    db = ResultsDB(RESULTS_DB_PATH)
+    run = db.latest_run(JD_FILE.stem) or db.latest_run()
+    if run is None:
+        st.info("No ranking run found")
     else:
-        st.info("No ranking CSV found")
-
-    st.divider()
+        run_id = run["run_id"]
+        total = db.ranking_count(run_id)
+        pages = max(1, -(-total // PAGE_SIZE))
+        st.write(f"Run {run_id} ({run['mode']}) - JD: {run['jd_id']} - {total} CVs kept of {run['n_ranked']} ranked")
+
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1) if pages > 1 else 1
+        rows = db.ranking_page(run_id, (int(page) - 1) * PAGE_SIZE, PAGE_SIZE)
+        st.dataframe(pd.DataFrame(rows), use_container_width=True)
+
+        if st.checkbox("Prepare exports", value=False):
+            c1, c2, c3 = st.columns(3)
+            with c1:
+                st.download_button(
+                    "Export CSV",
+                    data=ranking_csv_bytes(db, run_id),
+                    file_name="ranking_results.csv",
+                    mime="text/csv",
+                    use_container_width=True,
+                )
+            with c2:
+                st.download_button(
+                    "Export JSON",
+                    data=db.ranking_json(run_id).encode("utf-8"),
+                    file_name="ranking_results.json",
+                    mime="application/json",
+                    use_container_width=True,
+                )
+            with c3:
+                st.download_button(
+                    "Export explanations",
+                    data=db.explanations_json(run["jd_hash"]).encode("utf-8"),
+                    file_name="llm_explanations.json",
+                    mime="application/json",
+                    use_container_width=True,
+                )
 
-    llm_path = RANKING_DIR / "llm_explanations.json"
-    llm_data = load_json_any(llm_path)
-    items = normalize_explanations(llm_data)
+        st.divider()
 
-    if not items:
-        st.info("No llm_explanations.json found or file is empty")
-    else:
-        items.sort(
-            key=lambda x: float(x.get("score", 0.0)) if str(x.get("score", "")).strip() != "" else -1.0,
-            reverse=True,
-        )
-        for item in items:
-            title = item.get("cv_source") or item.get("cv_name") or "candidate"
-            with st.expander(str(title), expanded=False):
-                render_llm_item(item)
+        explanations = db.explanations(run["jd_hash"], [r["cv_source"] for r in rows])
+        if not explanations:
+            st.info("No LLM explanations for this page")
+        for row in rows:
+            item = explanations.get(row["cv_source"])
+            title = str(row["cv_source"])
+            if row.get("duplicate_of"):
+                title = f"{title} (near-duplicate of {row['duplicate_of']})"
+            if item is None:
+                title = f"{title} (not explained)"
+            with st.expander(title, expanded=False):
+                if item:
+                    render_llm_item(item)
+                elif row.get("duplicate_of"):
+                    st.write("Uses the explanation of its canonical CV once that one is explained.")
+                elif st.button("Explain now", key=f"explain_{stable_key(row['cv_source'])}"):
+                    stream_explanation(db, run, row)
+    db.close()
 
     if st.checkbox("Show last run logs", value=False) and "last_run_logs" in st.session_state:
         st.divider()
@@ -659,6 +787,8 @@ with tabs[3]:
         if test_prompt.strip() == "":
             st.warning("Please enter a prompt.")
         else:
-            with st.spinner("Generating response..."):
-                result = generate_response(test_prompt)
-            st.write(result)
\ No newline at end of file
+            stats = {}
+            st.write_stream(stream_response(test_prompt, stats=stats))
+            if stats.get("error"):
+                st.error(stats["error"])
+            st.caption(stream_stats_caption(stats))
\ No newline at end of file
@@ -0,0 +1,66 @@
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.lexical.bm25 import BM25Index
+from src.store.chunk_store import Chunk
+
+
+CHUNK_COUNTS = [int(x) for x in sys.argv[1:]] or [10000, 100000]
+CHUNKS_PER_CV = 6
+VOCAB = 50000
+CHUNK_TOKENS = 120
+QUERY_TOKENS = 200
+QUERIES = 50
+TOP_N = 2
+
+
+def make_words(rng: np.random.Generator, n_tokens: int) -> np.ndarray:
+    return np.minimum(rng.zipf(1.2, n_tokens), VOCAB) - 1
+
+
+def make_chunks(rng: np.random.Generator, n: int):
+    words = np.asarray([f"w{i}" for i in range(VOCAB)], dtype=object)
+    tokens = make_words(rng, n * CHUNK_TOKENS).reshape(n, CHUNK_TOKENS)
+    for i in range(n):
+        source = f"cv{i // CHUNKS_PER_CV:06d}_chunks"
+        yield Chunk(source, i % CHUNKS_PER_CV, 0, 0, "", " ".join(words[tokens[i]]))
+
+
+def percentiles(times: list[float]) -> str:
+    ms = np.asarray(times) * 1000
+    return f"p50 {np.percentile(ms, 50):7.2f} ms  p95 {np.percentile(ms, 95):7.2f} ms"
+
+
+def main() -> None:
+    rng = np.random.default_rng(7)
+    queries = [" ".join(f"w{t}" for t in make_words(rng, QUERY_TOKENS)) for _ in range(QUERIES)]
+    print(f"vocab={VOCAB} chunk_tokens={CHUNK_TOKENS} query_tokens={QUERY_TOKENS} queries={QUERIES}")
+
+    for n in CHUNK_COUNTS:
+        started = time.perf_counter()
+        index = BM25Index.build(make_chunks(rng, n))
+        build = time.perf_counter() - started
+        print(
+            f"chunks={n:,} build {build:6.2f}s  terms {len(index.terms):,}  postings {len(index.postings):,}  "
+            f"{index.nbytes() / (1 << 20):.1f} MiB"
+        )
+
+        for label, fn in (
+            ("search top-50", lambda q: index.search(q, 50)),
+            ("per-CV top-N", lambda q: index.source_scores(q, TOP_N)),
+        ):
+            times = []
+            for q in queries:
+                started = time.perf_counter()
+                fn(q)
+                times.append(time.perf_counter() - started)
+            print(f"  {label:<14} {percentiles(times)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import importlib.util
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from docx import Document
+
+
+N_DOCS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+PARAGRAPHS = 120
+TABLE_ROWS = 12
+
+WORDS = (
+    "python sql pandas numpy machine learning regression git docker kubernetes "
+    "analysis data pipeline model feature engineering reporting dashboard team "
+    "project university bachelor master experience skills education"
+).split()
+
+
+def load_extract_text():
+    path = Path(__file__).resolve().parents[1] / "src" / "01_ingest" / "extract_text.py"
+    spec = importlib.util.spec_from_file_location("extract_text", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def sentence(rng: random.Random, n: int = 14) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def make_corpus(out_dir: Path, n_docs: int) -> list[Path]:
+    rng = random.Random(7)
+    paths = []
+    for i in range(n_docs):
+        doc = Document()
+        doc.sections[0].header.paragraphs[0].text = f"Candidate {i} | header-skill-{i}"
+        doc.add_heading(f"CV {i}", level=1)
+        for _ in range(PARAGRAPHS):
+            doc.add_paragraph(sentence(rng))
+        table = doc.add_table(rows=TABLE_ROWS, cols=2)
+        for r in range(TABLE_ROWS):
+            table.cell(r, 0).text = f"table-skill-{r}"
+            table.cell(r, 1).text = sentence(rng, 4)
+        p = out_dir / f"cv_{i:05d}.docx"
+        doc.save(str(p))
+        paths.append(p)
+    return paths
+
+
+def bench(name: str, fn, paths: list[Path]) -> str:
+    started = time.perf_counter()
+    total_chars = 0
+    last = ""
+    for p in paths:
+        last = fn(p)
+        total_chars += len(last)
+    took = time.perf_counter() - started
+    print(f"{name:<14} docs={len(paths)} time={took:.2f}s docs/sec={len(paths) / took:.1f} chars={total_chars}")
+    return last
+
+
+def main() -> None:
+    et = load_extract_text()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"Building synthetic corpus: {N_DOCS} docs")
+        paths = make_corpus(Path(tmp), N_DOCS)
+
+        legacy = bench("python-docx", et.extract_from_docx_python_docx, paths)
+        stream = bench("ooxml-stream", et.extract_from_docx, paths)
+
+        print(f"python-docx keeps table text: {'table-skill-0' in legacy}, header text: {'header-skill' in legacy}")
+        print(f"ooxml-stream keeps table text: {'table-skill-0' in stream}, header text: {'header-skill' in stream}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.ranking.grouped import rank_grouped, rank_per_source
+from src.ranking.streaming import rank_streaming
+from src.vectorindex import backends
+from src.vectorindex.flat_index import FlatIndex
+
+
+CV_COUNTS = [int(x) for x in sys.argv[1:]] or [500, 5000]
+CHROMA_MAX_CVS = int(os.getenv("BENCH_CHROMA_MAX_CVS", "1000"))
+CHUNKS_PER_CV = 6
+DIM = 384
+TOP_N = 2
+BATCH = 5000
+
+
+def make_corpus(rng: np.random.Generator, n_cvs: int):
+    n = n_cvs * CHUNKS_PER_CV
+    vecs = rng.standard_normal((n, DIM), dtype=np.float32)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    sources = [f"cv{i // CHUNKS_PER_CV:05d}_chunks" for i in range(n)]
+    ids = [f"{s}::{i % CHUNKS_PER_CV}" for i, s in enumerate(sources)]
+    metas = [{"source": s, "chunk_index": i % CHUNKS_PER_CV} for i, s in enumerate(sources)]
+    return vecs, ids, metas, sorted(set(sources))
+
+
+def score(d: float) -> float:
+    return round(1 / (1 + d), 4)
+
+
+def timed(fn, *args):
+    tracemalloc.start()
+    started = time.perf_counter()
+    out = fn(*args)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return out, elapsed, peak / (1 << 20)
+
+
+def streamed(index, q, sources, top_n):
+    names, avg = rank_streaming(index, q, top_n)
+    wanted = set(sources)
+    return [(name, float(d)) for name, d in zip(names, avg) if name in wanted and np.isfinite(d)]
+
+
+def compare(name: str, index, q: list[float], sources: list[str]) -> None:
+    old, t_old, m_old = timed(rank_per_source, index, q, sources, TOP_N)
+    old_d = dict(old)
+    print(f"  {name:<7} per-source {t_old:8.3f}s  peak {m_old:7.1f} MiB")
+    for label, fn in (("grouped", rank_grouped), ("stream", streamed)):
+        new, t_new, m_new = timed(fn, index, q, sources, TOP_N)
+        new_d = dict(new)
+        diff = max((abs(old_d[s] - new_d.get(s, np.inf)) for s in old_d), default=0.0)
+        flips = sum(score(old_d[s]) != score(new_d[s]) for s in old_d if s in new_d)
+        print(
+            f"          {label:<10} {t_new:8.3f}s  peak {m_new:7.1f} MiB  ({t_old / max(t_new, 1e-9):6.1f}x)  "
+            f"sources {len(new)}/{len(old)}  max |d avg_distance| {diff:.2e}  rounded scores differing: {flips}"
+        )
+
+
+def main() -> None:
+    rng = np.random.default_rng(13)
+    q = rng.standard_normal(DIM).astype(np.float32).tolist()
+    print(f"chunks/cv={CHUNKS_PER_CV} dim={DIM} top_n={TOP_N}")
+
+    for n_cvs in CV_COUNTS:
+        vecs, ids, metas, sources = make_corpus(rng, n_cvs)
+        tmp = Path(tempfile.mkdtemp(prefix="bench_rank_"))
+        try:
+            print(f"cvs={n_cvs:,} chunks={len(ids):,}")
+            for precision in ("float32", "int8"):
+                index = FlatIndex.open(tmp / f"flat_{precision}", create=True, precision=precision)
+                for i in range(0, len(ids), BATCH):
+                    index.add(ids=ids[i : i + BATCH], embeddings=vecs[i : i + BATCH], metadatas=metas[i : i + BATCH])
+                index.persist()
+                compare(f"{'flat' if precision == 'float32' else 'int8'}", index, q, sources)
+
+            if n_cvs <= CHROMA_MAX_CVS:
+                backends.PERSIST_DIR = str(tmp / "chroma")
+                collection = backends.open_index("bench", reset=True, backend="chroma")
+                for i in range(0, len(ids), BATCH):
+                    collection.add(ids=ids[i : i + BATCH], embeddings=vecs[i : i + BATCH].tolist(), metadatas=metas[i : i + BATCH])
+                compare("chroma", collection, q, sources)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
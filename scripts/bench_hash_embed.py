@@ -0,0 +1,68 @@
+import hashlib
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.embeddings import hash_embedder as he
+
+
+N_CHUNKS = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+TOKENS_PER_CHUNK = 180
+BATCH = 256
+
+WORDS = (
+    "python sql pandas numpy machine learning regression git docker kubernetes sap fico "
+    "analysis data pipeline model feature engineering reporting dashboard team project "
+    "university bachelor master experience skills education "
+    "الخبرة المهارات التعليم تحليل البيانات بايثون قواعد مشروع شركة جامعة"
+).split()
+
+
+def reference_hash_embed(text: str, dim: int = he.EMBED_DIM) -> list[float]:
+    v = np.zeros(dim, dtype=np.float32)
+    for tok in he.tokenize(text):
+        h = hashlib.md5(tok.encode("utf-8", errors="ignore")).digest()
+        idx = int.from_bytes(h[:4], "little") % dim
+        sign = 1.0 if (h[4] % 2 == 0) else -1.0
+        v[idx] += sign
+
+    norm = float(np.linalg.norm(v))
+    if norm > 0:
+        v /= norm
+    return v.tolist()
+
+
+def make_chunks(n: int) -> list[str]:
+    rng = random.Random(11)
+    vocab = WORDS + [f"term{i}" for i in range(5000)]
+    return [" ".join(rng.choice(vocab) for _ in range(TOKENS_PER_CHUNK)) for _ in range(n)]
+
+
+def main() -> None:
+    chunks = make_chunks(N_CHUNKS)
+
+    started = time.perf_counter()
+    single = np.asarray([reference_hash_embed(c) for c in chunks], dtype=np.float32)
+    t_single = time.perf_counter() - started
+
+    he.token_slot.cache_clear()
+    started = time.perf_counter()
+    batch = np.concatenate(
+        [he.hash_embed_batch(chunks[i : i + BATCH]) for i in range(0, len(chunks), BATCH)]
+    )
+    t_batch = time.perf_counter() - started
+
+    print(f"chunks={N_CHUNKS} tokens/chunk={TOKENS_PER_CHUNK} dim={he.EMBED_DIM}")
+    print(f"per-token loop    {t_single:.2f}s  {N_CHUNKS / t_single:,.0f} chunks/sec")
+    print(f"hash_embed_batch  {t_batch:.2f}s  {N_CHUNKS / t_batch:,.0f} chunks/sec  ({t_single / t_batch:.1f}x)")
+    print(f"token cache: {he.token_slot.cache_info()}")
+    print(f"bit-identical: {single.tobytes() == batch.tobytes()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+LEVELS = [int(x) for x in sys.argv[1:]] or [1, 2, 4, 8]
+REQUESTS = int(os.getenv("BENCH_REQUESTS", "16"))
+MOCK_DELAY_SEC = float(os.getenv("MOCK_DELAY_SEC", "0.5"))
+MOCK_PARALLEL = int(os.getenv("MOCK_PARALLEL", "4"))
+MOCK_TOKENS = int(os.getenv("MOCK_TOKENS", "20"))
+MOCK_PROMPT_EVAL_MS = float(os.getenv("MOCK_PROMPT_EVAL_MS", "2"))
+LAYOUT_CANDIDATES = 8
+
+
+class MockOllama(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    slots = threading.Semaphore(MOCK_PARALLEL)
+    connections = set()
+    prefixes: list[list[str]] = []
+    lock = threading.Lock()
+
+    @classmethod
+    def prompt_eval(cls, prompt: str) -> int:
+        words = prompt.split()
+        with cls.lock:
+            best = 0
+            for cached in cls.prefixes:
+                n = 0
+                while n < min(len(words), len(cached)) and words[n] == cached[n]:
+                    n += 1
+                best = max(best, n)
+            cls.prefixes = (cls.prefixes + [words])[-MOCK_PARALLEL:]
+        return len(words) - best
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with self.lock:
+            self.connections.add(self.client_address)
+        self.send_response(200)
+        if not body.get("stream", True):
+            with self.slots:
+                time.sleep(MOCK_DELAY_SEC)
+            data = json.dumps({"model": body.get("model"), "response": "Recommendation: Consider", "done": True}).encode()
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        evaluated = self.prompt_eval(body.get("prompt") or "")
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        with self.slots:
+            for i in range(MOCK_TOKENS + 1):
+                time.sleep(MOCK_DELAY_SEC / (MOCK_TOKENS + 1))
+                done = i == MOCK_TOKENS
+                msg = {"model": body.get("model"), "response": "" if done else f"tok{i} ", "done": done}
+                if done:
+                    msg.update(
+                        {
+                            "eval_count": MOCK_TOKENS,
+                            "eval_duration": int(MOCK_DELAY_SEC * 1e9),
+                            "prompt_eval_count": evaluated,
+                            "prompt_eval_duration": int(evaluated * MOCK_PROMPT_EVAL_MS * 1e6),
+                        }
+                    )
+                line = (json.dumps(msg) + "\n").encode()
+                self.wfile.write(f"{len(line):X}\r\n".encode() + line + b"\r\n")
+                self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def main() -> None:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockOllama)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["OLLAMA_BASE_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ["OLLAMA_POOL_SIZE"] = str(max(LEVELS))
+
+    from src.llm.explain_with_llm import build_prompt, prompt_prefix
+    from src.llm.llm_client import generate_many
+
+    print(f"mock ollama: {MOCK_DELAY_SEC:.2f}s per request, {MOCK_PARALLEL} parallel slots, {REQUESTS} requests")
+    base = None
+    for level in LEVELS:
+        MockOllama.connections.clear()
+        prompts = [f"prompt {i}" for i in range(REQUESTS)]
+        started = time.perf_counter()
+        stats = [st for _, _, st in generate_many(prompts, level, timeout_sec=60, num_predict=8)]
+        took = time.perf_counter() - started
+        errors = sum(bool(st["error"]) for st in stats)
+        ttft = sorted(st["ttft_sec"] or 0.0 for st in stats)[len(stats) // 2]
+        base = base or took
+        print(
+            f"concurrency={level:<3} {took:6.2f}s  {REQUESTS / took:6.2f} req/s  speedup x{base / took:.2f}  "
+            f"median ttft {ttft:.2f}s  connections={len(MockOllama.connections)}  errors={errors}"
+        )
+
+    jd = " ".join(f"requirement{i}" for i in range(300))
+    cvs = [(f"cv{i}", " ".join(f"cv{i}_word{k}" for k in range(250))) for i in range(LAYOUT_CANDIDATES)]
+    layouts = {
+        "cv before jd": [f"Candidate CV ({name}):\n{text}\n\n{prompt_prefix(jd)}" for name, text in cvs],
+        "shared jd prefix": [build_prompt(jd, text, 0.5, name) for name, text in cvs],
+    }
+    print(f"prompt layout ({LAYOUT_CANDIDATES} candidates, concurrency=1, {MOCK_PROMPT_EVAL_MS} ms per prompt token):")
+    for name, prompts in layouts.items():
+        MockOllama.prefixes = []
+        stats = [st for _, _, st in generate_many(prompts, 1, timeout_sec=60, num_predict=8)]
+        tokens = [st["prompt_tokens"] for st in stats]
+        secs = [st["prompt_eval_sec"] for st in stats]
+        print(
+            f"  {name:<17} prompt tokens evaluated: first {tokens[0]}, rest mean {sum(tokens[1:]) / (len(tokens) - 1):.0f}  "
+            f"prompt eval total {sum(secs):.2f}s"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.dedupe.minhash import DEDUPE_THRESHOLD, NUM_PERM, find_duplicates, signature
+
+
+CV_COUNTS = [int(x) for x in sys.argv[1:]] or [1000, 10000]
+CV_WORDS = 600
+VOCAB = 5000
+DUP_SHARE = 0.1
+EDIT_SHARE = 0.02
+
+
+def make_cv(rng: np.random.Generator) -> list[str]:
+    return [f"w{i}" for i in rng.integers(0, VOCAB, CV_WORDS)]
+
+
+def near_copy(rng: np.random.Generator, words: list[str]) -> list[str]:
+    words = list(words)
+    for pos in rng.integers(0, len(words), int(len(words) * EDIT_SHARE)):
+        words[pos] = f"x{rng.integers(0, VOCAB)}"
+    return words
+
+
+def main() -> None:
+    rng = np.random.default_rng(7)
+    for n in CV_COUNTS:
+        n_dup = int(n * DUP_SHARE)
+        base = [make_cv(rng) for _ in range(n - n_dup)]
+        copies = [near_copy(rng, base[i]) for i in rng.integers(0, len(base), n_dup)]
+        texts = [" ".join(w) for w in base + copies]
+        names = [f"cv{i:06d}" for i in range(n)]
+
+        started = time.perf_counter()
+        sigs = np.stack([signature(t) for t in texts])
+        sig_took = time.perf_counter() - started
+        started = time.perf_counter()
+        found = find_duplicates(names, sigs)
+        lsh_took = time.perf_counter() - started
+
+        expected = set(names[len(base) :])
+        hit = len(expected & set(found))
+        print(
+            f"cvs={n:,}  signature {sig_took / n * 1e3:.2f} ms/CV  lsh+verify {lsh_took * 1e3:.0f} ms  "
+            f"duplicates found {hit}/{len(expected)} (false {len(set(found) - expected)})  "
+            f"threshold={DEDUPE_THRESHOLD}  signatures {sigs.nbytes / (1 << 10):.0f} KiB ({NUM_PERM} perms)"
+        )
+
+
+if __name__ == "__main__":
+    main()
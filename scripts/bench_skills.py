@@ -0,0 +1,70 @@
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.skills.index import SkillIndex, n_words, to_bits
+from src.skills.matcher import SkillMatcher, load_dictionary
+
+
+CV_COUNTS = [int(x) for x in sys.argv[1:]] or [10000, 100000]
+CV_WORDS = 600
+MATCH_SAMPLES = 200
+SKILLS_PER_CV = 12
+MUST_HAVE = 3
+FILLER = (
+    "experience team project development management worked responsible university degree "
+    "خبرة فريق مشروع تطوير إدارة عمل مسؤول جامعة شهادة"
+).split()
+
+
+def make_cv(rng: np.random.Generator, aliases: list[str]) -> str:
+    words = list(rng.choice(FILLER, CV_WORDS))
+    for alias in rng.choice(aliases, SKILLS_PER_CV):
+        words.insert(int(rng.integers(0, len(words))), str(alias))
+    return " ".join(words)
+
+
+def main() -> None:
+    rng = np.random.default_rng(5)
+    dictionary = load_dictionary()
+    started = time.perf_counter()
+    matcher = SkillMatcher(dictionary)
+    print(f"automaton: {len(matcher)} skills, {len(matcher._goto):,} states, built in {(time.perf_counter() - started) * 1e3:.1f} ms")
+
+    aliases = [a for values in dictionary.values() for a in values]
+    texts = [make_cv(rng, aliases) for _ in range(MATCH_SAMPLES)]
+    chars = sum(len(t) for t in texts)
+    started = time.perf_counter()
+    found = [matcher.find_ids(t) for t in texts]
+    took = time.perf_counter() - started
+    print(
+        f"matching: {took / MATCH_SAMPLES * 1e3:.2f} ms/CV ({chars / took / 1e6:.2f} M chars/s), "
+        f"{np.mean([len(f) for f in found]):.1f} skills/CV"
+    )
+
+    words = n_words(len(matcher))
+    mask_ids = sorted(found[0])[:MUST_HAVE]
+    for n in CV_COUNTS:
+        bits = np.stack([to_bits(found[i % MATCH_SAMPLES], words) for i in range(n)])
+        sources = [f"cv{i:06d}_chunks" for i in range(n)]
+        index = SkillIndex(matcher.skills, matcher.fingerprint, sources, [None] * n, bits)
+        mask = index.mask(mask_ids)
+
+        started = time.perf_counter()
+        keep = index.has_all(mask)
+        bitset = time.perf_counter() - started
+        started = time.perf_counter()
+        eligible = index.eligible(sources, mask)
+        total = time.perf_counter() - started
+        print(
+            f"cvs={n:,}  bitset test {bitset * 1e6 / n:.4f} us/CV  with source lookup {total * 1e6 / n:.4f} us/CV  "
+            f"eligible {len(eligible):,} ({keep.mean():.1%})  index {bits.nbytes / (1 << 10):.0f} KiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.store.chunk_store import ChunkStore, content_hash
+from src.vectorindex import backends
+from src.vectorindex.flat_index import FlatIndex
+
+
+SIZES = [int(x) for x in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+CHROMA_MAX = int(os.getenv("BENCH_CHROMA_MAX", "100000"))
+DIM = 384
+N_SOURCES = 2000
+N_QUERIES = 50
+TOP_K = 10
+BATCH = 5000
+DOC_WORDS = 120
+VOCAB = ["python", "sql", "data", "engineer", "project", "team", "cloud", "مهندس", "بيانات", "خبرة"]
+
+
+def make_vectors(rng: np.random.Generator, n: int) -> np.ndarray:
+    v = rng.standard_normal((n, DIM), dtype=np.float32)
+    v /= np.linalg.norm(v, axis=1, keepdims=True)
+    return v
+
+
+def doc_text(row: int) -> str:
+    return " ".join(VOCAB[(row + j) % len(VOCAB)] for j in range(DOC_WORDS)) + f" #{row}"
+
+
+def make_rows(start: int, n: int):
+    rows = range(start, start + n)
+    ids = [f"cv{r % N_SOURCES}_chunks::{r // N_SOURCES}" for r in rows]
+    docs = [doc_text(r) for r in rows]
+    metas = [
+        {
+            "source": f"cv{r % N_SOURCES}_chunks",
+            "chunk_index": r // N_SOURCES,
+            "start": 0,
+            "end": len(doc),
+            "content_hash": content_hash(doc),
+        }
+        for r, doc in zip(rows, docs)
+    ]
+    return ids, metas, docs
+
+
+def make_store(root: Path, n: int) -> ChunkStore:
+    store = ChunkStore(root)
+    for s in range(min(n, N_SOURCES)):
+        store.write_source(f"cv{s}_chunks", [(0, 0, doc_text(r)) for r in range(s, n, N_SOURCES)])
+    store.flush()
+    return store
+
+
+def dir_mib(root: Path) -> float:
+    return sum(p.stat().st_size for p in root.rglob("*") if p.is_file()) / (1 << 20)
+
+
+def timed_queries(index, queries: np.ndarray, where=None, include=("distances",)) -> tuple[float, list[list[str]]]:
+    lat, ids = [], []
+    for q in queries:
+        started = time.perf_counter()
+        res = index.query(query_embeddings=[q.tolist()], n_results=TOP_K, where=where, include=list(include))
+        lat.append(time.perf_counter() - started)
+        ids.append(res["ids"][0])
+    return float(np.median(lat)) * 1000, ids
+
+
+def bench_flat(root: Path, store: ChunkStore, vectors: np.ndarray, queries: np.ndarray) -> tuple[list[list[str]], str]:
+    started = time.perf_counter()
+    index = FlatIndex.open(root, create=True)
+    for i in range(0, len(vectors), BATCH):
+        ids, metas, docs = make_rows(i, len(vectors[i : i + BATCH]))
+        index.add(ids=ids, embeddings=vectors[i : i + BATCH], metadatas=metas, documents=docs)
+    index.persist()
+    t_build = time.perf_counter() - started
+
+    started = time.perf_counter()
+    index = FlatIndex.open(root, documents=store)
+    t_open = time.perf_counter() - started
+
+    p50, ids = timed_queries(index, queries)
+    p50_where, _ = timed_queries(index, queries[:10], where={"source": "cv7_chunks"})
+    p50_docs, _ = timed_queries(index, queries[:10], include=("distances", "documents"))
+    line = (
+        f"  flat    build {t_build:7.2f}s  open {t_open:6.2f}s  "
+        f"query p50 {p50:8.2f}ms  filtered p50 {p50_where:8.2f}ms  "
+        f"with documents p50 {p50_docs:8.2f}ms  disk {dir_mib(root):,.0f} MiB"
+    )
+    return ids, line
+
+
+def bench_chroma(root: Path, vectors: np.ndarray, queries: np.ndarray) -> tuple[list[list[str]], str]:
+    backends.PERSIST_DIR = str(root)
+    started = time.perf_counter()
+    collection = backends.open_index("bench", reset=True, backend="chroma")
+    for i in range(0, len(vectors), BATCH):
+        ids, metas, docs = make_rows(i, len(vectors[i : i + BATCH]))
+        collection.add(ids=ids, embeddings=vectors[i : i + BATCH].tolist(), metadatas=metas, documents=docs)
+    t_build = time.perf_counter() - started
+
+    p50, ids = timed_queries(collection, queries)
+    p50_where, _ = timed_queries(collection, queries[:10], where={"source": "cv7_chunks"})
+    line = (
+        f"  chroma  build {t_build:7.2f}s  {'':13s}  query p50 {p50:8.2f}ms  "
+        f"filtered p50 {p50_where:8.2f}ms  disk {dir_mib(root):,.0f} MiB"
+    )
+    return ids, line
+
+
+def recall(truth: list[list[str]], got: list[list[str]]) -> float:
+    hits = sum(len(set(t) & set(g)) for t, g in zip(truth, got))
+    return hits / max(1, sum(len(t) for t in truth))
+
+
+def main() -> None:
+    rng = np.random.default_rng(11)
+    queries = make_vectors(rng, N_QUERIES)
+    print(
+        f"dim={DIM} queries={N_QUERIES} top_k={TOP_K} doc_words={DOC_WORDS} "
+        f"chroma up to {CHROMA_MAX:,} vectors"
+    )
+
+    for n in SIZES:
+        vectors = make_vectors(rng, n)
+        tmp = Path(tempfile.mkdtemp(prefix="bench_vi_"))
+        try:
+            print(f"n={n:,} ({vectors.nbytes / (1 << 20):,.0f} MiB float32)")
+            store = make_store(tmp / "chunks", n)
+            print(f"  chunk store {dir_mib(tmp / 'chunks'):,.0f} MiB (documents, shared with the pipeline)")
+            flat_ids, line = bench_flat(tmp / "flat", store, vectors, queries)
+            print(line)
+            if n <= CHROMA_MAX:
+                chroma_ids, line = bench_chroma(tmp / "chroma", vectors, queries)
+                print(line)
+                print(f"  chroma recall@{TOP_K} vs exact flat: {recall(flat_ids, chroma_ids):.3f}")
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.vectorindex.backends import open_index
+from src.vectorindex.flat_index import FlatIndex
+
+
+TOP_K = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+N_QUERIES = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+N_SYNTHETIC = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+SYNTHETIC_DIM = 384
+PAGE = 5000
+BATCH = 5000
+
+CONFIGS = [
+    ("float32", 0),
+    ("float16", 0),
+    ("float16", 4),
+    ("int8", 0),
+    ("int8", 2),
+    ("int8", 4),
+    ("int8", 8),
+]
+
+
+def load_deployed_vectors() -> np.ndarray:
+    index = open_index()
+    parts, offset = [], 0
+    while True:
+        page = index.get(include=["embeddings"], limit=PAGE, offset=offset)
+        embs = page.get("embeddings")
+        if embs is None or not len(embs):
+            break
+        parts.append(np.asarray(embs, dtype=np.float32))
+        if len(embs) < PAGE:
+            break
+        offset += len(embs)
+    if not parts:
+        raise SystemExit("Vector index is empty; run embed_and_store.py first or pass a synthetic size.")
+    return np.concatenate(parts)
+
+
+def synthetic_vectors(n: int) -> np.ndarray:
+    rng = np.random.default_rng(11)
+    centers = rng.standard_normal((max(1, n // 50), SYNTHETIC_DIM), dtype=np.float32)
+    v = centers[rng.integers(0, len(centers), n)] + 0.6 * rng.standard_normal((n, SYNTHETIC_DIM), dtype=np.float32)
+    return v
+
+
+def build(root: Path, vectors: np.ndarray, precision: str, rescore: int) -> FlatIndex:
+    index = FlatIndex.open(root, create=True, precision=precision, keep_float32=rescore > 0, rescore=rescore)
+    for i in range(0, len(vectors), BATCH):
+        block = vectors[i : i + BATCH]
+        index.add(ids=[str(i + j) for j in range(len(block))], embeddings=block)
+    index.persist()
+    return index
+
+
+def run(index: FlatIndex, queries: np.ndarray) -> tuple[list[set[str]], float]:
+    found, lat = [], []
+    for q in queries:
+        started = time.perf_counter()
+        res = index.query(query_embeddings=[q], n_results=TOP_K, include=["distances"])
+        lat.append(time.perf_counter() - started)
+        found.append(set(res["ids"][0]))
+    return found, float(np.median(lat)) * 1000
+
+
+def main() -> None:
+    vectors = synthetic_vectors(N_SYNTHETIC) if N_SYNTHETIC else load_deployed_vectors()
+    n_queries = min(N_QUERIES, max(1, len(vectors) // 5))
+    rng = np.random.default_rng(7)
+    held_out = rng.choice(len(vectors), n_queries, replace=False)
+    queries = vectors[held_out]
+    corpus = np.delete(vectors, held_out, axis=0)
+    dim = corpus.shape[1]
+
+    print(f"source={'synthetic' if N_SYNTHETIC else 'deployed index'} vectors={len(corpus):,} dim={dim}")
+    print(f"queries={n_queries} (held out) k={TOP_K}")
+    print(f"{'precision':<10}{'rescore':>8}{'recall@k':>10}{'scan B/vec':>12}{'disk B/vec':>12}{'p50 ms':>9}")
+
+    tmp = Path(tempfile.mkdtemp(prefix="recall_"))
+    try:
+        exact = None
+        for precision, rescore in CONFIGS:
+            root = tmp / f"{precision}_{rescore}"
+            index = build(root, corpus, precision, rescore)
+            found, p50 = run(index, queries)
+            if exact is None:
+                exact = found
+            hits = sum(len(a & b) for a, b in zip(exact, found))
+            recall = hits / max(1, sum(len(a) for a in exact))
+
+            scan = {"float32": 4 * dim, "float16": 2 * dim, "int8": dim + 4}[precision]
+            disk = sum(index.nbytes().values()) / max(1, len(corpus))
+            print(f"{precision:<10}{rescore:>8}{recall:>10.4f}{scan:>12,}{disk:>12,.0f}{p50:>9.2f}")
+            shutil.rmtree(root, ignore_errors=True)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,69 +1,470 @@
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import re
+import sys
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from multiprocessing.connection import wait
 from pathlib import Path
 
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
 from pypdf import PdfReader
 from pypdf.errors import PdfStreamError, PdfReadError
 from docx import Document
 
+from src.dedupe.minhash import DEDUPE_THRESHOLD, update_dedupe
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
 
 CVS_DIR = Path("data/samples/cvs")
 OUT_DIR = Path("data/outputs/extracted_text")
+MANIFEST_PATH = OUT_DIR / "_manifest.json"
+
+WORKERS = int(os.getenv("EXTRACT_WORKERS", "0")) or (os.cpu_count() or 1)
+FILE_TIMEOUT_SEC = float(os.getenv("EXTRACT_TIMEOUT_SEC", "60"))
+MAX_PDF_PAGES = int(os.getenv("EXTRACT_MAX_PAGES", "50"))
+MAX_RSS_MB = int(os.getenv("EXTRACT_MAX_RSS_MB", "1024"))
+POLL_SEC = 0.2
+RETRY_ERRORS = ("Timeout:", "WorkerCrashed:")
+DOCX_PART_PARAGRAPHS = 64
+
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+W_P, W_R, W_T, W_TAB, W_BR, W_CR = (W_NS + t for t in ("p", "r", "t", "tab", "br", "cr"))
+W_TR, W_TC = W_NS + "tr", W_NS + "tc"
+_DOCX_HF_RE = re.compile(r"word/(header|footer)(\d*)\.xml")
 
 
 def safe_console(text: str) -> str:
     return str(text).encode("ascii", "backslashreplace").decode("ascii")
 
 
-def extract_from_pdf(file_path: Path) -> str:
+def file_sha256(file_path: Path) -> str:
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_manifest() -> dict:
+    if not MANIFEST_PATH.exists():
+        return {}
+    try:
+        data = json.loads(MANIFEST_PATH.read_text(encoding="utf-8", errors="replace"))
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def save_manifest(manifest: dict) -> None:
+    tmp = MANIFEST_PATH.with_suffix(MANIFEST_PATH.suffix + ".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True), encoding="utf-8")
+    tmp.replace(MANIFEST_PATH)
+
+
+def iter_pdf_pages(file_path: Path, max_pages: int = 0):
     try:
         reader = PdfReader(str(file_path), strict=False)
     except Exception:
         with open(file_path, "rb") as f:
             reader = PdfReader(f, strict=False)
 
-    parts = []
-    for page in reader.pages:
-        parts.append(page.extract_text() or "")
-    return "\n".join(parts).strip()
+    for i, page in enumerate(reader.pages):
+        if max_pages and i >= max_pages:
+            return True
+        yield page.extract_text() or ""
+    return False
+
+
+def extract_from_pdf(file_path: Path) -> str:
+    return "\n".join(iter_pdf_pages(file_path)).strip()
+
+
+def _iter_docx_part(fileobj):
+    paras, rows, cells = [], [], []
+    in_run = 0
+    in_fallback = 0
+
+    for event, elem in ET.iterparse(fileobj, events=("start", "end")):
+        tag = elem.tag
+
+        if event == "start":
+            if tag == MC_FALLBACK:
+                in_fallback += 1
+            elif in_fallback:
+                pass
+            elif tag == W_P:
+                paras.append([])
+            elif tag == W_R:
+                in_run += 1
+            elif tag == W_TR:
+                rows.append([])
+            elif tag == W_TC:
+                cells.append([])
+            continue
+
+        if tag == MC_FALLBACK:
+            in_fallback -= 1
+            elem.clear()
+            continue
+        if in_fallback:
+            continue
+
+        if tag == W_T:
+            if paras:
+                paras[-1].append(elem.text or "")
+        elif tag == W_R:
+            in_run -= 1
+        elif tag == W_TAB and in_run:
+            if paras:
+                paras[-1].append("\t")
+        elif tag in (W_BR, W_CR) and in_run:
+            if paras:
+                paras[-1].append("\n")
+        elif tag == W_P:
+            text = "".join(paras.pop()).strip()
+            elem.clear()
+            if not text:
+                continue
+            if cells:
+                cells[-1].append(text)
+            else:
+                yield text
+        elif tag == W_TC:
+            cell = " ".join(cells.pop())
+            if cell and rows:
+                rows[-1].append(cell)
+        elif tag == W_TR:
+            row = " | ".join(rows.pop())
+            elem.clear()
+            if not row:
+                continue
+            if cells:
+                cells[-1].append(row)
+            else:
+                yield row
+
+
+def iter_docx_paragraphs(file_path: Path):
+    with zipfile.ZipFile(file_path) as zf:
+        names = zf.namelist()
+        if "word/document.xml" not in names:
+            raise ValueError("Not a DOCX file: word/document.xml is missing")
+
+        hf = sorted(
+            (m.group(1), int(m.group(2) or 0), n)
+            for n in names
+            if (m := _DOCX_HF_RE.fullmatch(n))
+        )
+        parts = [n for kind, _, n in hf if kind == "header"] + ["word/document.xml"]
+        parts += [n for kind, _, n in hf if kind == "footer"]
+
+        seen_hf = set()
+        for part in parts:
+            is_hf = part != "word/document.xml"
+            with zf.open(part) as f:
+                for text in _iter_docx_part(f):
+                    if is_hf:
+                        if text in seen_hf:
+                            continue
+                        seen_hf.add(text)
+                    yield text
 
 
 def extract_from_docx(file_path: Path) -> str:
+    return "\n".join(iter_docx_paragraphs(file_path)).strip()
+
+
+def extract_from_docx_python_docx(file_path: Path) -> str:
     doc = Document(str(file_path))
     parts = [p.text for p in doc.paragraphs if p.text]
     return "\n".join(parts).strip()
 
 
+def iter_text_parts(file_path: Path, max_pages: int = 0):
+    if file_path.suffix.lower() == ".pdf":
+        return (yield from iter_pdf_pages(file_path, max_pages))
+
+    batch = []
+    for text in iter_docx_paragraphs(file_path):
+        batch.append(text)
+        if len(batch) >= DOCX_PART_PARAGRAPHS:
+            yield "\n".join(batch)
+            batch = []
+    if batch:
+        yield "\n".join(batch)
+
+
+def rss_guard_available() -> bool:
+    return psutil is not None or resource is not None
+
+
+def _self_rss_mb() -> float | None:
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / (1 << 20)
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 if os.name != "darwin" else peak / (1 << 20)
+
+
+def _proc_rss_mb(pid: int) -> float | None:
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss / (1 << 20)
+        except psutil.Error:
+            return None
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _worker_main(conn, max_pages: int, max_rss_mb: int) -> None:
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+
+        file_path = Path(task)
+        try:
+            parts = iter_text_parts(file_path, max_pages)
+            while True:
+                try:
+                    part = next(parts)
+                except StopIteration as stop:
+                    truncated = bool(stop.value)
+                    break
+                conn.send(("part", part))
+                rss = _self_rss_mb()
+                if max_rss_mb and rss is not None and rss > max_rss_mb:
+                    raise MemoryError(f"RSS limit exceeded ({rss:.0f} MB > {max_rss_mb} MB)")
+
+            note = f"stopped at page limit ({max_pages})" if truncated else None
+            conn.send(("done", note))
+
+        except MemoryError as e:
+            conn.send(("error", f"MemoryError: {e}"))
+            break
+        except (PdfStreamError, PdfReadError, ValueError) as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+    conn.close()
+
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_worker_main, args=(child, MAX_PDF_PAGES, MAX_RSS_MB), daemon=True)
+        self.proc.start()
+        child.close()
+        self.file = None
+        self.parts = []
+        self.started = 0.0
+
+    def assign(self, file_path: Path) -> None:
+        self.file = file_path
+        self.parts = []
+        self.started = time.monotonic()
+        self.conn.send(str(file_path))
+
+    def finish(self, err: str | None):
+        result = (self.file, "\n".join(self.parts).strip(), err)
+        self.file = None
+        self.parts = []
+        return result
+
+    def kill(self) -> None:
+        if self.proc.is_alive():
+            self.proc.kill()
+        self.proc.join()
+        self.conn.close()
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except (OSError, EOFError):
+            pass
+        self.proc.join(timeout=5)
+        if self.proc.is_alive():
+            self.proc.kill()
+        self.conn.close()
+
+
+def run_extraction(pending: list[Path]):
+    if not pending:
+        return
+
+    ctx = mp.get_context()
+    queue = list(reversed(pending))
+    workers = [_Worker(ctx) for _ in range(min(WORKERS, len(pending)))]
+
+    try:
+        while queue or any(w.file is not None for w in workers):
+            for i, w in enumerate(workers):
+                if w.file is None and queue:
+                    if not w.proc.is_alive():
+                        w.kill()
+                        workers[i] = w = _Worker(ctx)
+                    w.assign(queue.pop())
+
+            busy = [w for w in workers if w.file is not None]
+            ready = wait([w.conn for w in busy], timeout=POLL_SEC)
+
+            for w in busy:
+                if w.conn in ready:
+                    try:
+                        while w.conn.poll():
+                            kind, payload = w.conn.recv()
+                            if kind == "part":
+                                w.parts.append(payload)
+                            elif kind == "done":
+                                yield w.finish(None) + (payload,)
+                                break
+                            else:
+                                if payload.startswith("MemoryError"):
+                                    w.kill()
+                                yield w.finish(payload) + (None,)
+                                break
+                    except (EOFError, OSError):
+                        code = w.proc.exitcode
+                        yield w.finish(f"WorkerCrashed: exit code {code}") + (None,)
+                        continue
+
+                if w.file is None:
+                    continue
+
+                elapsed = time.monotonic() - w.started
+                rss = _proc_rss_mb(w.proc.pid)
+                reason = None
+                if FILE_TIMEOUT_SEC and elapsed > FILE_TIMEOUT_SEC:
+                    reason = f"Timeout: killed after {FILE_TIMEOUT_SEC:.0f}s"
+                elif MAX_RSS_MB and rss is not None and rss > MAX_RSS_MB:
+                    reason = f"MemoryError: killed at {rss:.0f} MB RSS (limit {MAX_RSS_MB} MB)"
+                elif not w.proc.is_alive():
+                    reason = f"WorkerCrashed: exit code {w.proc.exitcode}"
+
+                if reason:
+                    if w.parts:
+                        reason += f" (kept first {len(w.parts)} part(s))"
+                    w.kill()
+                    yield w.finish(reason) + (None,)
+    finally:
+        for w in workers:
+            w.stop()
+
+
 def process_files() -> None:
     OUT_DIR.mkdir(parents=True, exist_ok=True)
 
     failed = []
     files = sorted([p for p in CVS_DIR.glob("*") if p.suffix.lower() in [".pdf", ".docx"]])
 
+    old_manifest = load_manifest()
+    manifest = {}
+    digests = {}
+    pending = []
+
     for file in files:
+        digest = file_sha256(file)
+        out_path = OUT_DIR / f"{file.stem}.txt"
+        entry = old_manifest.get(file.name)
+
+        if entry and entry.get("sha256") == digest:
+            if str(entry.get("error", "")).startswith(RETRY_ERRORS):
+                print(f"Retrying (failed before: {safe_console(entry['error'])}): {safe_console(file.name)}")
+            elif entry.get("error") and not entry.get("text_file"):
+                manifest[file.name] = entry
+                failed.append(f"{file.name} | {entry['error']}")
+                print(f"Skipped (failed before, unchanged): {safe_console(file.name)}")
+                continue
+            elif out_path.exists():
+                manifest[file.name] = entry
+                if entry.get("error"):
+                    failed.append(f"{file.name} | {entry['error']}")
+                print(f"Unchanged: {safe_console(file.name)}")
+                continue
+
+        digests[file.name] = digest
+        pending.append(file)
+
+    for name, entry in old_manifest.items():
+        if name not in manifest and name not in digests and entry.get("text_file"):
+            (OUT_DIR / str(entry["text_file"])).unlink(missing_ok=True)
+            print(f"Removed: {safe_console(entry['text_file'])}")
+
+    if MAX_RSS_MB and not rss_guard_available():
+        print("Warning: cannot measure worker memory on this platform (install psutil); EXTRACT_MAX_RSS_MB is disabled.")
+
+    print(
+        f"To extract: {len(pending)} of {len(files)} "
+        f"(workers={min(WORKERS, max(len(pending), 1))}, timeout={FILE_TIMEOUT_SEC:.0f}s, "
+        f"max_pages={MAX_PDF_PAGES}, max_rss={MAX_RSS_MB}MB)"
+    )
+
+    for file, text, err, note in run_extraction(pending):
         print(f"Processing: {safe_console(file.name)}")
-        try:
-            if file.suffix.lower() == ".pdf":
-                text = extract_from_pdf(file)
-            else:
-                text = extract_from_docx(file)
+        entry = {"sha256": digests[file.name]}
 
-            if not text.strip():
-                raise ValueError("Empty text extracted")
+        if err is None and not text:
+            err = "ValueError: Empty text extracted"
 
-            out_path = OUT_DIR / f"{file.stem}.txt"
-            out_path.write_text(text, encoding="utf-8")
-            print(f"Extracted: {safe_console(out_path.name)}")
+        if err is not None:
+            failed.append(f"{file.name} | {err}")
+            entry["error"] = err
+            print(f"Failed: {safe_console(file.name)} | {safe_console(err)}")
+            if not text:
+                (OUT_DIR / f"{file.stem}.txt").unlink(missing_ok=True)
+                manifest[file.name] = entry
+                continue
 
-        except (PdfStreamError, PdfReadError, ValueError) as e:
-            failed.append(f"{file.name} | {type(e).__name__}: {e}")
-            print(f"Failed: {safe_console(file.name)} | {type(e).__name__}: {e}")
-        except Exception as e:
-            failed.append(f"{file.name} | {type(e).__name__}: {e}")
-            print(f"Failed: {safe_console(file.name)} | {type(e).__name__}: {e}")
+        out_path = OUT_DIR / f"{file.stem}.txt"
+        out_path.write_text(text, encoding="utf-8")
+        entry.update({"text_file": out_path.name, "chars": len(text)})
+        if note:
+            entry["note"] = note
+        manifest[file.name] = entry
+        print(f"Extracted: {safe_console(out_path.name)}" + (f" ({safe_console(note)})" if note else ""))
+
+    save_manifest(manifest)
+
+    texts = {
+        Path(e["text_file"]).stem: (e["sha256"], OUT_DIR / e["text_file"])
+        for e in manifest.values()
+        if e.get("text_file") and (OUT_DIR / e["text_file"]).exists()
+    }
+    duplicates = update_dedupe(texts)
+    print(f"Near-duplicates: {len(duplicates)} of {len(texts)} CVs (threshold={DEDUPE_THRESHOLD})")
+    for name, (canonical, sim) in sorted(duplicates.items()):
+        print(f"  {safe_console(name)} -> {safe_console(canonical)} ({sim:.2f})")
 
+    failed_path = OUT_DIR / "_failed.txt"
     if failed:
-        (OUT_DIR / "_failed.txt").write_text("\n".join(failed), encoding="utf-8")
-        print(f"Failed files: {len(failed)} (see {safe_console(str(OUT_DIR / '_failed.txt'))})")
+        failed_path.write_text("\n".join(failed), encoding="utf-8")
+        print(f"Failed files: {len(failed)} (see {safe_console(str(failed_path))})")
+    else:
+        failed_path.unlink(missing_ok=True)
 
 
 if __name__ == "__main__":
-    process_files()
\ No newline at end of file
+    process_files()
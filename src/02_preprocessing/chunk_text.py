@@ -1,11 +1,39 @@
 from pathlib import Path
+import hashlib
+import os
 import re
+import sys
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from src.dedupe.minhash import load_duplicates
+from src.embeddings.hash_embedder import TOKEN_RE
+from src.store.chunk_store import ChunkStore
 
 IN_DIR = Path("data/outputs/extracted_text")
 OUT_DIR = Path("data/outputs/chunks")
 
+CHUNK_MODE = os.getenv("CHUNK_MODE", "fixed")
 CHUNK_SIZE = 1200
 OVERLAP = 150
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "220"))
+CHUNK_MIN_TOKENS = int(os.getenv("CHUNK_MIN_TOKENS", "120"))
+
+_UNIT_RE = re.compile(r"[^\n]+?(?:[.!?\u061F](?=\s)|$)", re.MULTILINE)
+_HEADING_RE = re.compile(
+    r"^[^\w\u0600-\u06FF]*"
+    r"(?:(?:professional|technical|work|key|core|academic|relevant|personal|career)\s+)?"
+    r"(?:experience|experiences|employment(?:\s+history)?|work\s+history|education|qualifications|"
+    r"skills|competencies|summary|profile|objective|about\s+me|projects|certifications?|certificates|"
+    r"courses|training|languages|publications|awards|achievements|volunteering|interests|references|"
+    r"الخبرات|الخبرة|الخبرة العملية|الخبرات العملية|التعليم|المؤهلات|المؤهلات العلمية|المهارات|"
+    r"المهارات التقنية|المشاريع|الشهادات|اللغات|الملخص|نبذة|نبذة عني|الهدف|الدورات|الدورات التدريبية|"
+    r"التدريب|الجوائز|المراجع|الاهتمامات)"
+    r"\s*:?\s*$",
+    re.IGNORECASE | re.MULTILINE,
+)
 
 
 def safe_console(text: str) -> str:
@@ -19,29 +47,106 @@ def normalize_text(t: str) -> str:
     return t.strip()
 
 
-def chunk_text(text: str):
+def chunk_spans(text: str) -> list[tuple[int, int, str]]:
     text = normalize_text(text)
     if not text:
         return []
 
-    chunks = []
+    spans = []
     start = 0
     n = len(text)
 
     while start < n:
         end = min(start + CHUNK_SIZE, n)
-        chunk = text[start:end].strip()
+        raw = text[start:end]
+        chunk = raw.strip()
         if chunk:
-            chunks.append(chunk)
+            s = start + len(raw) - len(raw.lstrip())
+            spans.append((s, s + len(chunk), chunk))
         if end >= n:
             break
         start = max(0, end - OVERLAP)
 
-    return chunks
+    return spans
+
+
+def _units(text: str, start: int, end: int) -> list[tuple[int, int, int]]:
+    units = []
+    for m in _UNIT_RE.finditer(text, start, end):
+        s, e = m.start(), m.end()
+        while s < e and text[s].isspace():
+            s += 1
+        if s >= e:
+            continue
+        tokens = list(TOKEN_RE.finditer(text, s, e))
+        if len(tokens) <= CHUNK_TOKENS:
+            units.append((s, e, len(tokens)))
+            continue
+        for i in range(0, len(tokens), CHUNK_TOKENS):
+            part = tokens[i : i + CHUNK_TOKENS]
+            ps = s if i == 0 else part[0].start()
+            pe = e if i + CHUNK_TOKENS >= len(tokens) else part[-1].end()
+            units.append((ps, pe, len(part)))
+    return units
+
+
+def section_spans(text: str) -> list[tuple[int, int, str]]:
+    text = normalize_text(text)
+    if not text:
+        return []
+
+    bounds = sorted({0, *(m.start() for m in _HEADING_RE.finditer(text))})
+    bounds.append(len(text))
+
+    spans = []
+    cur_start, cur_end, cur_tokens = None, None, 0
+
+    def emit():
+        if cur_start is not None:
+            chunk = text[cur_start:cur_end].strip()
+            if chunk:
+                spans.append((cur_start, cur_start + len(chunk), chunk))
+
+    for sec_start, sec_end in zip(bounds, bounds[1:]):
+        if cur_start is not None and cur_tokens >= CHUNK_MIN_TOKENS:
+            emit()
+            cur_start, cur_end, cur_tokens = None, None, 0
+
+        for s, e, n in _units(text, sec_start, sec_end):
+            if cur_start is not None and cur_tokens + n > CHUNK_TOKENS:
+                emit()
+                cur_start, cur_end, cur_tokens = None, None, 0
+            if cur_start is None:
+                cur_start = s
+            cur_end = e
+            cur_tokens += n
+
+    emit()
+    return spans
+
+
+def make_spans(text: str) -> list[tuple[int, int, str]]:
+    if CHUNK_MODE == "fixed":
+        return chunk_spans(text)
+    return section_spans(text)
+
+
+def chunk_text(text: str):
+    return [chunk for _, _, chunk in make_spans(text)]
+
+
+def doc_hash(text: str) -> str:
+    if CHUNK_MODE == "fixed":
+        params = f"fixed:{CHUNK_SIZE}:{OVERLAP}"
+    else:
+        params = f"sections:{CHUNK_TOKENS}:{CHUNK_MIN_TOKENS}"
+    key = f"{params}:text\n{text}"
+    return hashlib.sha1(key.encode("utf-8", errors="ignore")).hexdigest()
 
 
 def process_all():
     OUT_DIR.mkdir(parents=True, exist_ok=True)
+    store = ChunkStore(OUT_DIR)
 
     files = sorted(
         [
@@ -52,15 +157,32 @@ def process_all():
         key=lambda p: p.name.lower(),
     )
 
+    duplicates = load_duplicates()
+    current = set()
     for file in files:
+        if file.stem in duplicates:
+            print(f"Duplicate of {safe_console(duplicates[file.stem])}: skipped {safe_console(file.name)}")
+            continue
+        source = f"{file.stem}_chunks"
+        current.add(source)
+
         text = file.read_text(encoding="utf-8", errors="replace")
-        chunks = chunk_text(text)
+        h = doc_hash(text)
+        if store.doc_hash(source) == h:
+            print(f"Unchanged: {safe_console(file.name)}")
+            continue
+
+        n = store.write_source(source, make_spans(text), doc_hash=h, text=normalize_text(text))
+        print(f"Chunked: {safe_console(file.name)} -> {n} chunks")
 
-        out_file = OUT_DIR / f"{file.stem}_chunks.txt"
-        out_file.write_text("\n\n---\n\n".join(chunks), encoding="utf-8")
+    for source in store.sources():
+        if source not in current:
+            store.remove_source(source)
+            print(f"Removed: {safe_console(source)}")
 
-        print(f"Chunked: {safe_console(file.name)} -> {len(chunks)} chunks")
+    store.flush()
+    print(f"Chunk store: {safe_console(str(store.path))} ({len(store.sources())} CVs, {len(store)} chunks)")
 
 
 if __name__ == "__main__":
-    process_all()
\ No newline at end of file
+    process_all()
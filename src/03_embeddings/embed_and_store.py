@@ -2,135 +2,132 @@ from __future__ import annotations
 
 import os
 import sys
-import types
-import logging
 from pathlib import Path
-import hashlib
-import re
-import unicodedata
 
-os.environ["ANONYMIZED_TELEMETRY"] = "False"
-os.environ["CHROMA_TELEMETRY"] = "False"
-os.environ["POSTHOG_DISABLED"] = "1"
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
 
-logging.getLogger("chromadb").setLevel(logging.CRITICAL)
-logging.getLogger("posthog").setLevel(logging.CRITICAL)
-
-dummy = types.ModuleType("posthog")
-dummy.capture = lambda *args, **kwargs: None
-dummy.identify = lambda *args, **kwargs: None
-dummy.flush = lambda *args, **kwargs: None
-sys.modules["posthog"] = dummy
-
-import chromadb
-from chromadb.config import Settings
 import numpy as np
 
+from src.embeddings.backends import get_embedder
+from src.embeddings.cache import EmbeddingCache
+from src.embeddings.hash_embedder import EmbedderMismatchError, check_fingerprint
+from src.lexical.bm25 import ensure_index
+from src.store.chunk_store import ChunkStore
+from src.vectorindex.backends import as_embeddings, lexical_dir, open_index, persist_index, storage_matches
 
-CHUNKS_DIR = Path("data/outputs/chunks")
-PERSIST_DIR = "data/vectorstore"
-COLLECTION_NAME = "resume_chunks"
-
-EMBED_DIM = 384
-_SEPARATOR_RE = re.compile(r"\n\s*---\s*\n", re.MULTILINE)
-
-_AR_DIACRITICS_RE = re.compile(r"[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED]")
-_TOKEN_RE = re.compile(r"[\w\u0600-\u06FF]+", re.UNICODE)
-
-_AR_MAP = str.maketrans({
-    "أ": "ا",
-    "إ": "ا",
-    "آ": "ا",
-    "ٱ": "ا",
-    "ى": "ي",
-    "ؤ": "و",
-    "ئ": "ي",
-    "ـ": "",
-})
-
-
-def normalize_text(text: str) -> str:
-    t = unicodedata.normalize("NFKC", text or "")
-    t = t.translate(_AR_MAP)
-    t = _AR_DIACRITICS_RE.sub("", t)
-    t = t.lower()
-    return t
 
+CHUNKS_DIR = Path("data/outputs/chunks")
 
-def tokenize(text: str) -> list[str]:
-    return _TOKEN_RE.findall(normalize_text(text))
+EMBED_BATCH = 256
+GET_PAGE = 5000
+INDEX_MODE = os.getenv("INDEX_MODE", "incremental")
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector")
 
 
-def hash_embed(text: str, dim: int = EMBED_DIM) -> list[float]:
-    tokens = tokenize(text)
-    v = np.zeros(dim, dtype=np.float32)
+def embed_with_cache(embedder, cache: EmbeddingCache, texts: list[str], hashes: list[str]) -> np.ndarray:
+    vecs, found = cache.lookup(hashes)
+    missing = np.flatnonzero(~found)
+    if len(missing):
+        fresh = np.asarray(embedder.embed([texts[i] for i in missing]), dtype=np.float32)
+        vecs[missing] = fresh
+        cache.store([hashes[i] for i in missing], fresh)
+    return vecs
 
-    for tok in tokens:
-        h = hashlib.md5(tok.encode("utf-8", errors="ignore")).digest()
-        idx = int.from_bytes(h[:4], "little") % dim
-        sign = 1.0 if (h[4] % 2 == 0) else -1.0
-        v[idx] += sign
 
-    norm = float(np.linalg.norm(v))
-    if norm > 0:
-        v /= norm
+def existing_hashes(collection) -> dict[str, str]:
+    out = {}
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=GET_PAGE, offset=offset)
+        ids = page.get("ids") or []
+        for doc_id, meta in zip(ids, page.get("metadatas") or []):
+            out[doc_id] = (meta or {}).get("content_hash", "")
+        if len(ids) < GET_PAGE:
+            return out
+        offset += len(ids)
 
-    return v.tolist()
 
+def open_collection(fingerprint: str, full: bool):
+    if full:
+        return open_index(fingerprint, reset=True)
 
-def split_chunks(text: str) -> list[str]:
-    raw = (text or "").strip()
-    if not raw:
-        return []
-    parts = _SEPARATOR_RE.split(raw)
-    return [p.strip() for p in parts if p.strip()]
+    collection = open_index(fingerprint, create=True)
+    try:
+        check_fingerprint(collection.metadata, fingerprint)
+    except EmbedderMismatchError as e:
+        print(f"{e} Rebuilding.")
+        return open_index(fingerprint, reset=True)
+    if not storage_matches(collection):
+        print("Vector storage settings changed. Rebuilding.")
+        return open_index(fingerprint, reset=True)
+    return collection
 
 
 def main() -> None:
-    client = chromadb.Client(
-        Settings(
-            persist_directory=PERSIST_DIR,
-            is_persistent=True,
-            anonymized_telemetry=False,
+    embedder = get_embedder()
+    fingerprint = embedder.fingerprint()
+    full = INDEX_MODE == "full"
+    collection = open_collection(fingerprint, full)
+    cache = EmbeddingCache(fingerprint, embedder.dim)
+
+    existing = {} if full else existing_hashes(collection)
+    store = ChunkStore(CHUNKS_DIR)
+
+    ids, docs, metas = [], [], []
+    seen = set()
+    total = upserted = 0
+
+    def flush_batch():
+        embs = as_embeddings(collection, embed_with_cache(embedder, cache, docs, [m["content_hash"] for m in metas]))
+        collection.upsert(ids=ids, documents=docs, embeddings=embs, metadatas=metas)
+
+    for ch in store.iter_chunks():
+        total += 1
+        seen.add(ch.chunk_id)
+        if existing.get(ch.chunk_id) == ch.content_hash:
+            continue
+
+        ids.append(ch.chunk_id)
+        docs.append(ch.text)
+        metas.append(
+            {
+                "source": ch.source,
+                "chunk_index": ch.chunk_index,
+                "start": ch.start,
+                "end": ch.end,
+                "content_hash": ch.content_hash,
+            }
         )
-    )
+        upserted += 1
 
-    try:
-        collection = client.get_collection(COLLECTION_NAME)
-    except Exception:
-        collection = client.create_collection(COLLECTION_NAME, metadata={"hnsw:space": "cosine"})
-
-    ids, docs, embs, metas = [], [], [], []
-    total = 0
-
-    files = sorted([p for p in CHUNKS_DIR.glob("*_chunks.txt") if p.is_file()], key=lambda p: p.name.lower())
-
-    for f in files:
-        source = f.stem
-        text = f.read_text(encoding="utf-8", errors="replace")
-        chunks = split_chunks(text)
-
-        for i, ch in enumerate(chunks):
-            doc_id = f"{source}::{i}"
-            ids.append(doc_id)
-            docs.append(ch)
-            embs.append(hash_embed(ch))
-            metas.append({"source": source, "chunk_index": i})
-            total += 1
-
-            if len(ids) >= 256:
-                collection.add(ids=ids, documents=docs, embeddings=embs, metadatas=metas)
-                ids, docs, embs, metas = [], [], [], []
+        if len(ids) >= EMBED_BATCH:
+            flush_batch()
+            ids, docs, metas = [], [], []
 
     if ids:
-        collection.add(ids=ids, documents=docs, embeddings=embs, metadatas=metas)
-
-    try:
-        client.persist()
-    except Exception:
-        pass
-
-    print(f"Total chunks: {total}")
+        flush_batch()
+
+    stale = [doc_id for doc_id in existing if doc_id not in seen]
+    for i in range(0, len(stale), GET_PAGE):
+        collection.delete(ids=stale[i : i + GET_PAGE])
+
+    cache.flush()
+    persist_index(collection)
+
+    print(f"Embedder: {fingerprint}")
+    print(f"Index mode: {'full' if full else 'incremental'}")
+    print(f"Total chunks: {total} (upserted={upserted}, deleted={len(stale)}, unchanged={total - upserted})")
+    print(f"Embedding cache: {cache.stats()}")
+    if RETRIEVAL_MODE == "hybrid":
+        lexical, rebuilt = ensure_index(store, lexical_dir(), force=full)
+        print(
+            f"Lexical index: {len(lexical)} chunks, {len(lexical.terms)} terms, "
+            f"{lexical.nbytes() / (1 << 20):.1f} MiB ({'rebuilt' if rebuilt else 'unchanged'})"
+        )
+    else:
+        print(f"Lexical index: skipped (RETRIEVAL_MODE={RETRIEVAL_MODE})")
     try:
         print(f"Collection size: {collection.count()}")
     except Exception:
@@ -138,4 +135,4 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -2,74 +2,54 @@ from __future__ import annotations
 
 import os
 import sys
-import types
-import hashlib
-import re
 from pathlib import Path
-import logging
 
-os.environ["ANONYMIZED_TELEMETRY"] = "False"
-os.environ["CHROMA_TELEMETRY"] = "False"
-os.environ["POSTHOG_DISABLED"] = "1"
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
 
-logging.getLogger("chromadb").setLevel(logging.CRITICAL)
-logging.getLogger("posthog").setLevel(logging.CRITICAL)
-
-dummy = types.ModuleType("posthog")
-dummy.capture = lambda *args, **kwargs: None
-dummy.identify = lambda *args, **kwargs: None
-dummy.flush = lambda *args, **kwargs: None
-sys.modules["posthog"] = dummy
-
-import chromadb
-from chromadb.config import Settings
-import numpy as np
+from src.embeddings.backends import get_embedder
+from src.embeddings.hash_embedder import check_fingerprint
+from src.ranking.hybrid import rrf_lists
+from src.vectorindex.backends import open_index, open_lexical
 
 
 JD_FILE = Path("data/samples/jd/job.txt")
-PERSIST_DIR = "data/vectorstore"
-COLLECTION_NAME = "resume_chunks"
 TOP_K = 5
-EMBED_DIM = 384
-
-_TOKEN_RE = re.compile(r"[A-Za-z0-9_]+", re.UNICODE)
-
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector")
+HYBRID_CANDIDATES = 50
 
-def tokenize(text: str) -> list[str]:
-    return _TOKEN_RE.findall(text.lower())
 
+def hybrid_results(collection, q_emb, jd_text: str, k: int) -> None:
+    n = min(max(k, HYBRID_CANDIDATES), collection.count())
+    vector = collection.query(query_embeddings=[q_emb], n_results=n, include=["distances"])
+    lexical = open_lexical().search(jd_text, n)
+    dist = dict(zip(vector["ids"][0], vector["distances"][0]))
+    bm25 = dict(lexical)
 
-def hash_embed(text: str, dim: int = EMBED_DIM) -> list[float]:
-    tokens = tokenize(text)
-    v = np.zeros(dim, dtype=np.float32)
+    fused = rrf_lists([vector["ids"][0], [doc_id for doc_id, _ in lexical]])[:k]
+    found = collection.get(ids=[doc_id for doc_id, _ in fused], include=["documents", "metadatas"])
+    rows = {doc_id: (doc, meta) for doc_id, doc, meta in zip(found["ids"], found["documents"], found["metadatas"])}
 
-    for tok in tokens:
-        h = hashlib.md5(tok.encode()).digest()
-        idx = int.from_bytes(h[:4], "little") % dim
-        sign = 1.0 if (h[4] % 2 == 0) else -1.0
-        v[idx] += sign
-
-    norm = float(np.linalg.norm(v))
-    if norm > 0:
-        v /= norm
-
-    return v.tolist()
+    for i, (doc_id, score) in enumerate(fused, start=1):
+        doc, meta = rows.get(doc_id, ("", {}))
+        d = f"{dist[doc_id]:.4f}" if doc_id in dist else "-"
+        b = f"{bm25[doc_id]:.2f}" if doc_id in bm25 else "-"
+        print(f"{i}. {meta.get('source', doc_id)} | rrf={score:.4f} dist={d} bm25={b}")
+        print((doc or "")[:400])
 
 
 def main() -> None:
     jd_text = JD_FILE.read_text(encoding="utf-8").strip()
-    q_emb = hash_embed(jd_text)
-
-    client = chromadb.Client(
-        Settings(
-            persist_directory=PERSIST_DIR,
-            is_persistent=True,
-            anonymized_telemetry=False,
-        )
-    )
+    embedder = get_embedder()
+    q_emb = embedder.embed_one(jd_text)
 
-    collection = client.get_collection(COLLECTION_NAME)
+    collection = open_index()
+    check_fingerprint(collection.metadata, embedder.fingerprint())
     effective_k = min(TOP_K, collection.count())
+    if RETRIEVAL_MODE == "hybrid":
+        hybrid_results(collection, q_emb, jd_text, effective_k)
+        return
 
     results = collection.query(
         query_embeddings=[q_emb],
@@ -83,7 +63,7 @@ def main() -> None:
 
     for i, (doc, meta, dist) in enumerate(zip(docs, metas, dists), start=1):
         print(f"{i}. {meta['source']} | {dist:.4f}")
-        print(doc[:400])
+        print((doc or "")[:400])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+import numpy as np
+
+from src.skills.index import SkillIndex, n_words, to_bits
+from src.skills.matcher import SKILLS_FILE, SkillMatcher, load_dictionary
+from src.store.chunk_store import ChunkStore
+
+
+CHUNKS_DIR = Path("data/outputs/chunks")
+SKILLS_DIR = Path("data/outputs/skills")
+TOP_SKILLS = 15
+
+
+def safe_console(text: str) -> str:
+    return str(text).encode("ascii", "backslashreplace").decode("ascii")
+
+
+def cv_text(store: ChunkStore, source: str) -> str:
+    text = store.read_text(source)
+    if text is None:
+        text = "\n".join(ch.text for ch in store.iter_chunks([source]))
+    return text
+
+
+def main() -> None:
+    matcher = SkillMatcher(load_dictionary(SKILLS_FILE))
+    store = ChunkStore(CHUNKS_DIR)
+    prev = SkillIndex.load(SKILLS_DIR)
+    if prev is not None and prev.fingerprint != matcher.fingerprint:
+        print("Skills dictionary changed. Re-matching all CVs.")
+        prev = None
+
+    sources = store.sources()
+    doc_hashes = [store.doc_hash(s) for s in sources]
+    words = n_words(len(matcher))
+    bits = np.zeros((len(sources), words), dtype=np.uint64)
+
+    matched = 0
+    started = time.perf_counter()
+    for i, (source, h) in enumerate(zip(sources, doc_hashes)):
+        if prev is not None and h and prev.doc_hash(source) == h:
+            bits[i] = prev.row(source)
+            continue
+        bits[i] = to_bits(matcher.find_ids(cv_text(store, source)), words)
+        matched += 1
+    took = time.perf_counter() - started
+
+    index = SkillIndex(matcher.skills, matcher.fingerprint, sources, doc_hashes, bits)
+    index.save(SKILLS_DIR)
+
+    counts = np.unpackbits(bits.astype("<u8").view(np.uint8), axis=1, bitorder="little").sum(axis=0)[: len(matcher)]
+    print(safe_console(f"Skills dictionary: {SKILLS_FILE} ({len(matcher)} skills)"))
+    print(f"Skills index: {len(sources)} CVs (matched={matched}, unchanged={len(sources) - matched}) in {took:.2f}s")
+    for sid in np.argsort(-counts, kind="stable")[:TOP_SKILLS]:
+        if counts[sid]:
+            print(safe_console(f"  {matcher.skills[sid]}: {counts[sid]}"))
+    print(safe_console(f"Saved: {SKILLS_DIR}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,152 +1,312 @@
 from __future__ import annotations
 
+import csv
 import os
+import re
 import sys
-import types
-import logging
+import time
 from pathlib import Path
 from datetime import datetime
-import unicodedata
-import re
-import hashlib
-
-os.environ["ANONYMIZED_TELEMETRY"] = "False"
-os.environ["CHROMA_TELEMETRY"] = "False"
-os.environ["POSTHOG_DISABLED"] = "1"
 
-logging.getLogger("chromadb").setLevel(logging.CRITICAL)
-logging.getLogger("posthog").setLevel(logging.CRITICAL)
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
 
-dummy = types.ModuleType("posthog")
-dummy.capture = lambda *args, **kwargs: None
-dummy.identify = lambda *args, **kwargs: None
-dummy.flush = lambda *args, **kwargs: None
-sys.modules["posthog"] = dummy
-
-import chromadb
-from chromadb.config import Settings
 import numpy as np
 import pandas as pd
 
+from src.dedupe.minhash import load_duplicates
+from src.embeddings.backends import get_embedder
+from src.embeddings.hash_embedder import check_fingerprint
+from src.ranking.grouped import rank_grouped, rank_per_source
+from src.ranking.hybrid import hybrid_key
+from src.ranking.incremental import jd_hash, load_state, rank_changes, save_state, stale_sources, state_key
+from src.ranking.streaming import rank_streaming, rank_streaming_batch, top_k
+from src.skills.index import SkillIndex
+from src.skills.matcher import SKILLS_FILE, SkillMatcher, load_dictionary
+from src.vectorindex.backends import open_index, open_lexical
+from src.store.chunk_store import ChunkStore
+from src.store.results_db import ResultsDB
+
 
 JD_FILE = Path("data/samples/jd/job.txt")
 CHUNKS_DIR = Path("data/outputs/chunks")
-PERSIST_DIR = "data/vectorstore"
-COLLECTION_NAME = "resume_chunks"
 
-EMBED_DIM = 384
 TOP_N = 2
-
-_AR_DIACRITICS_RE = re.compile(r"[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED]")
-_TOKEN_RE = re.compile(r"[\w\u0600-\u06FF]+", re.UNICODE)
-
-_AR_MAP = str.maketrans({
-    "أ": "ا",
-    "إ": "ا",
-    "آ": "ا",
-    "ٱ": "ا",
-    "ى": "ي",
-    "ؤ": "و",
-    "ئ": "ي",
-    "ـ": "",
-})
+RANK_MODE = os.getenv("RANK_MODE", "stream")
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector")
+RANK_TOP_K = int(os.getenv("RANK_TOP_K", "100"))
+RANK_FULL_CSV = os.getenv("RANK_FULL_CSV", "0") == "1"
+FULL_CSV_NAME = "ranking_full.csv"
+RANK_JD_DIR = os.getenv("RANK_JD_DIR", "")
+BATCH_DIR = Path("data/outputs/ranking/batch")
+BATCH_JD_PREFIX = "batch:"
+COLUMNS = ["cv_source", "avg_distance_topN", "score", "duplicate_of"]
+RANK_INCREMENTAL = os.getenv("RANK_INCREMENTAL", "1") == "1"
+INCREMENTAL_MAX_SHARE = 0.2
+INCREMENTAL_MIN_SOURCES = 20
+STATE_FILE = Path("data/outputs/ranking/ranking_state.json")
+SKILLS_DIR = Path("data/outputs/skills")
+MUST_HAVE_FILE = Path("data/samples/must_have.txt")
+RANK_MUST_HAVE = os.getenv("RANK_MUST_HAVE", "")
 
 
 def safe_console(text: str) -> str:
     return str(text).encode("ascii", "backslashreplace").decode("ascii")
 
 
-def normalize_text(text: str) -> str:
-    t = unicodedata.normalize("NFKC", text or "")
-    t = t.translate(_AR_MAP)
-    t = _AR_DIACRITICS_RE.sub("", t)
-    t = t.lower()
-    return t
-
-
-def tokenize(text: str) -> list[str]:
-    return _TOKEN_RE.findall(normalize_text(text))
-
-
-def hash_embed(text: str, dim: int = EMBED_DIM) -> list[float]:
-    tokens = tokenize(text)
-    v = np.zeros(dim, dtype=np.float32)
-
-    for tok in tokens:
-        h = hashlib.md5(tok.encode("utf-8", errors="ignore")).digest()
-        idx = int.from_bytes(h[:4], "little") % dim
-        sign = 1.0 if (h[4] % 2 == 0) else -1.0
-        v[idx] += sign
-
-    norm = float(np.linalg.norm(v))
-    if norm > 0:
-        v /= norm
-
-    return v.tolist()
-
-
-def main() -> None:
-    jd_text = JD_FILE.read_text(encoding="utf-8", errors="replace").strip()
-    q_emb = hash_embed(jd_text)
-
-    client = chromadb.Client(
-        Settings(
-            persist_directory=PERSIST_DIR,
-            is_persistent=True,
-            anonymized_telemetry=False,
+def ranking_row(source: str, avg_distance: float) -> dict:
+    score = 1 / (1 + avg_distance)
+    return {
+        "cv_source": source,
+        "avg_distance_topN": round(float(avg_distance), 4),
+        "score": round(float(score), 4),
+    }
+
+
+def duplicate_sources() -> dict[str, list[str]]:
+    out: dict[str, list[str]] = {}
+    for dup, canonical in sorted(load_duplicates().items()):
+        out.setdefault(f"{canonical}_chunks", []).append(f"{dup}_chunks")
+    return out
+
+
+def with_duplicates(rows: list[dict], duplicates: dict[str, list[str]]) -> list[dict]:
+    out = []
+    for row in rows:
+        out.append(row)
+        for dup in duplicates.get(row["cv_source"], []):
+            out.append({**row, "cv_source": dup, "duplicate_of": row["cv_source"]})
+    return out
+
+
+def write_full_csv(path: Path, names: list[str], avg: np.ndarray, order_key: np.ndarray) -> None:
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["rank", "cv_source", "avg_distance_topN", "score"])
+        for rank, i in enumerate(top_k(order_key, 0), start=1):
+            row = ranking_row(names[i], avg[i])
+            writer.writerow([rank, row["cv_source"], row["avg_distance_topN"], row["score"]])
+
+
+def load_jds(jd_dir: Path) -> list[tuple[str, str]]:
+    jds = []
+    for path in sorted(jd_dir.rglob("*.txt")):
+        text = path.read_text(encoding="utf-8", errors="replace").strip()
+        if text:
+            jds.append((path.relative_to(jd_dir).with_suffix("").as_posix(), text))
+    return jds
+
+
+def must_have_terms() -> list[str]:
+    raw = RANK_MUST_HAVE
+    if not raw and MUST_HAVE_FILE.exists():
+        raw = MUST_HAVE_FILE.read_text(encoding="utf-8", errors="replace")
+    return [t.strip() for t in re.split(r"[,;\n\u060C\u061B]", raw) if t.strip()]
+
+
+def prune_must_have(store: ChunkStore, sources: list[str], terms: list[str]) -> list[str]:
+    index = SkillIndex.load(SKILLS_DIR)
+    if index is None:
+        raise FileNotFoundError(f"Skills index not found in {SKILLS_DIR}. Run src/06_skills/extract_skills.py first.")
+    matcher = SkillMatcher(load_dictionary(SKILLS_FILE))
+    if matcher.fingerprint != index.fingerprint:
+        raise ValueError("Skills index was built with a different dictionary. Run src/06_skills/extract_skills.py again.")
+    outdated = [s for s in sources if index.doc_hash(s) != store.doc_hash(s)]
+    if outdated:
+        raise ValueError(f"Skills index is out of date for {len(outdated)} CVs. Run src/06_skills/extract_skills.py again.")
+
+    ids = {term: matcher.resolve(term) for term in terms}
+    unknown = [term for term, sid in ids.items() if sid is None]
+    if unknown:
+        print(safe_console(f"Warning: ignoring unknown must-have skills (not in {SKILLS_FILE}): {', '.join(unknown)}"))
+        ids = {term: sid for term, sid in ids.items() if sid is not None}
+        if not ids:
+            return sources
+
+    started = time.perf_counter()
+    eligible = index.eligible(sources, index.mask(ids.values()))
+    took = time.perf_counter() - started
+    names = sorted({matcher.skills[sid] for sid in ids.values()})
+    print(
+        safe_console(
+            f"Must-have [{', '.join(names)}]: {len(eligible)}/{len(sources)} CVs eligible "
+            f"({took * 1e6 / max(len(sources), 1):.3f} us/CV)"
         )
     )
-
-    collection = client.get_collection(COLLECTION_NAME)
-
-    rows = []
-
-    for file in CHUNKS_DIR.glob("*_chunks.txt"):
-        source = file.stem
-
-        results = collection.query(
-            query_embeddings=[q_emb],
-            n_results=min(10, collection.count()),
-            where={"source": source},
-            include=["distances"],
+    return eligible
+
+
+def run_id() -> str:
+    return datetime.now().isoformat(timespec="microseconds")
+
+
+def rank_batch(embedder, collection, sources: list[str], db: ResultsDB, n_total: int) -> None:
+    wanted = set(sources)
+    jds = load_jds(Path(RANK_JD_DIR))
+    if not jds:
+        raise SystemExit(f"No JD .txt files found in {RANK_JD_DIR}")
+
+    q_embs = np.asarray(embedder.embed([text for _, text in jds]), dtype=np.float32)
+    names, avg = rank_streaming_batch(collection, q_embs, TOP_N, sources if len(sources) < n_total else None)
+    avg[[name not in wanted for name in names]] = np.nan
+    lexical = open_lexical() if RETRIEVAL_MODE == "hybrid" else None
+    duplicates = duplicate_sources()
+
+    BATCH_DIR.mkdir(parents=True, exist_ok=True)
+    tables, summary = [], []
+    for j, (jd_id, text) in enumerate(jds):
+        order_key = avg[:, j] if lexical is None else hybrid_key(names, avg[:, j], lexical.source_scores(text, TOP_N))
+        rows = with_duplicates([ranking_row(names[i], avg[i, j]) for i in top_k(order_key, RANK_TOP_K)], duplicates)
+        n_ranked = int(np.isfinite(avg[:, j]).sum())
+        db.save_run(
+            run_id(),
+            f"{BATCH_JD_PREFIX}{jd_id}",
+            jd_hash(text),
+            ({"rank": r, **row} for r, row in enumerate(rows, start=1)),
+            mode="batch" if lexical is None else "batch+hybrid",
+            top_k=RANK_TOP_K,
+            n_ranked=n_ranked,
         )
-
-        distances = results["distances"][0] if results.get("distances") else []
-        if not distances:
-            continue
-
-        best = sorted(distances)[:TOP_N]
-        avg_distance = sum(best) / len(best)
-        score = 1 / (1 + avg_distance)
-
-        rows.append(
+        df = pd.DataFrame(rows, columns=COLUMNS)
+        df.insert(0, "rank", range(1, len(df) + 1))
+        df.to_csv(BATCH_DIR / f"{jd_id.replace('/', '__')}.csv", index=False, encoding="utf-8-sig")
+
+        df.insert(0, "jd", jd_id)
+        tables.append(df)
+        best = rows[0] if rows else {"cv_source": "", "score": None}
+        summary.append(
             {
-                "cv_source": source,
-                "avg_distance_topN": round(avg_distance, 4),
-                "score": round(score, 4),
+                "jd": jd_id,
+                "ranked": n_ranked,
+                "top_cv": best["cv_source"],
+                "top_score": best["score"],
             }
         )
 
-    df = pd.DataFrame(rows).sort_values(by="score", ascending=False).reset_index(drop=True)
-    df.insert(0, "rank", range(1, len(df) + 1))
+    combined = pd.concat(tables, ignore_index=True)
+    combined.to_csv(BATCH_DIR / "combined.csv", index=False, encoding="utf-8-sig")
+    combined.to_json(BATCH_DIR / "combined.json", orient="records", indent=2, force_ascii=False)
 
-    out_dir = Path("data/outputs/ranking")
-    out_dir.mkdir(parents=True, exist_ok=True)
+    print(
+        f"Batch ranking: {len(jds)} JDs x {len(names)} CVs "
+        f"(RANK_TOP_K={RANK_TOP_K}, retrieval={RETRIEVAL_MODE}) -> {BATCH_DIR}"
+    )
+    print(safe_console(pd.DataFrame(summary).to_string(index=False)))
 
-    csv_path = out_dir / "ranking_results.csv"
-    json_path = out_dir / "ranking_results.json"
 
-    try:
-        df.to_csv(csv_path, index=False, encoding="utf-8-sig")
-        df.to_json(json_path, orient="records", indent=2, force_ascii=False)
-    except PermissionError:
-        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-        csv_path = out_dir / f"ranking_results_{ts}.csv"
-        json_path = out_dir / f"ranking_results_{ts}.json"
-        df.to_csv(csv_path, index=False, encoding="utf-8-sig")
-        df.to_json(json_path, orient="records", indent=2, force_ascii=False)
-        print(safe_console(f"ranking_results.csv locked, wrote: {csv_path.name}"))
+def main() -> None:
+    embedder = get_embedder()
+    collection = open_index()
+    check_fingerprint(collection.metadata, embedder.fingerprint())
+
+    store = ChunkStore(CHUNKS_DIR)
+    all_sources = store.sources()
+    must_have = must_have_terms()
+    sources = prune_must_have(store, all_sources, must_have) if must_have else all_sources
+    with ResultsDB() as db:
+        if RANK_JD_DIR:
+            rank_batch(embedder, collection, sources, db, len(all_sources))
+        else:
+            rank_single(embedder, collection, store, sources, db, len(all_sources), must_have)
+
+
+def rank_single(
+    embedder,
+    collection,
+    store: ChunkStore,
+    sources: list[str],
+    db: ResultsDB,
+    n_total: int,
+    must_have: list[str],
+) -> None:
+    jd_text = JD_FILE.read_text(encoding="utf-8", errors="replace").strip()
+    doc_hashes = {s: store.doc_hash(s) for s in sources}
+    key = state_key(jd_text, embedder.fingerprint(), TOP_N)
+    state = load_state(STATE_FILE)
+    prev = state["sources"] if state and state.get("key") == key else None
+    stale = stale_sources(prev, doc_hashes) if prev is not None else list(sources)
+    incremental = RANK_INCREMENTAL and prev is not None and len(stale) <= max(INCREMENTAL_MIN_SOURCES, len(sources) * INCREMENTAL_MAX_SHARE)
+
+    if incremental:
+        q_emb = state["jd_vector"]
+        fresh = dict(rank_per_source(collection, q_emb, stale, TOP_N))
+        names = [s for s in sources if s in fresh or (s in prev and s not in stale)]
+        avg = np.asarray([fresh[s] if s in fresh else prev[s][1] for s in names], dtype=np.float64)
+        mode = "incremental"
+    else:
+        q_emb = embedder.embed_one(jd_text)
+        if len(sources) < n_total and len(sources) <= max(INCREMENTAL_MIN_SOURCES, n_total * INCREMENTAL_MAX_SHARE):
+            ranked = rank_per_source(collection, q_emb, sources, TOP_N)
+            names = [source for source, _ in ranked]
+            avg = np.asarray([d for _, d in ranked], dtype=np.float64)
+            mode = "per-source"
+        elif RANK_MODE == "grouped":
+            ranked = rank_grouped(collection, q_emb, sources, TOP_N, pruned=len(sources) < n_total)
+            names = [source for source, _ in ranked]
+            avg = np.asarray([d for _, d in ranked], dtype=np.float64)
+            mode = RANK_MODE
+        else:
+            names, avg = rank_streaming(collection, q_emb, TOP_N, sources if len(sources) < n_total else None)
+            avg = np.where([name in doc_hashes for name in names], avg, np.nan)
+            mode = RANK_MODE
+
+    order_key = avg
+    if RETRIEVAL_MODE == "hybrid":
+        order_key = hybrid_key(names, avg, open_lexical().source_scores(jd_text, TOP_N))
+        mode = f"{mode}+hybrid"
+
+    duplicates = duplicate_sources()
+    rows = with_duplicates([ranking_row(names[i], avg[i]) for i in top_k(order_key, RANK_TOP_K)], duplicates)
+    top = [row["cv_source"] for row in rows]
+
+    df = pd.DataFrame(rows, columns=COLUMNS)
+    df.insert(0, "rank", range(1, len(df) + 1))
 
+    n_ranked = int(np.isfinite(avg).sum())
+    changes = rank_changes(state.get("top", []) if state else [], top, stale)
+    changes.update(
+        {
+            "run": run_id(),
+            "mode": mode,
+            "reset": prev is None,
+            "scored": len(stale) if incremental else len(names),
+            "must_have": must_have,
+            "eligible": len(sources),
+        }
+    )
+    db.save_run(
+        changes["run"],
+        JD_FILE.stem,
+        key["jd"],
+        df.to_dict("records"),
+        mode=mode,
+        top_k=RANK_TOP_K,
+        n_ranked=n_ranked,
+        changes=changes,
+    )
+    scores = {s: (h, d) for s, (h, d) in (prev or {}).items() if s not in doc_hashes and store.doc_hash(s) == h}
+    scores.update({names[i]: (doc_hashes[names[i]], avg[i]) for i in np.flatnonzero(np.isfinite(avg))})
+    save_state(STATE_FILE, key, q_emb, scores, top)
+
+    out_dir = Path("data/outputs/ranking")
+    if RANK_FULL_CSV:
+        out_dir.mkdir(parents=True, exist_ok=True)
+        full_path = out_dir / FULL_CSV_NAME
+        write_full_csv(full_path, names, avg, order_key)
+        print(safe_console(f"Full ranking ({n_ranked} CVs): {full_path}"))
+
+    n_dups = int(df["duplicate_of"].notna().sum())
+    print(f"Ranked {n_ranked} CVs, kept top {len(df) - n_dups} (RANK_TOP_K={RANK_TOP_K}, mode={mode}, scored={changes['scored']})")
+    print(safe_console(f"Saved run {changes['run']} to {db.path}"))
+    print(
+        f"Rank changes: entered={len(changes['entered'])} left={len(changes['left'])} "
+        f"moved={len(changes['moved'])} rescored={len(changes['rescored'])}"
+    )
+    if n_dups:
+        print(f"Near-duplicates listed with their canonical CV: {n_dups}")
+    for source in changes["entered"]:
+        print(safe_console(f"  new in top {len(df)}: {source}"))
     try:
         print(df.to_string(index=False))
     except UnicodeEncodeError:
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from src.store.results_db import ResultsDB
+
+
+OUT_DIR = Path("data/outputs/ranking")
+EXPORT_JD = os.getenv("EXPORT_JD", "job")
+EXPORT_RUN = os.getenv("EXPORT_RUN", "")
+
+
+def safe_console(text: str) -> str:
+    return str(text).encode("ascii", "backslashreplace").decode("ascii")
+
+
+def main() -> None:
+    with ResultsDB() as db:
+        if EXPORT_RUN:
+            run = db.run(EXPORT_RUN)
+        else:
+            run = db.latest_run(EXPORT_JD or None)
+        if run is None:
+            raise SystemExit(f"No ranking run found in {db.path}")
+
+        OUT_DIR.mkdir(parents=True, exist_ok=True)
+        run_id = run["run_id"]
+
+        csv_path = OUT_DIR / "ranking_results.csv"
+        json_path = OUT_DIR / "ranking_results.json"
+        try:
+            with open(csv_path, "w", encoding="utf-8-sig", newline="") as f:
+                db.write_ranking_csv(run_id, f)
+            json_path.write_text(db.ranking_json(run_id), encoding="utf-8")
+        except PermissionError:
+            ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+            csv_path = OUT_DIR / f"ranking_results_{ts}.csv"
+            json_path = OUT_DIR / f"ranking_results_{ts}.json"
+            with open(csv_path, "w", encoding="utf-8-sig", newline="") as f:
+                db.write_ranking_csv(run_id, f)
+            json_path.write_text(db.ranking_json(run_id), encoding="utf-8")
+            print(safe_console(f"ranking_results.csv locked, wrote: {csv_path.name}"))
+        (OUT_DIR / "llm_explanations.json").write_text(db.explanations_json(run["jd_hash"]), encoding="utf-8")
+        (OUT_DIR / "ranking_changes.json").write_text(
+            json.dumps(run["changes"], ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+
+        print(safe_console(f"Exported run {run_id} (jd={run['jd_id']}, {db.ranking_count(run_id)} CVs) -> {OUT_DIR}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import json
+import os
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from src.embeddings.hash_embedder import tokenize
+
+
+DEDUPE_DIR = Path("data/outputs/dedupe")
+MANIFEST_FILE = "dedupe.json"
+SIGNATURES_FILE = "signatures.npy"
+
+NUM_PERM = 128
+BANDS = 16
+SHINGLE = 3
+SEED = 1
+HASH = "multiply-shift"
+DEDUPE_THRESHOLD = float(os.getenv("DEDUPE_THRESHOLD", "0.8"))
+
+_SHIFT = np.uint64(32)
+_rng = np.random.default_rng(SEED)
+_A = _rng.integers(0, 1 << 64, NUM_PERM, dtype=np.uint64, endpoint=False) | np.uint64(1)
+_B = _rng.integers(0, 1 << 64, NUM_PERM, dtype=np.uint64, endpoint=False)
+
+
+def params() -> dict:
+    return {"num_perm": NUM_PERM, "bands": BANDS, "shingle": SHINGLE, "seed": SEED, "hash": HASH}
+
+
+def shingle_hashes(text: str) -> np.ndarray:
+    toks = tokenize(text)
+    if not toks:
+        return np.zeros(0, dtype=np.uint64)
+    n = max(1, len(toks) - SHINGLE + 1)
+    grams = {" ".join(toks[i : i + SHINGLE]) for i in range(n)}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+def signature(text: str) -> np.ndarray:
+    x = shingle_hashes(text)
+    if not len(x):
+        return np.full(NUM_PERM, 0xFFFFFFFF, dtype=np.uint32)
+    # Multiply-add-shift over 64-bit words: the wrap-around modulo 2**64 is part of the
+    # hash, and the top 32 bits are kept.
+    hashed = (_A[:, None] * x[None, :] + _B[:, None]) >> _SHIFT
+    return hashed.min(axis=1).astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.mean(a == b))
+
+
+def candidate_pairs(sigs: np.ndarray) -> set[tuple[int, int]]:
+    rows = NUM_PERM // BANDS
+    pairs: set[tuple[int, int]] = set()
+    for band in range(BANDS):
+        buckets: dict[bytes, list[int]] = {}
+        block = np.ascontiguousarray(sigs[:, band * rows : (band + 1) * rows])
+        for i in range(len(block)):
+            buckets.setdefault(block[i].tobytes(), []).append(i)
+        for members in buckets.values():
+            for j in range(1, len(members)):
+                for i in members[:j]:
+                    pairs.add((i, members[j]))
+    return pairs
+
+
+def find_duplicates(
+    names: list[str],
+    sigs: np.ndarray,
+    canonical_before: set[str] | None = None,
+    threshold: float = DEDUPE_THRESHOLD,
+) -> dict[str, tuple[str, float]]:
+    parent = list(range(len(names)))
+
+    def root(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    empty = np.all(sigs == 0xFFFFFFFF, axis=1) if len(sigs) else np.zeros(0, dtype=bool)
+    for i, j in candidate_pairs(sigs):
+        if empty[i] or empty[j]:
+            continue
+        if similarity(sigs[i], sigs[j]) >= threshold:
+            parent[root(j)] = root(i)
+
+    clusters: dict[int, list[int]] = {}
+    for i in range(len(names)):
+        clusters.setdefault(root(i), []).append(i)
+
+    canonical_before = canonical_before or set()
+    out: dict[str, tuple[str, float]] = {}
+    for members in clusters.values():
+        if len(members) < 2:
+            continue
+        canon = min(members, key=lambda i: (names[i] not in canonical_before, names[i].lower(), names[i]))
+        for i in members:
+            if i == canon:
+                continue
+            sim = similarity(sigs[canon], sigs[i])
+            if sim >= threshold:
+                out[names[i]] = (names[canon], sim)
+    return out
+
+
+def load_dedupe(root: Path | str = DEDUPE_DIR) -> tuple[dict, np.ndarray | None]:
+    root = Path(root)
+    try:
+        manifest = json.loads((root / MANIFEST_FILE).read_text(encoding="utf-8"))
+        sigs = np.load(root / SIGNATURES_FILE)
+    except (OSError, ValueError):
+        return {}, None
+    if manifest.get("params") != params() or len(sigs) != len(manifest.get("names", [])):
+        return {}, None
+    return manifest, sigs
+
+
+def save_dedupe(root: Path | str, names: list[str], digests: list[str], sigs: np.ndarray, duplicates: dict) -> None:
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    np.save(root / SIGNATURES_FILE, sigs)
+    manifest = {
+        "params": params(),
+        "threshold": DEDUPE_THRESHOLD,
+        "names": names,
+        "digests": digests,
+        "duplicates": {name: {"canonical": c, "similarity": round(s, 4)} for name, (c, s) in sorted(duplicates.items())},
+    }
+    tmp = root / (MANIFEST_FILE + ".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(root / MANIFEST_FILE)
+
+
+def load_duplicates(root: Path | str = DEDUPE_DIR) -> dict[str, str]:
+    root = Path(root)
+    if not (root / MANIFEST_FILE).exists():
+        return {}
+    try:
+        data = json.loads((root / MANIFEST_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return {name: d["canonical"] for name, d in (data.get("duplicates") or {}).items()}
+
+
+def update_dedupe(texts: dict[str, tuple[str, Path]], root: Path | str = DEDUPE_DIR) -> dict[str, tuple[str, float]]:
+    prev, prev_sigs = load_dedupe(root)
+    prev_pos = {n: i for i, n in enumerate(prev.get("names", []))}
+    prev_digests = prev.get("digests", [])
+    prev_dups = set(prev.get("duplicates") or {})
+
+    names = sorted(texts, key=lambda n: (n.lower(), n))
+    sigs = np.empty((len(names), NUM_PERM), dtype=np.uint32)
+    for k, name in enumerate(names):
+        digest, path = texts[name]
+        i = prev_pos.get(name)
+        if prev_sigs is not None and i is not None and prev_digests[i] == digest:
+            sigs[k] = prev_sigs[i]
+        else:
+            sigs[k] = signature(path.read_text(encoding="utf-8", errors="replace"))
+
+    canonical_before = {n for n in prev_pos if n not in prev_dups}
+    duplicates = find_duplicates(names, sigs, canonical_before)
+    save_dedupe(root, names, [texts[n][0] for n in names], sigs, duplicates)
+    return duplicates
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import hashlib
+import os
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from src.embeddings.hash_embedder import EMBED_DIM, embedder_fingerprint, hash_embed_batch
+
+
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "hash")
+ST_MODEL_PATH = os.getenv("ST_MODEL_PATH", "models/all-MiniLM-L6-v2")
+ST_BATCH_SIZE = int(os.getenv("ST_BATCH_SIZE", "64"))
+ST_THREADS = int(os.getenv("ST_THREADS", "0"))
+ST_PRECISION = os.getenv("ST_PRECISION", "float32")
+
+PRECISIONS = ("float32", "float16", "int8")
+
+
+class Embedder:
+    name = "base"
+    dim = 0
+
+    def fingerprint(self) -> str:
+        raise NotImplementedError
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    def embed_one(self, text: str) -> list[float]:
+        return self.embed([text])[0].astype(np.float32).tolist()
+
+
+class HashEmbedder(Embedder):
+    name = "hash"
+
+    def __init__(self, dim: int = EMBED_DIM):
+        self.dim = dim
+
+    def fingerprint(self) -> str:
+        return embedder_fingerprint(self.dim)
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        return hash_embed_batch(list(texts), self.dim)
+
+
+def quantize(vectors: np.ndarray, precision: str) -> np.ndarray:
+    if precision == "float32":
+        return vectors.astype(np.float32, copy=False)
+    if precision == "float16":
+        return vectors.astype(np.float16)
+    if precision == "int8":
+        scale = np.abs(vectors).max(axis=1, keepdims=True)
+        scale[scale == 0] = 1.0
+        return np.round(vectors / scale * 127.0).astype(np.int8)
+    raise ValueError(f"Unsupported precision: {precision} (expected one of {', '.join(PRECISIONS)})")
+
+
+def _model_digest(model_path: Path) -> str:
+    h = hashlib.sha1()
+    for name in ("config.json", "modules.json", "config_sentence_transformers.json", "sentence_bert_config.json"):
+        p = model_path / name
+        if p.is_file():
+            h.update(name.encode("utf-8"))
+            h.update(p.read_bytes())
+    return h.hexdigest()[:12]
+
+
+class SentenceTransformerEmbedder(Embedder):
+    name = "sentence-transformers"
+
+    def __init__(
+        self,
+        model_path: str | Path = ST_MODEL_PATH,
+        batch_size: int = ST_BATCH_SIZE,
+        threads: int = ST_THREADS,
+        precision: str = ST_PRECISION,
+        model=None,
+    ):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unsupported precision: {precision} (expected one of {', '.join(PRECISIONS)})")
+
+        self.model_path = Path(model_path)
+        self.batch_size = max(1, int(batch_size))
+        self.precision = precision
+
+        if model is None:
+            if not self.model_path.is_dir():
+                raise FileNotFoundError(f"Sentence-transformers model not found: {self.model_path}")
+            import torch
+            from sentence_transformers import SentenceTransformer
+
+            if threads > 0:
+                torch.set_num_threads(int(threads))
+            model = SentenceTransformer(str(self.model_path), device="cpu", local_files_only=True)
+
+        self.model = model
+        self.dim = int(model.get_sentence_embedding_dimension())
+
+    def fingerprint(self) -> str:
+        return (
+            f"{self.name}/{self.model_path.name}/dim={self.dim}"
+            f"/model={_model_digest(self.model_path)}/prec={self.precision}"
+        )
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        texts = list(texts)
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if not texts:
+            return quantize(out, self.precision)
+
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        for i in range(0, len(order), self.batch_size):
+            idx = order[i : i + self.batch_size]
+            vecs = self.model.encode(
+                [texts[j] for j in idx],
+                batch_size=len(idx),
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False,
+            )
+            out[idx] = np.asarray(vecs, dtype=np.float32)
+
+        return quantize(out, self.precision)
+
+
+@lru_cache(maxsize=None)
+def get_embedder(backend: str | None = None) -> Embedder:
+    backend = (backend or EMBED_BACKEND).strip().lower()
+    if backend == "hash":
+        return HashEmbedder()
+    if backend in ("st", "sentence-transformers", "sentence_transformers"):
+        return SentenceTransformerEmbedder()
+    raise ValueError(f"Unknown EMBED_BACKEND: {backend} (expected 'hash' or 'sentence-transformers')")
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import hashlib
+import heapq
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+
+CACHE_DIR = Path(os.getenv("EMBED_CACHE_DIR", "data/cache/embeddings"))
+CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "500000"))
+MIN_CAPACITY = 1024
+
+
+class EmbeddingCache:
+    def __init__(
+        self,
+        fingerprint: str,
+        dim: int,
+        root: Path | str = CACHE_DIR,
+        max_entries: int = CACHE_MAX_ENTRIES,
+    ):
+        self.fingerprint = fingerprint
+        self.dim = int(dim)
+        self.max_entries = max(1, int(max_entries))
+        self.dir = Path(root) / hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:16]
+        self.vec_path = self.dir / "vectors.f32"
+        self.index_path = self.dir / "index.json"
+
+        self.entries: dict[str, list[int]] = {}
+        self.free: list[int] = []
+        self.capacity = 0
+        self.clock = 0
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.vectors = None
+        self._load()
+
+    def _load(self) -> None:
+        if self.index_path.exists() and self.vec_path.exists():
+            try:
+                data = json.loads(self.index_path.read_text(encoding="utf-8"))
+                if data.get("fingerprint") == self.fingerprint and int(data.get("dim", 0)) == self.dim:
+                    capacity = int(data["capacity"])
+                    if self.vec_path.stat().st_size >= capacity * self.dim * 4:
+                        self.entries = {k: [int(v[0]), int(v[1])] for k, v in data["entries"].items()}
+                        self.free = [int(x) for x in data.get("free", [])]
+                        self.capacity = capacity
+                        self.clock = int(data.get("clock", 0))
+            except Exception:
+                self.entries, self.free, self.capacity, self.clock = {}, [], 0, 0
+        if self.capacity:
+            self.vectors = np.memmap(self.vec_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+        if self.capacity > self.max_entries:
+            self._resize(self.max_entries)
+            self.flush()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _compact(self, capacity: int) -> None:
+        if len(self.entries) > capacity:
+            self._evict(len(self.entries) - capacity)
+        used = {slot for slot, _ in self.entries.values()}
+        free = [slot for slot in range(capacity) if slot not in used]
+        moved = [entry for entry in self.entries.values() if entry[0] >= capacity]
+        if moved:
+            src = np.array([entry[0] for entry in moved])
+            dst = np.array(free[-len(moved) :])
+            self.vectors[dst] = self.vectors[src]
+            for entry, slot in zip(moved, dst.tolist()):
+                entry[0] = slot
+            del free[-len(moved) :]
+        self.free = free
+
+    def _resize(self, capacity: int) -> None:
+        if capacity < self.capacity:
+            self._compact(capacity)
+        if self.vectors is not None:
+            self.vectors.flush()
+            self.vectors = None
+        self.dir.mkdir(parents=True, exist_ok=True)
+        with open(self.vec_path, "ab") as f:
+            f.truncate(capacity * self.dim * 4)
+        self.free.extend(range(self.capacity, capacity))
+        self.capacity = capacity
+        self.vectors = np.memmap(self.vec_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+
+    def _evict(self, n: int) -> None:
+        for key, (slot, _) in heapq.nsmallest(n, self.entries.items(), key=lambda kv: kv[1][1]):
+            del self.entries[key]
+            self.free.append(slot)
+            self.evicted += 1
+
+    def lookup(self, hashes: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        out = np.zeros((len(hashes), self.dim), dtype=np.float32)
+        found = np.zeros(len(hashes), dtype=bool)
+        for i, h in enumerate(hashes):
+            entry = self.entries.get(h)
+            if entry is None:
+                continue
+            self.clock += 1
+            entry[1] = self.clock
+            out[i] = self.vectors[entry[0]]
+            found[i] = True
+
+        n_hit = int(found.sum())
+        self.hits += n_hit
+        self.misses += len(hashes) - n_hit
+        return out, found
+
+    def store(self, hashes: list[str], vectors: np.ndarray) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        first = {}
+        for i, h in enumerate(hashes):
+            if h not in self.entries:
+                first.setdefault(h, i)
+        new = list(first.values())[-self.max_entries :]
+        if not new:
+            return
+
+        overflow = len(self.entries) + len(new) - self.max_entries
+        if overflow > 0:
+            self._evict(overflow)
+
+        need = len(new) - len(self.free)
+        if need > 0:
+            target = min(max(self.capacity * 2, self.capacity + need, MIN_CAPACITY), self.max_entries)
+            self._resize(target)
+
+        for i in new:
+            slot = self.free.pop()
+            self.clock += 1
+            self.vectors[slot] = vectors[i]
+            self.entries[hashes[i]] = [slot, self.clock]
+
+    def flush(self) -> None:
+        if self.vectors is None:
+            return
+        self.vectors.flush()
+        data = {
+            "fingerprint": self.fingerprint,
+            "dim": self.dim,
+            "capacity": self.capacity,
+            "clock": self.clock,
+            "entries": self.entries,
+            "free": self.free,
+        }
+        tmp = self.index_path.with_suffix(self.index_path.suffix + ".tmp")
+        tmp.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+        tmp.replace(self.index_path)
+
+    def stats(self) -> str:
+        return f"hits={self.hits} misses={self.misses} evicted={self.evicted} size={len(self.entries)}"
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+
+
+EMBEDDER_NAME = "hash-md5"
+EMBEDDER_VERSION = 1
+EMBED_DIM = 384
+TOKEN_CACHE_SIZE = 1 << 18
+
+_AR_DIACRITICS_RE = re.compile(r"[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED]")
+TOKEN_RE = re.compile(r"[\w\u0600-\u06FF]+", re.UNICODE)
+
+_AR_MAP = str.maketrans({
+    "أ": "ا",
+    "إ": "ا",
+    "آ": "ا",
+    "ٱ": "ا",
+    "ى": "ي",
+    "ؤ": "و",
+    "ئ": "ي",
+    "ـ": "",
+})
+
+
+class EmbedderMismatchError(RuntimeError):
+    pass
+
+
+def normalize_text(text: str) -> str:
+    t = unicodedata.normalize("NFKC", text or "")
+    t = t.translate(_AR_MAP)
+    t = _AR_DIACRITICS_RE.sub("", t)
+    t = t.lower()
+    return t
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_RE.findall(normalize_text(text))
+
+
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def token_slot(tok: str, dim: int = EMBED_DIM) -> tuple[int, float]:
+    h = hashlib.md5(tok.encode("utf-8", errors="ignore")).digest()
+    return int.from_bytes(h[:4], "little") % dim, (1.0 if (h[4] % 2 == 0) else -1.0)
+
+
+def hash_embed_batch(texts: list[str], dim: int = EMBED_DIM) -> np.ndarray:
+    n = len(texts)
+    cells, signs = [], []
+
+    for row, text in enumerate(texts):
+        base = row * dim
+        for tok in tokenize(text):
+            idx, sign = token_slot(tok, dim)
+            cells.append(base + idx)
+            signs.append(sign)
+
+    counts = np.bincount(
+        np.asarray(cells, dtype=np.int64),
+        weights=np.asarray(signs, dtype=np.float64),
+        minlength=n * dim,
+    )
+    out = counts.reshape(n, dim).astype(np.float32)
+
+    norms = np.sqrt(np.einsum("ij,ij->i", out, out))
+    nz = norms > 0
+    out[nz] /= norms[nz, None]
+    return out
+
+
+def hash_embed(text: str, dim: int = EMBED_DIM) -> list[float]:
+    return hash_embed_batch([text], dim)[0].tolist()
+
+
+@lru_cache(maxsize=None)
+def embedder_fingerprint(dim: int = EMBED_DIM) -> str:
+    spec = "\n".join(
+        [
+            TOKEN_RE.pattern,
+            _AR_DIACRITICS_RE.pattern,
+            repr(sorted(_AR_MAP.items())),
+            "NFKC",
+            "lower",
+        ]
+    )
+    digest = hashlib.sha1(spec.encode("utf-8")).hexdigest()[:12]
+    return f"{EMBEDDER_NAME}/v{EMBEDDER_VERSION}/dim={dim}/tok={digest}"
+
+
+def check_fingerprint(metadata: dict | None, expected: str | None = None) -> str | None:
+    expected = expected or embedder_fingerprint()
+    found = (metadata or {}).get("embedder")
+    if found and found != expected:
+        raise EmbedderMismatchError(
+            f"Vector store was built with embedder '{found}' but the current embedder is '{expected}'. "
+            "Rebuild the vector store."
+        )
+    return found
@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from collections import Counter
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+
+from src.embeddings.hash_embedder import embedder_fingerprint, tokenize
+from src.store.chunk_store import Chunk, ChunkStore
+
+
+INDEX_VERSION = 1
+K1 = 1.2
+B = 0.75
+
+MANIFEST_FILE = "manifest.json"
+TERMS_FILE = "terms.json"
+DOCS_FILE = "docs.json"
+OFFSETS_FILE = "offsets.npy"
+POSTINGS_FILE = "postings.npy"
+IMPACTS_FILE = "impacts.npy"
+DOC_SOURCE_FILE = "doc_source.npy"
+
+
+def store_signature(store: ChunkStore) -> str:
+    entries = [
+        [s, store.index[s].get("offset"), store.index[s].get("length"), store.doc_hash(s)] for s in store.sources()
+    ]
+    spec = json.dumps([INDEX_VERSION, K1, B, embedder_fingerprint(), entries], separators=(",", ":"))
+    return hashlib.sha1(spec.encode("utf-8")).hexdigest()
+
+
+def segment_top_n_mean(values: np.ndarray, starts: np.ndarray, n: int) -> np.ndarray:
+    sizes = np.diff(np.append(starts, len(values)))
+    segment = np.repeat(np.arange(len(starts)), sizes)
+    values = np.array(values, dtype=np.float64)
+    total = np.zeros(len(starts), dtype=np.float64)
+    for _ in range(min(n, int(sizes.max(initial=0)))):
+        best = np.maximum.reduceat(values, starts)
+        total += np.where(np.isfinite(best), best, 0.0)
+        hit = np.flatnonzero(values == np.repeat(best, sizes))
+        first = hit[np.append(True, segment[hit][1:] != segment[hit][:-1])]
+        values[first] = -np.inf
+    return total / np.maximum(np.minimum(sizes, n), 1)
+
+
+class BM25Index:
+    def __init__(
+        self,
+        terms: list[str],
+        offsets: np.ndarray,
+        postings: np.ndarray,
+        impacts: np.ndarray,
+        ids: list[str],
+        sources: list[str],
+        doc_source: np.ndarray,
+        signature: str = "",
+    ):
+        self.terms = terms
+        self.term_id = {t: i for i, t in enumerate(terms)}
+        self.offsets = offsets
+        self.postings = postings
+        self.impacts = impacts
+        self.ids = ids
+        self.sources = sources
+        self.doc_source = doc_source
+        self.signature = signature
+        self.source_starts = np.flatnonzero(np.append(True, doc_source[1:] != doc_source[:-1])) if len(doc_source) else doc_source
+
+        n = len(ids)
+        df = np.diff(offsets).astype(np.float64)
+        self.idf = np.log1p((n - df + 0.5) / (df + 0.5))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, chunks: Iterable[Chunk], signature: str = "") -> "BM25Index":
+        term_id: dict[str, int] = {}
+        ids, sources, doc_source, lengths = [], [], [], []
+        source_pos: dict[str, int] = {}
+        term_parts, tf_parts, doc_parts = [], [], []
+
+        for d, ch in enumerate(chunks):
+            toks = tokenize(ch.text)
+            ids.append(ch.chunk_id)
+            doc_source.append(source_pos.setdefault(ch.source, len(source_pos)))
+            lengths.append(len(toks))
+            if not toks:
+                continue
+            tok_ids = np.fromiter((term_id.setdefault(t, len(term_id)) for t in toks), dtype=np.int32, count=len(toks))
+            tids, tfs = np.unique(tok_ids, return_counts=True)
+            term_parts.append(tids)
+            tf_parts.append(tfs)
+            doc_parts.append(np.full(len(tids), d, dtype=np.int32))
+
+        sources = list(source_pos)
+        terms = list(term_id)
+        lengths = np.asarray(lengths, dtype=np.float64)
+        doc_source = np.asarray(doc_source, dtype=np.int32)
+        if term_parts:
+            post_terms = np.concatenate(term_parts)
+            tf = np.concatenate(tf_parts).astype(np.float64)
+            docs = np.concatenate(doc_parts)
+        else:
+            post_terms = np.zeros(0, dtype=np.int32)
+            tf = np.zeros(0, dtype=np.float64)
+            docs = np.zeros(0, dtype=np.int32)
+
+        if np.any(doc_source[1:] < doc_source[:-1]):
+            perm = np.argsort(doc_source, kind="stable")
+            inv = np.empty_like(perm)
+            inv[perm] = np.arange(len(perm))
+            docs = inv[docs].astype(np.int32)
+            ids = [ids[i] for i in perm]
+            lengths, doc_source = lengths[perm], doc_source[perm]
+
+        order = np.argsort(post_terms, kind="stable")
+        post_terms, tf, docs = post_terms[order], tf[order], docs[order]
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(post_terms, minlength=len(terms)), out=offsets[1:])
+
+        avgdl = lengths.mean() if len(lengths) and lengths.mean() > 0 else 1.0
+        norm = K1 * (1.0 - B + B * lengths[docs] / avgdl)
+        impacts = (tf * (K1 + 1.0) / (tf + norm)).astype(np.float16)
+
+        return cls(terms, offsets, docs, impacts, ids, sources, doc_source, signature)
+
+    def save(self, root: Path | str) -> None:
+        root = Path(root)
+        root.mkdir(parents=True, exist_ok=True)
+        np.save(root / OFFSETS_FILE, self.offsets)
+        np.save(root / POSTINGS_FILE, self.postings)
+        np.save(root / IMPACTS_FILE, self.impacts)
+        np.save(root / DOC_SOURCE_FILE, self.doc_source)
+        (root / TERMS_FILE).write_text(json.dumps(self.terms, ensure_ascii=False), encoding="utf-8")
+        (root / DOCS_FILE).write_text(json.dumps({"ids": self.ids, "sources": self.sources}, ensure_ascii=False), encoding="utf-8")
+        manifest = {
+            "version": INDEX_VERSION,
+            "signature": self.signature,
+            "docs": len(self.ids),
+            "terms": len(self.terms),
+            "postings": int(len(self.postings)),
+            "k1": K1,
+            "b": B,
+        }
+        (root / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+    @classmethod
+    def load(cls, root: Path | str) -> "BM25Index | None":
+        root = Path(root)
+        manifest_path = root / MANIFEST_FILE
+        if not manifest_path.exists():
+            return None
+        try:
+            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+            if manifest.get("version") != INDEX_VERSION:
+                return None
+            docs = json.loads((root / DOCS_FILE).read_text(encoding="utf-8"))
+            return cls(
+                json.loads((root / TERMS_FILE).read_text(encoding="utf-8")),
+                np.load(root / OFFSETS_FILE),
+                np.load(root / POSTINGS_FILE, mmap_mode="r"),
+                np.load(root / IMPACTS_FILE, mmap_mode="r"),
+                docs["ids"],
+                docs["sources"],
+                np.load(root / DOC_SOURCE_FILE),
+                manifest.get("signature", ""),
+            )
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def nbytes(self) -> int:
+        return int(self.offsets.nbytes + self.postings.nbytes + self.impacts.nbytes + self.doc_source.nbytes)
+
+    def scores(self, text: str) -> np.ndarray:
+        query = Counter(t for t in tokenize(text) if t in self.term_id)
+        out = np.zeros(len(self.ids), dtype=np.float64)
+        if not query:
+            return out
+
+        tids = np.fromiter((self.term_id[t] for t in query), dtype=np.int64, count=len(query))
+        qtf = np.fromiter(query.values(), dtype=np.float64, count=len(query))
+        starts, stops = self.offsets[tids], self.offsets[tids + 1]
+        docs = np.concatenate([self.postings[a:b] for a, b in zip(starts, stops)])
+        weights = np.concatenate([self.impacts[a:b] for a, b in zip(starts, stops)]).astype(np.float64)
+        weights *= np.repeat(self.idf[tids] * qtf, stops - starts)
+        return np.bincount(docs, weights=weights, minlength=len(self.ids))
+
+    def search(self, text: str, k: int) -> list[tuple[str, float]]:
+        scores = self.scores(text)
+        hits = np.flatnonzero(scores > 0)
+        if 0 < k < len(hits):
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.lexsort((hits, -scores[hits]))]
+        return [(self.ids[i], float(scores[i])) for i in hits]
+
+    def source_scores(self, text: str, top_n: int) -> dict[str, float]:
+        means = segment_top_n_mean(self.scores(text), self.source_starts, top_n)
+        names = [self.sources[g] for g in self.doc_source[self.source_starts]]
+        return {s: float(m) for s, m in zip(names, means) if m > 0}
+
+
+def ensure_index(store: ChunkStore, root: Path | str, force: bool = False) -> tuple[BM25Index, bool]:
+    signature = store_signature(store)
+    index = None if force else BM25Index.load(root)
+    if index is not None and index.signature == signature:
+        return index, False
+    index = BM25Index.build(store.iter_chunks(), signature)
+    index.save(root)
+    return index, True
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import os
+
+from src.embeddings.hash_embedder import TOKEN_RE
+from src.store.chunk_store import Chunk, ChunkStore
+
+
+EXCERPT_TOKENS = int(os.getenv("LLM_EXCERPT_TOKENS", "300"))
+EXCERPT_CANDIDATES = 12
+NEAR_DUP_OVERLAP = 0.8
+SEPARATOR = "\n[...]\n"
+
+
+def count_tokens(text: str) -> int:
+    return sum(1 for _ in TOKEN_RE.finditer(text or ""))
+
+
+def clip_tokens(text: str, n: int) -> str:
+    for i, m in enumerate(TOKEN_RE.finditer(text or ""), start=1):
+        if i == n:
+            return text[: m.end()]
+    return text
+
+
+def _overlap(a: set[str], b: set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def pack_excerpt(ranked: list[Chunk], budget: int = EXCERPT_TOKENS) -> str:
+    picked: list[tuple[int, str]] = []
+    seen: list[set[str]] = []
+    used = 0
+    for ch in ranked:
+        toks = {t.lower() for t in TOKEN_RE.findall(ch.text)}
+        if any(_overlap(toks, s) >= NEAR_DUP_OVERLAP for s in seen):
+            continue
+        n = count_tokens(ch.text)
+        if used + n > budget:
+            if picked:
+                continue
+            picked.append((ch.start, clip_tokens(ch.text, budget)))
+            break
+        picked.append((ch.start, ch.text))
+        seen.append(toks)
+        used += n
+        if used >= budget:
+            break
+    return SEPARATOR.join(text.strip() for _, text in sorted(picked))
+
+
+class ExcerptBuilder:
+    def __init__(self, index, store: ChunkStore, q_emb, budget: int = EXCERPT_TOKENS):
+        self.index = index
+        self.store = store
+        self.q_emb = [float(x) for x in q_emb]
+        self.budget = budget
+
+    def ranked_chunks(self, source: str) -> list[Chunk]:
+        chunks = {ch.chunk_index: ch for ch in self.store.read_source(source)}
+        if not chunks:
+            return []
+        results = self.index.query(
+            query_embeddings=[self.q_emb],
+            n_results=min(EXCERPT_CANDIDATES, len(chunks)),
+            where={"source": source},
+            include=["distances", "metadatas"],
+        )
+        metas = results["metadatas"][0] if results.get("metadatas") else []
+        order = [int((m or {}).get("chunk_index", -1)) for m in metas]
+        return [chunks[i] for i in order if i in chunks]
+
+    def build(self, source: str) -> str:
+        return pack_excerpt(self.ranked_chunks(source), self.budget)
@@ -1,50 +1,45 @@
 from __future__ import annotations
 
-import json
 import os
 import time
 from pathlib import Path
 from datetime import datetime
 
-from src.llm.llm_client import generate_response
+from src.embeddings.backends import get_embedder
+from src.embeddings.hash_embedder import check_fingerprint
+from src.llm.excerpts import EXCERPT_TOKENS, ExcerptBuilder, count_tokens
+from src.llm.llm_client import LLM_CONCURRENCY, generate_many
+from src.llm.prompt_cache import PromptCache, prompt_key
+from src.ranking.incremental import jd_hash, load_state
+from src.store.chunk_store import ChunkStore
+from src.store.results_db import ResultsDB
+from src.ui.config import OLLAMA_MODEL
+from src.vectorindex.backends import open_index
 
 
 JD_FILE = Path("data/samples/jd/job.txt")
-RANKING_JSON = Path("data/outputs/ranking/ranking_results.json")
 EXTRACTED_DIR = Path("data/outputs/extracted_text")
-OUT_FILE = Path("data/outputs/ranking/llm_explanations.json")
+CHUNKS_DIR = Path("data/outputs/chunks")
+STATE_FILE = Path("data/outputs/ranking/ranking_state.json")
 
 TOP_K = int(os.getenv("LLM_TOP_K", "10"))
 TIMEOUT_SEC = int(os.getenv("LLM_TIMEOUT_SEC", "180"))
 MAX_CV_CHARS = int(os.getenv("LLM_MAX_CV_CHARS", "1800"))
 MAX_JD_CHARS = int(os.getenv("LLM_MAX_JD_CHARS", "1200"))
 NUM_PREDICT = int(os.getenv("LLM_NUM_PREDICT", "220"))
+TEMPERATURE = 0.2
+LLM_EXCERPTS = os.getenv("LLM_EXCERPTS", "1") == "1"
 
 
 def safe_console(text: str) -> str:
     return str(text).encode("ascii", "backslashreplace").decode("ascii")
 
 
-def atomic_write_json(path: Path, data) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    tmp = path.with_suffix(path.suffix + ".tmp")
-    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
-    tmp.replace(path)
-
-
-def build_prompt(jd_text: str, cv_text: str, score: float, cv_name: str) -> str:
+def prompt_prefix(jd_text: str) -> str:
     return f"""
 You are an expert recruitment assistant.
 Task: Compare the candidate CV to the job description and provide an explainable decision.
 
-Job Description:
-{jd_text}
-
-Candidate CV ({cv_name}):
-{cv_text}
-
-Similarity score (higher is better): {score}
-
 Output format:
 1) Summary (3-5 lines)
 2) Strengths (bullets)
@@ -55,24 +50,23 @@ Output format:
 Constraints:
 - Use only the provided CV and JD.
 - Be concise and factual.
+
+Job Description:
+{jd_text}
 """.strip()
 
 
-def load_existing() -> dict:
-    if not OUT_FILE.exists():
-        return {}
-    try:
-        data = json.loads(OUT_FILE.read_text(encoding="utf-8", errors="replace"))
-        if isinstance(data, list):
-            out = {}
-            for item in data:
-                key = (item.get("cv_source") or item.get("cv_name") or "").strip()
-                if key:
-                    out[key] = item
-            return out
-    except Exception:
-        return {}
-    return {}
+def build_prompt(jd_text: str, cv_text: str, score: float, cv_name: str) -> str:
+    return f"""
+{prompt_prefix(jd_text)}
+
+Candidate CV ({cv_name}):
+{cv_text}
+
+Similarity score (higher is better): {score}
+
+Answer in the output format above.
+""".strip()
 
 
 def classify_llm_output(text: str) -> tuple[str, str | None]:
@@ -86,84 +80,224 @@ def classify_llm_output(text: str) -> tuple[str, str | None]:
     return "ok", None
 
 
-def main() -> None:
-    if not JD_FILE.exists():
-        raise FileNotFoundError(f"Job description not found: {JD_FILE}")
-    if not RANKING_JSON.exists():
-        raise FileNotFoundError(f"Ranking file not found: {RANKING_JSON}")
-
-    jd_text = JD_FILE.read_text(encoding="utf-8", errors="replace").strip()
+def load_jd_text(path: Path = JD_FILE) -> str:
+    if not path.exists():
+        raise FileNotFoundError(f"Job description not found: {path}")
+    jd_text = path.read_text(encoding="utf-8", errors="replace").strip()
     if not jd_text:
         raise ValueError("Job description file is empty.")
-    jd_text = jd_text[:MAX_JD_CHARS]
+    return jd_text
 
-    ranking = json.loads(RANKING_JSON.read_text(encoding="utf-8", errors="replace"))
-    if not isinstance(ranking, list):
-        raise ValueError("ranking_results.json format is not a list.")
 
-    ranking = [r for r in ranking if isinstance(r, dict)]
-    ranking = [r for r in ranking if (r.get("cv_source") or "").strip() != ""]
-    ranking = sorted(ranking, key=lambda x: float(x.get("score", 0.0)), reverse=True)
+def read_cv_text(cv_name: str) -> str | None:
+    path = EXTRACTED_DIR / f"{cv_name}.txt"
+    if not path.exists():
+        return None
+    return path.read_text(encoding="utf-8", errors="replace").strip()[:MAX_CV_CHARS]
 
-    if TOP_K > 0:
-        ranking = ranking[:TOP_K]
 
-    existing = load_existing()
+def open_excerpts(jd_text: str) -> ExcerptBuilder | None:
+    if not LLM_EXCERPTS:
+        return None
+    try:
+        index = open_index()
+        fingerprint = (index.metadata or {}).get("embedder")
+        state = load_state(STATE_FILE) or {}
+        key = state.get("key") or {}
+        if key.get("jd") == jd_hash(jd_text) and key.get("embedder") == fingerprint and state.get("jd_vector"):
+            q_emb = state["jd_vector"]
+        else:
+            embedder = get_embedder()
+            check_fingerprint(index.metadata, embedder.fingerprint())
+            q_emb = embedder.embed_one(jd_text)
+    except Exception as e:
+        print(safe_console(f"Excerpts unavailable ({e}); using the first {MAX_CV_CHARS} characters of each CV"))
+        return None
+    return ExcerptBuilder(index, ChunkStore(CHUNKS_DIR), q_emb)
+
+
+def candidate_text(source: str, excerpts: ExcerptBuilder | None) -> str | None:
+    if excerpts is not None:
+        text = excerpts.build(source)
+        if text:
+            return text
+    return read_cv_text(source.replace("_chunks", ""))
+
+
+def cache_key(prompt: str) -> str:
+    return prompt_key(prompt, OLLAMA_MODEL, {"temperature": TEMPERATURE, "num_predict": NUM_PREDICT})
+
+
+def make_item(source: str, score: float, run: str, text: str, stats: dict, key: str | None = None) -> dict:
+    status, err = classify_llm_output(stats.get("error") or text)
+    return {
+        "cv_source": source,
+        "cv_name": source.replace("_chunks", ""),
+        "score": score,
+        "status": status,
+        "error": err,
+        "took_sec": round(stats.get("took_sec") or 0.0, 2),
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "ranking_run": run,
+        "llm_analysis": (text or "").strip(),
+        "ttft_sec": stats.get("ttft_sec"),
+        "tokens_per_sec": stats.get("tokens_per_sec"),
+        "prompt_key": key,
+        "prompt_tokens": stats.get("prompt_tokens"),
+        "prompt_eval_sec": stats.get("prompt_eval_sec"),
+    }
+
+
+def top_candidates(db: ResultsDB, run: str) -> list[dict]:
+    rows, kept = [], 0
+    for row in db.iter_ranking(run):
+        if not row.get("duplicate_of"):
+            if TOP_K > 0 and kept == TOP_K:
+                break
+            kept += 1
+        rows.append(row)
+    return rows
+
+
+def main() -> None:
+    jd_text = load_jd_text()
+
+    with ResultsDB() as db, PromptCache() as cache:
+        latest = db.latest_run(JD_FILE.stem)
+        if latest is None:
+            raise FileNotFoundError(f"No ranking run for '{JD_FILE.stem}' in {db.path}")
+        if jd_hash(jd_text) != latest["jd_hash"]:
+            raise SystemExit(
+                f"The job description in {JD_FILE} changed since ranking run {latest['run_id']}. "
+                "Run src/07_ranking/rank_cvs.py again before explaining."
+            )
+        explain_run(db, cache, latest, jd_text, open_excerpts(jd_text))
+
+
+def explain_run(db: ResultsDB, cache: PromptCache, latest: dict, jd_text: str, excerpts: ExcerptBuilder | None) -> None:
+    run, jd_key = latest["run_id"], latest["jd_hash"]
+    ranking = top_candidates(db, run)
+    sources = [row["cv_source"] for row in ranking]
+
+    changes = latest["changes"]
+    stale = set(changes.get("rescored") or [])
+    db.delete_explanations(jd_key, sources if changes.get("reset") else stale, keep_run=run)
+    existing = db.explanations(jd_key, sources)
     total = len(ranking)
 
-    print(safe_console(f"Explainability: candidates={total}, top_k={TOP_K}, timeout={TIMEOUT_SEC}s"))
-    print(safe_console(f"Output: {OUT_FILE}"))
+    print(
+        safe_console(
+            f"Explainability: candidates={total}, top_k={TOP_K}, timeout={TIMEOUT_SEC}s, concurrency={LLM_CONCURRENCY}"
+        )
+    )
+    if changes:
+        print(
+            safe_console(
+                f"Ranking changes: entered={len(changes.get('entered') or [])} rescored={len(stale)} "
+                f"reset={bool(changes.get('reset'))}"
+            )
+        )
+    print(safe_console(f"Output: {db.path} (run {run})"))
+    if excerpts is not None:
+        print(safe_console(f"CV excerpts: top chunks for this JD, up to {EXCERPT_TOKENS} tokens per candidate"))
 
+    def reuse(i: int, source: str, canonical: str) -> None:
+        item = {
+            **existing[canonical],
+            "cv_source": source,
+            "cv_name": source.replace("_chunks", ""),
+            "took_sec": 0.0,
+            "duplicate_of": canonical,
+        }
+        db.upsert_explanation(jd_key, item)
+        existing[source] = item
+        print(safe_console(f"[{i}/{total}] near-duplicate of {canonical}: reused"))
+
+    jobs, prompts, queued = [], [], set()
+    waiting: dict[str, list[tuple[int, str]]] = {}
     for i, row in enumerate(ranking, start=1):
         source = str(row.get("cv_source", "")).strip()
         score = float(row.get("score", 0.0))
         cv_name = source.replace("_chunks", "")
-        cv_txt_path = EXTRACTED_DIR / f"{cv_name}.txt"
 
-        if source in existing:
-            print(safe_console(f"[{i}/{total}] skip (already done): {source}"))
+        canonical = row.get("duplicate_of")
+        if canonical:
+            if canonical in queued:
+                waiting.setdefault(canonical, []).append((i, source))
+            elif canonical in existing:
+                reuse(i, source, canonical)
+            else:
+                print(safe_console(f"[{i}/{total}] no explanation for {canonical}: {source}"))
             continue
 
-        if not cv_txt_path.exists():
-            print(safe_console(f"[{i}/{total}] missing txt: {cv_txt_path.name}"))
+        cv_text = candidate_text(source, excerpts)
+        if cv_text is None:
+            print(safe_console(f"[{i}/{total}] missing txt: {cv_name}.txt"))
             continue
-
-        cv_text = cv_txt_path.read_text(encoding="utf-8", errors="replace").strip()
         if not cv_text:
-            print(safe_console(f"[{i}/{total}] empty txt: {cv_txt_path.name}"))
+            print(safe_console(f"[{i}/{total}] empty txt: {cv_name}.txt"))
             continue
 
-        cv_text = cv_text[:MAX_CV_CHARS]
-        prompt = build_prompt(jd_text, cv_text, score, cv_name)
-
-        print(safe_console(f"[{i}/{total}] LLM: {source} (score={score:.4f})"))
-        started = time.time()
-
-        llm_out = generate_response(
-            prompt,
-            timeout_sec=TIMEOUT_SEC,
-            num_predict=NUM_PREDICT,
-        )
-
-        status, err = classify_llm_output(llm_out)
-        took = time.time() - started
+        prompt = build_prompt(jd_text[:MAX_JD_CHARS], cv_text, score, cv_name)
+        key = cache_key(prompt)
+        if source in existing and existing[source].get("prompt_key") == key:
+            print(safe_console(f"[{i}/{total}] skip (already done): {source}"))
+            continue
 
-        item = {
-            "cv_source": source,
-            "cv_name": cv_name,
-            "score": score,
-            "status": status,
-            "error": err,
-            "took_sec": round(took, 2),
-            "generated_at": datetime.now().isoformat(timespec="seconds"),
-            "llm_analysis": (llm_out or "").strip() if status == "ok" else "",
-        }
+        hit = cache.get(key)
+        if hit is not None:
+            item = make_item(source, score, run, hit["response"], hit, key)
+            db.upsert_explanation(jd_key, item)
+            existing[source] = item
+            print(safe_console(f"[{i}/{total}] cached: {source}"))
+            continue
 
+        jobs.append((i, source, score, key))
+        prompts.append(prompt)
+        queued.add(source)
+        print(safe_console(f"[{i}/{total}] LLM: {source} (score={score:.4f}, cv tokens={count_tokens(cv_text)})"))
+
+    started = time.time()
+    results = generate_many(
+        prompts,
+        LLM_CONCURRENCY,
+        model=OLLAMA_MODEL,
+        timeout_sec=TIMEOUT_SEC,
+        num_predict=NUM_PREDICT,
+        temperature=TEMPERATURE,
+    )
+    evals = []
+    for j, llm_out, stats in results:
+        i, source, score, key = jobs[j]
+        item = make_item(source, score, run, llm_out, stats, key)
+        if stats.get("prompt_eval_sec") is not None:
+            evals.append(stats["prompt_eval_sec"])
+        if item["status"] == "ok":
+            cache.put(key, OLLAMA_MODEL, item["llm_analysis"], stats)
+
+        db.upsert_explanation(jd_key, item)
         existing[source] = item
-        atomic_write_json(OUT_FILE, list(existing.values()))
-        print(safe_console(f"[{i}/{total}] saved ({status}) in {took:.1f}s"))
-
-    print(safe_console(f"Saved: {OUT_FILE}"))
+        print(
+            safe_console(
+                f"[{i}/{total}] saved ({item['status']}) in {item['took_sec']:.1f}s, "
+                f"ttft={stats.get('ttft_sec')}s, prompt_eval={stats.get('prompt_tokens')} tok/"
+                f"{stats.get('prompt_eval_sec')}s, {stats.get('tokens_per_sec')} tok/s: {source}"
+            )
+        )
+        for dup_i, dup in waiting.pop(source, []):
+            reuse(dup_i, dup, source)
+
+    if jobs:
+        print(safe_console(f"LLM calls: {len(jobs)} in {time.time() - started:.1f}s (concurrency={LLM_CONCURRENCY})"))
+    if evals:
+        print(
+            safe_console(
+                f"Prompt eval: total {sum(evals):.2f}s, max {max(evals):.2f}s, "
+                f"median {sorted(evals)[len(evals) // 2]:.2f}s per candidate"
+            )
+        )
+    print(safe_console(f"Prompt cache: {cache.stats()} ({cache.path})"))
+    print(safe_console(f"Saved: {db.explanation_count(jd_key)} explanations for this JD in {db.path}"))
 
 
 if __name__ == "__main__":
@@ -1,11 +1,38 @@
 from __future__ import annotations
 
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator
+
 import requests
+from requests.adapters import HTTPAdapter
 
 from src.ui.config import OLLAMA_BASE_URL, OLLAMA_MODEL, OLLAMA_TIMEOUT_SEC
 
 
+LLM_CONCURRENCY = max(1, int(os.getenv("LLM_CONCURRENCY", "1")))
+POOL_SIZE = max(LLM_CONCURRENCY, int(os.getenv("OLLAMA_POOL_SIZE", "8")))
+KEEP_ALIVE = os.getenv("LLM_KEEP_ALIVE", "30m")
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, pool_block=True)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
 def generate_response(
     prompt: str,
     model: str | None = None,
@@ -23,6 +50,7 @@ def generate_response(
         "model": model_to_use,
         "prompt": prompt,
         "stream": False,
+        "keep_alive": KEEP_ALIVE,
         "options": {
             "temperature": float(temperature),
             "num_predict": n,
@@ -30,10 +58,114 @@ def generate_response(
     }
 
     try:
-        response = requests.post(endpoint, json=payload, timeout=t)
+        response = get_session().post(endpoint, json=payload, timeout=t)
         response.raise_for_status()
         return response.json().get("response", "") or ""
     except requests.exceptions.Timeout:
         return f"Error: Ollama request timed out after {t}s."
     except requests.exceptions.RequestException as e:
-        return f"Error connecting to Ollama: {e}"
\ No newline at end of file
+        return f"Error connecting to Ollama: {e}"
+
+
+def stream_response(
+    prompt: str,
+    model: str | None = None,
+    timeout_sec: int | None = None,
+    num_predict: int | None = None,
+    temperature: float = 0.2,
+    stats: dict | None = None,
+) -> Iterator[str]:
+    model_to_use = model or OLLAMA_MODEL
+    endpoint = f"{OLLAMA_BASE_URL.rstrip('/')}/api/generate"
+
+    t = int(timeout_sec) if timeout_sec is not None else int(OLLAMA_TIMEOUT_SEC)
+    n = int(num_predict) if num_predict is not None else int(os.getenv("LLM_NUM_PREDICT", "220"))
+
+    payload = {
+        "model": model_to_use,
+        "prompt": prompt,
+        "stream": True,
+        "keep_alive": KEEP_ALIVE,
+        "options": {
+            "temperature": float(temperature),
+            "num_predict": n,
+        },
+    }
+
+    stats = stats if stats is not None else {}
+    stats.update(
+        {
+            "ttft_sec": None,
+            "tokens": 0,
+            "tokens_per_sec": None,
+            "prompt_tokens": None,
+            "prompt_eval_sec": None,
+            "took_sec": None,
+            "error": None,
+        }
+    )
+    started = time.time()
+    deadline = started + t
+    first = None
+    eval_sec = None
+    try:
+        with get_session().post(endpoint, json=payload, timeout=t, stream=True) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get("error"):
+                    stats["error"] = f"Error: {data['error']}"
+                    break
+                piece = data.get("response") or ""
+                if piece:
+                    if first is None:
+                        first = time.time()
+                        stats["ttft_sec"] = round(first - started, 3)
+                    stats["tokens"] += 1
+                    yield piece
+                if data.get("done"):
+                    if data.get("eval_count") and data.get("eval_duration"):
+                        stats["tokens"] = int(data["eval_count"])
+                        eval_sec = data["eval_duration"] / 1e9
+                    if "prompt_eval_count" in data:
+                        stats["prompt_tokens"] = int(data["prompt_eval_count"])
+                    if "prompt_eval_duration" in data:
+                        stats["prompt_eval_sec"] = round(data["prompt_eval_duration"] / 1e9, 3)
+                    continue
+                if time.time() > deadline:
+                    stats["error"] = f"Error: Ollama request timed out after {t}s."
+                    break
+    except requests.exceptions.Timeout:
+        stats["error"] = f"Error: Ollama request timed out after {t}s."
+    except requests.exceptions.ConnectionError as e:
+        timed_out = first is not None and "timed out" in str(e).lower()
+        stats["error"] = f"Error: Ollama request timed out after {t}s." if timed_out else f"Error connecting to Ollama: {e}"
+    except requests.exceptions.RequestException as e:
+        stats["error"] = f"Error connecting to Ollama: {e}"
+    except ValueError as e:
+        stats["error"] = f"Error: invalid response from Ollama: {e}"
+    finally:
+        now = time.time()
+        stats["took_sec"] = round(now - started, 3)
+        if eval_sec is None and first is not None and stats["tokens"] > 1:
+            eval_sec = now - first
+        if eval_sec:
+            stats["tokens_per_sec"] = round(stats["tokens"] / eval_sec, 2)
+
+
+def generate_streamed(prompt: str, **kwargs) -> tuple[str, dict]:
+    stats: dict = {}
+    text = "".join(stream_response(prompt, stats=stats, **kwargs))
+    return text, stats
+
+
+def generate_many(prompts: list[str], concurrency: int = LLM_CONCURRENCY, **kwargs) -> Iterator[tuple[int, str, dict]]:
+    if not prompts:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(prompts)))) as pool:
+        futures = {pool.submit(generate_streamed, p, **kwargs): i for i, p in enumerate(prompts)}
+        for future in as_completed(futures):
+            text, stats = future.result()
+            yield futures[future], text, stats
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+
+CACHE_DIR = Path(os.getenv("LLM_CACHE_DIR", "data/cache/llm"))
+CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000"))
+CACHE_FILE = "prompt_cache.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    used_at REAL NOT NULL,
+    ttft_sec REAL,
+    tokens_per_sec REAL
+);
+CREATE INDEX IF NOT EXISTS responses_used ON responses (used_at);
+"""
+
+
+def prompt_key(prompt: str, model: str, options: dict) -> str:
+    spec = json.dumps({"prompt": prompt, "model": model, "options": options}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(spec.encode("utf-8")).hexdigest()
+
+
+class PromptCache:
+    def __init__(self, root: Path | str = CACHE_DIR, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max(1, int(max_entries))
+        self.path = Path(root) / CACHE_FILE
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "PromptCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> dict | None:
+        row = self.conn.execute("SELECT * FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with self.conn:
+            self.conn.execute("UPDATE responses SET used_at = ? WHERE key = ?", (time.time(), key))
+        return dict(row)
+
+    def put(self, key: str, model: str, response: str, stats: dict | None = None) -> None:
+        stats = stats or {}
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created_at, used_at, ttft_sec, tokens_per_sec) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, response, now, now, stats.get("ttft_sec"), stats.get("tokens_per_sec")),
+            )
+            overflow = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self.conn.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY used_at LIMIT ?)",
+                    (overflow,),
+                )
+                self.evicted += overflow
+
+    def stats(self) -> str:
+        return f"hits={self.hits} misses={self.misses} evicted={self.evicted} size={len(self)}"
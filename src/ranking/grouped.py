@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import numpy as np
+
+from src.vectorindex.flat_index import FlatIndex
+
+
+GET_PAGE = 5000
+PER_SOURCE_RESULTS = 10
+
+
+def group_ranks(values: np.ndarray, groups: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    order = np.lexsort((values, groups))
+    g = groups[order]
+    first = np.ones(len(g), dtype=bool)
+    first[1:] = g[1:] != g[:-1]
+    pos = np.arange(len(g))
+    rank = pos - np.maximum.accumulate(np.where(first, pos, 0))
+    return order, rank
+
+
+def group_smallest(values: np.ndarray, groups: np.ndarray, n: int) -> np.ndarray:
+    order, rank = group_ranks(values, groups)
+    return order[rank < n]
+
+
+def group_top_n(distances: np.ndarray, groups: np.ndarray, n_groups: int, top_n: int) -> tuple[np.ndarray, np.ndarray]:
+    keep = group_smallest(distances, groups, top_n)
+    sums = np.bincount(groups[keep], weights=distances[keep], minlength=n_groups)
+    counts = np.bincount(groups[keep], minlength=n_groups)
+    return sums, counts
+
+
+def _flat_distances(index: FlatIndex, q_emb, top_n: int, where: dict | None) -> tuple[np.ndarray, np.ndarray, list[str]]:
+    parts = list(index.iter_similarities([q_emb], where=where))
+    if not parts:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int32), index.sources
+    rows = np.concatenate([r for r, _ in parts])
+    sims = np.concatenate([s[0] for _, s in parts])
+    groups = index.source_idx[rows]
+
+    if index.precision != "float32" and index.keep_float32 and index.rescore > 0:
+        cand = np.sort(group_smallest(-sims, groups, top_n * index.rescore))
+        rows, groups = rows[cand], groups[cand]
+        sims = index.similarities(q_emb, rows=rows, exact=True)
+
+    return (1.0 - sims).astype(np.float32), groups, index.sources
+
+
+def _collection_distances(collection, q_emb, where: dict | None) -> tuple[np.ndarray, np.ndarray, list[str]]:
+    parts, sources, offset = [], [], 0
+    while True:
+        page = collection.get(include=["embeddings", "metadatas"], where=where, limit=GET_PAGE, offset=offset)
+        ids = page.get("ids") or []
+        if ids:
+            parts.append(np.asarray(page["embeddings"], dtype=np.float32))
+            sources.extend((m or {}).get("source", "") for m in page["metadatas"])
+        if len(ids) < GET_PAGE:
+            break
+        offset += len(ids)
+
+    if not parts:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64), []
+
+    mat = np.concatenate(parts)
+    norms = np.linalg.norm(mat, axis=1)
+    norms[norms == 0] = 1.0
+    q = np.asarray(q_emb, dtype=np.float32)
+    q = q / (np.linalg.norm(q) or 1.0)
+    names, groups = np.unique(np.asarray(sources, dtype=object), return_inverse=True)
+    return (1.0 - (mat @ q) / norms).astype(np.float32), groups, names.tolist()
+
+
+def rank_grouped(index, q_emb, sources: list[str], top_n: int, pruned: bool = False) -> list[tuple[str, float]]:
+    if not sources:
+        return []
+    where = {"source": {"$in": list(sources)}} if pruned else None
+    if isinstance(index, FlatIndex):
+        distances, groups, names = _flat_distances(index, q_emb, top_n, where)
+    else:
+        distances, groups, names = _collection_distances(index, q_emb, where)
+
+    sums, counts = group_top_n(distances, groups, len(names), top_n)
+    pos = {name: i for i, name in enumerate(names)}
+    out = []
+    for source in sources:
+        i = pos.get(source)
+        if i is None or not counts[i]:
+            continue
+        out.append((source, float(sums[i] / counts[i])))
+    return out
+
+
+def rank_per_source(index, q_emb, sources: list[str], top_n: int) -> list[tuple[str, float]]:
+    out = []
+    n_results = min(PER_SOURCE_RESULTS, index.count())
+    for source in sources:
+        results = index.query(
+            query_embeddings=[q_emb],
+            n_results=n_results,
+            where={"source": source},
+            include=["distances"],
+        )
+        distances = results["distances"][0] if results.get("distances") else []
+        if not distances:
+            continue
+        best = sorted(distances)[:top_n]
+        out.append((source, sum(best) / len(best)))
+    return out
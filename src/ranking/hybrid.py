@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import os
+
+import numpy as np
+
+
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+
+def rrf(keys: list[np.ndarray], k: int = RRF_K) -> np.ndarray:
+    out = np.zeros(len(keys[0]), dtype=np.float64)
+    for key in keys:
+        valid = np.flatnonzero(np.isfinite(key))
+        order = valid[np.lexsort((valid, key[valid]))]
+        out[order] += 1.0 / (k + np.arange(1, len(order) + 1))
+    return out
+
+
+def rrf_lists(ranked: list[list[str]], k: int = RRF_K) -> list[tuple[str, float]]:
+    scores: dict[str, float] = {}
+    for ids in ranked:
+        for r, doc_id in enumerate(ids, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + r)
+    return sorted(scores.items(), key=lambda x: -x[1])
+
+
+def hybrid_key(names: list[str], avg: np.ndarray, lexical: dict[str, float], k: int = RRF_K) -> np.ndarray:
+    lex = np.asarray([-lexical.get(name, np.nan) for name in names], dtype=np.float64)
+    fused = rrf([avg, lex], k)
+    return np.where(np.isfinite(avg), -fused, np.nan)
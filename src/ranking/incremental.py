@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+
+
+STATE_VERSION = 1
+
+
+def jd_hash(jd_text: str) -> str:
+    return hashlib.sha1(jd_text.encode("utf-8")).hexdigest()
+
+
+def state_key(jd_text: str, fingerprint: str, top_n: int) -> dict:
+    return {"version": STATE_VERSION, "jd": jd_hash(jd_text), "embedder": fingerprint, "top_n": int(top_n)}
+
+
+def load_state(path: Path) -> dict | None:
+    if not path.exists():
+        return None
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def save_state(path: Path, key: dict, jd_vector, scores: dict[str, tuple[str, float]], top: list[str]) -> None:
+    data = {
+        "key": key,
+        "jd_vector": [float(x) for x in jd_vector],
+        "sources": {s: [h, round(float(d), 8)] for s, (h, d) in scores.items()},
+        "top": list(top),
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    tmp.replace(path)
+
+
+def stale_sources(prev: dict, doc_hashes: dict[str, str | None]) -> list[str]:
+    return [s for s, h in doc_hashes.items() if s not in prev or prev[s][0] != h]
+
+
+def rank_changes(old_top: list[str], new_top: list[str], rescored: list[str]) -> dict:
+    old_rank = {s: i for i, s in enumerate(old_top, start=1)}
+    new_rank = {s: i for i, s in enumerate(new_top, start=1)}
+    rescored = set(rescored)
+    return {
+        "entered": [s for s in new_top if s not in old_rank],
+        "left": [s for s in old_top if s not in new_rank],
+        "moved": [
+            {"cv_source": s, "old_rank": old_rank[s], "new_rank": r}
+            for s, r in new_rank.items()
+            if s in old_rank and old_rank[s] != r
+        ],
+        "rescored": [s for s in new_top if s in rescored],
+    }
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import numpy as np
+
+from src.ranking.grouped import GET_PAGE, group_ranks
+from src.vectorindex.flat_index import FlatIndex
+
+
+class TopNPerGroup:
+    def __init__(self, width: int, n_queries: int = 1):
+        self.width = max(1, int(width))
+        self.n_queries = max(1, int(n_queries))
+        self.names: list[str] = []
+        self._pos: dict[str, int] = {}
+        self.dist = np.full((0, self.width), np.inf, dtype=np.float32)
+        self.rows = np.full((0, self.width), -1, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def group_ids(self, names) -> np.ndarray:
+        out = np.empty(len(names), dtype=np.int64)
+        for i, name in enumerate(names):
+            pos = self._pos.get(name)
+            if pos is None:
+                pos = self._pos[name] = len(self.names)
+                self.names.append(name)
+            out[i] = pos
+        self._grow(len(self.names) * self.n_queries)
+        return out
+
+    def _grow(self, n: int) -> None:
+        have = len(self.dist)
+        if n <= have:
+            return
+        extra = max(n, have * 2) - have
+        self.dist = np.concatenate([self.dist, np.full((extra, self.width), np.inf, dtype=np.float32)])
+        self.rows = np.concatenate([self.rows, np.full((extra, self.width), -1, dtype=np.int64)])
+
+    def update(self, distances: np.ndarray, groups: np.ndarray, rows: np.ndarray | None = None) -> None:
+        distances = np.atleast_2d(distances)
+        if not distances.size:
+            return
+        if rows is None:
+            rows = np.full(distances.shape[1], -1, dtype=np.int64)
+
+        keys = (groups[None, :] * self.n_queries + np.arange(self.n_queries)[:, None]).ravel()
+        distances = distances.ravel()
+        rows = np.broadcast_to(rows, (self.n_queries, len(rows))).ravel()
+
+        order, rank = group_ranks(distances, keys)
+        keep = rank < self.width
+        order, rank = order[keep], rank[keep]
+        present, slot = np.unique(keys[order], return_inverse=True)
+
+        block_dist = np.full((len(present), self.width), np.inf, dtype=np.float32)
+        block_rows = np.full((len(present), self.width), -1, dtype=np.int64)
+        block_dist[slot, rank] = distances[order]
+        block_rows[slot, rank] = rows[order]
+
+        dist = np.concatenate([self.dist[present], block_dist], axis=1)
+        all_rows = np.concatenate([self.rows[present], block_rows], axis=1)
+        best = np.argsort(dist, axis=1, kind="stable")[:, : self.width]
+        self.dist[present] = np.take_along_axis(dist, best, axis=1)
+        self.rows[present] = np.take_along_axis(all_rows, best, axis=1)
+
+    def rescore(self, exact_distances) -> None:
+        n = len(self.names) * self.n_queries
+        dist, rows = self.dist[:n], self.rows[:n]
+        valid = rows >= 0
+        if not valid.any():
+            return
+        query_idx = np.broadcast_to((np.arange(n) % self.n_queries)[:, None], rows.shape)
+        dist[valid] = exact_distances(rows[valid], query_idx[valid])
+        order = np.argsort(dist, axis=1, kind="stable")
+        self.dist[:n] = np.take_along_axis(dist, order, axis=1)
+        self.rows[:n] = np.take_along_axis(rows, order, axis=1)
+
+    def averages(self, top_n: int) -> np.ndarray:
+        n = len(self.names) * self.n_queries
+        best = self.dist[:n, :top_n].astype(np.float64)
+        found = np.isfinite(best)
+        counts = found.sum(axis=1)
+        sums = np.where(found, best, 0.0).sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            avg = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+        return avg.reshape(len(self.names), self.n_queries)
+
+
+def _source_filter(sources: list[str] | None) -> dict | None:
+    return None if sources is None else {"source": {"$in": list(sources)}}
+
+
+def _stream_flat(index: FlatIndex, q_embs: np.ndarray, top_n: int, where: dict | None = None) -> TopNPerGroup:
+    rescore = index.precision != "float32" and index.keep_float32 and index.rescore > 0
+    state = TopNPerGroup(top_n * index.rescore if rescore else top_n, len(q_embs))
+    state.group_ids(index.sources)
+
+    for rows, sims in index.iter_similarities(q_embs, where=where):
+        state.update((1.0 - sims).astype(np.float32), index.source_idx[rows].astype(np.int64), rows)
+
+    if rescore:
+        state.rescore(lambda rows, qi: 1.0 - index.pair_similarities(q_embs, rows, qi))
+    return state
+
+
+def _stream_collection(collection, q_embs: np.ndarray, top_n: int, where: dict | None = None) -> TopNPerGroup:
+    state = TopNPerGroup(top_n, len(q_embs))
+    norms = np.linalg.norm(q_embs, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    q = q_embs / norms
+
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings", "metadatas"], where=where, limit=GET_PAGE, offset=offset)
+        ids = page.get("ids") or []
+        if ids:
+            mat = np.asarray(page["embeddings"], dtype=np.float32)
+            row_norms = np.linalg.norm(mat, axis=1)
+            row_norms[row_norms == 0] = 1.0
+            groups = state.group_ids([(m or {}).get("source", "") for m in page["metadatas"]])
+            state.update((1.0 - (q @ mat.T) / row_norms).astype(np.float32), groups)
+        if len(ids) < GET_PAGE:
+            break
+        offset += len(ids)
+    return state
+
+
+def rank_streaming_batch(index, q_embs, top_n: int, sources: list[str] | None = None) -> tuple[list[str], np.ndarray]:
+    q_embs = np.atleast_2d(np.asarray(q_embs, dtype=np.float32))
+    if sources is not None and not sources:
+        return [], np.zeros((0, len(q_embs)), dtype=np.float64)
+    if isinstance(index, FlatIndex):
+        state = _stream_flat(index, q_embs, top_n, _source_filter(sources))
+    else:
+        state = _stream_collection(index, q_embs, top_n, _source_filter(sources))
+    return state.names, state.averages(top_n)
+
+
+def rank_streaming(index, q_emb, top_n: int, sources: list[str] | None = None) -> tuple[list[str], np.ndarray]:
+    names, avg = rank_streaming_batch(index, [q_emb], top_n, sources)
+    return names, avg[:, 0]
+
+
+def top_k(avg: np.ndarray, k: int) -> np.ndarray:
+    valid = np.flatnonzero(np.isfinite(avg))
+    if 0 < k < len(valid):
+        valid = valid[np.argpartition(avg[valid], k - 1)[:k]]
+    return valid[np.lexsort((valid, avg[valid]))]
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+
+
+INDEX_VERSION = 1
+MANIFEST_FILE = "skills_index.json"
+BITS_FILE = "skill_bits.npy"
+
+
+def n_words(n_skills: int) -> int:
+    return max(1, (n_skills + 63) // 64)
+
+
+def to_bits(skill_ids: Iterable[int], words: int) -> np.ndarray:
+    row = np.zeros(words, dtype=np.uint64)
+    for sid in skill_ids:
+        row[sid // 64] |= np.uint64(1) << np.uint64(sid % 64)
+    return row
+
+
+def from_bits(row: np.ndarray) -> list[int]:
+    bits = np.unpackbits(row.astype("<u8").view(np.uint8), bitorder="little")
+    return np.flatnonzero(bits).tolist()
+
+
+class SkillIndex:
+    def __init__(self, skills: list[str], fingerprint: str, sources: list[str], doc_hashes: list[str | None], bits: np.ndarray):
+        self.skills = skills
+        self.fingerprint = fingerprint
+        self.sources = sources
+        self.doc_hashes = doc_hashes
+        self.bits = bits
+        self._pos = {s: i for i, s in enumerate(sources)}
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    def __contains__(self, source: str) -> bool:
+        return source in self._pos
+
+    @property
+    def words(self) -> int:
+        return n_words(len(self.skills))
+
+    def doc_hash(self, source: str) -> str | None:
+        pos = self._pos.get(source)
+        return None if pos is None else self.doc_hashes[pos]
+
+    def row(self, source: str) -> np.ndarray | None:
+        pos = self._pos.get(source)
+        return None if pos is None else self.bits[pos]
+
+    def skills_of(self, source: str) -> list[str]:
+        row = self.row(source)
+        return [] if row is None else [self.skills[i] for i in from_bits(row)]
+
+    def mask(self, skill_ids: Iterable[int]) -> np.ndarray:
+        return to_bits(skill_ids, self.words)
+
+    def has_all(self, mask: np.ndarray) -> np.ndarray:
+        return np.all((self.bits & mask) == mask, axis=1)
+
+    def eligible(self, sources: list[str], mask: np.ndarray) -> list[str]:
+        keep = self.has_all(mask)
+        return [s for s in sources if s in self._pos and keep[self._pos[s]]]
+
+    def save(self, root: Path | str) -> None:
+        root = Path(root)
+        root.mkdir(parents=True, exist_ok=True)
+        np.save(root / BITS_FILE, self.bits)
+        manifest = {
+            "version": INDEX_VERSION,
+            "dictionary": self.fingerprint,
+            "skills": self.skills,
+            "sources": self.sources,
+            "doc_hashes": self.doc_hashes,
+        }
+        tmp = root / (MANIFEST_FILE + ".tmp")
+        tmp.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(root / MANIFEST_FILE)
+
+    @classmethod
+    def load(cls, root: Path | str) -> "SkillIndex | None":
+        root = Path(root)
+        if not (root / MANIFEST_FILE).exists():
+            return None
+        try:
+            manifest = json.loads((root / MANIFEST_FILE).read_text(encoding="utf-8"))
+            if manifest.get("version") != INDEX_VERSION:
+                return None
+            bits = np.load(root / BITS_FILE)
+            if len(bits) != len(manifest["sources"]):
+                return None
+            return cls(manifest["skills"], manifest["dictionary"], manifest["sources"], manifest["doc_hashes"], bits)
+        except (OSError, ValueError, KeyError):
+            return None
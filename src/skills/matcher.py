@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+from collections import deque
+from pathlib import Path
+
+from src.embeddings.hash_embedder import normalize_text
+
+
+DEFAULT_SKILLS_FILE = Path(__file__).resolve().parent / "default_skills.json"
+SKILLS_FILE = Path(os.getenv("SKILLS_FILE", str(DEFAULT_SKILLS_FILE)))
+
+MATCHER_VERSION = 2
+
+_SPACE_RE = re.compile(r"\s+")
+_AR_LETTER_RE = re.compile(r"[\u0600-\u06FF]")
+AR_PREFIXES = frozenset(["و", "ف", "ب", "ك", "ل", "ال", "وال", "فال", "بال", "كال", "لل", "ولل", "وبال", "وكال", "فبال"])
+
+
+def normalize_skill(text: str) -> str:
+    return _SPACE_RE.sub(" ", normalize_text(text)).strip()
+
+
+def load_dictionary(path: Path | str = SKILLS_FILE) -> dict[str, list[str]]:
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    if not isinstance(data, dict):
+        raise ValueError(f"Skills dictionary must map skill names to alias lists: {path}")
+    return {str(name): [str(a) for a in (aliases or [name])] for name, aliases in data.items()}
+
+
+def dictionary_hash(dictionary: dict[str, list[str]]) -> str:
+    spec = json.dumps(
+        [MATCHER_VERSION, sorted((normalize_skill(k), sorted(normalize_skill(a) for a in v)) for k, v in dictionary.items())]
+    )
+    return hashlib.sha1(spec.encode("utf-8")).hexdigest()
+
+
+def _is_word(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def _starts_word(t: str, start: int, arabic: bool) -> bool:
+    if start == 0 or not _is_word(t[start - 1]):
+        return True
+    if not arabic:
+        return False
+    j = start
+    while j > 0 and _is_word(t[j - 1]) and start - j < 4:
+        j -= 1
+    return (j == 0 or not _is_word(t[j - 1])) and t[j:start] in AR_PREFIXES
+
+
+class SkillMatcher:
+    def __init__(self, dictionary: dict[str, list[str]]):
+        self.skills = sorted(dictionary, key=normalize_skill)
+        self.fingerprint = dictionary_hash(dictionary)
+        self._alias: dict[str, int] = {}
+        self._goto: list[dict[str, int]] = [{}]
+        self._out: list[list[tuple[int, int, bool, bool, bool]]] = [[]]
+
+        for sid, name in enumerate(self.skills):
+            self._alias[normalize_skill(name)] = sid
+            patterns = dict.fromkeys(normalize_skill(a) for a in [name, *dictionary[name]])
+            for pattern in patterns:
+                if not pattern:
+                    continue
+                self._alias.setdefault(pattern, sid)
+                node = 0
+                for ch in pattern:
+                    nxt = self._goto[node].get(ch)
+                    if nxt is None:
+                        nxt = self._goto[node][ch] = len(self._goto)
+                        self._goto.append({})
+                        self._out.append([])
+                    node = nxt
+                arabic = bool(_AR_LETTER_RE.match(pattern))
+                self._out[node].append((sid, len(pattern), _is_word(pattern[0]), _is_word(pattern[-1]), arabic))
+
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def __len__(self) -> int:
+        return len(self.skills)
+
+    def resolve(self, term: str) -> int | None:
+        return self._alias.get(normalize_skill(term))
+
+    def find_ids(self, text: str) -> set[int]:
+        t = normalize_skill(text)
+        goto, fail, out = self._goto, self._fail, self._out
+        found: set[int] = set()
+        n = len(t)
+        node = 0
+        for i, ch in enumerate(t):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for sid, length, word_start, word_end, arabic in out[node]:
+                if sid in found:
+                    continue
+                if word_start and not _starts_word(t, i - length + 1, arabic):
+                    continue
+                if word_end and i + 1 < n and _is_word(t[i + 1]):
+                    continue
+                found.add(sid)
+        return found
+
+    def find(self, text: str) -> list[str]:
+        return [self.skills[i] for i in sorted(self.find_ids(text))]
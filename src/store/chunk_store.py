@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator
+
+
+CHUNKS_FILE = "chunks.jsonl"
+INDEX_FILE = "chunks_index.json"
+COMPACT_MIN_DEAD_BYTES = 1 << 20
+
+
+@dataclass(frozen=True)
+class Chunk:
+    source: str
+    chunk_index: int
+    start: int
+    end: int
+    content_hash: str
+    text: str
+
+    @property
+    def chunk_id(self) -> str:
+        return f"{self.source}::{self.chunk_index}"
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1((text or "").encode("utf-8", errors="ignore")).hexdigest()
+
+
+def _encode(record: dict) -> bytes:
+    return (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def _is_text(line: bytes) -> bool:
+    return line.startswith(b'{"doc":')
+
+
+def _decode(line: bytes) -> Chunk:
+    r = json.loads(line)
+    return Chunk(r["source"], int(r["chunk_index"]), int(r["start"]), int(r["end"]), r["hash"], r["text"])
+
+
+class ChunkStore:
+    def __init__(self, root: Path | str):
+        self.root = Path(root)
+        self.path = self.root / CHUNKS_FILE
+        self.index_path = self.root / INDEX_FILE
+        self.index: dict[str, dict] = {}
+        self.dead_bytes = 0
+        self._dirty = False
+        self._load_index()
+
+    def _file_size(self) -> int:
+        return self.path.stat().st_size if self.path.exists() else 0
+
+    def _load_index(self) -> None:
+        size = self._file_size()
+        if self.index_path.exists():
+            try:
+                data = json.loads(self.index_path.read_text(encoding="utf-8"))
+                if int(data.get("file_size", -1)) == size:
+                    self.index = data.get("sources", {})
+                    self.dead_bytes = int(data.get("dead_bytes", 0))
+                    return
+            except Exception:
+                pass
+        self._rebuild_index()
+
+    def _rebuild_index(self) -> None:
+        self.index = {}
+        self.dead_bytes = 0
+        if not self.path.exists():
+            return
+
+        segments: dict[str, dict] = {}
+        current = None
+        offset = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                r = json.loads(line)
+                source = r["source"]
+                if r.get("deleted"):
+                    current = None
+                    segments.pop(source, None)
+                elif (
+                    r.get("doc")
+                    or current is None
+                    or current["source"] != source
+                    or (int(r["chunk_index"]) == 0 and current["count"] > 0)
+                ):
+                    current = {"source": source, "offset": offset, "length": 0, "count": 0, "doc_hash": r.get("doc_hash", "")}
+                    segments[source] = current
+                if not r.get("deleted"):
+                    current["length"] += len(line)
+                    current["count"] += 0 if r.get("doc") else 1
+                offset += len(line)
+
+        self.index = {
+            s: {"offset": seg["offset"], "length": seg["length"], "count": seg["count"], "doc_hash": seg["doc_hash"]}
+            for s, seg in segments.items()
+        }
+        self.dead_bytes = offset - sum(e["length"] for e in self.index.values())
+        self._dirty = True
+
+    def __len__(self) -> int:
+        return sum(int(e["count"]) for e in self.index.values())
+
+    def __contains__(self, source: str) -> bool:
+        return source in self.index
+
+    def sources(self) -> list[str]:
+        return sorted(self.index, key=lambda s: s.lower())
+
+    def doc_hash(self, source: str) -> str | None:
+        entry = self.index.get(source)
+        return entry.get("doc_hash") if entry else None
+
+    def write_source(
+        self,
+        source: str,
+        spans: Iterable[tuple[int, int, str]],
+        doc_hash: str = "",
+        text: str | None = None,
+    ) -> int:
+        lines = [
+            _encode(
+                {
+                    "source": source,
+                    "chunk_index": i,
+                    "start": start,
+                    "end": end,
+                    "hash": content_hash(text),
+                    "doc_hash": doc_hash,
+                    "text": text,
+                }
+            )
+            for i, (start, end, text) in enumerate(spans)
+        ]
+        if not lines:
+            self.remove_source(source)
+            return 0
+        n_chunks = len(lines)
+        if text is not None:
+            lines.insert(0, _encode({"doc": True, "source": source, "doc_hash": doc_hash, "text": text}))
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        old = self.index.get(source)
+        with open(self.path, "ab") as f:
+            offset = f.tell()
+            f.write(b"".join(lines))
+
+        if old:
+            self.dead_bytes += int(old["length"])
+        self.index[source] = {
+            "offset": offset,
+            "length": sum(len(l) for l in lines),
+            "count": n_chunks,
+            "doc_hash": doc_hash,
+        }
+        self._dirty = True
+        return n_chunks
+
+    def remove_source(self, source: str) -> None:
+        old = self.index.pop(source, None)
+        if old is None:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        line = _encode({"source": source, "deleted": True})
+        with open(self.path, "ab") as f:
+            f.write(line)
+        self.dead_bytes += int(old["length"]) + len(line)
+        self._dirty = True
+
+    def read_text(self, source: str) -> str | None:
+        entry = self.index.get(source)
+        if entry is None or not self.path.exists():
+            return None
+        with open(self.path, "rb") as f:
+            f.seek(int(entry["offset"]))
+            line = f.readline()
+        return json.loads(line)["text"] if _is_text(line) else None
+
+    def read_source(self, source: str) -> list[Chunk]:
+        return list(self.iter_chunks([source]))
+
+    def iter_chunks(self, sources: Iterable[str] | None = None) -> Iterator[Chunk]:
+        wanted = self.index if sources is None else {s: self.index[s] for s in sources if s in self.index}
+        if not wanted or not self.path.exists():
+            return
+        with open(self.path, "rb") as f:
+            for entry in sorted(wanted.values(), key=lambda e: int(e["offset"])):
+                f.seek(int(entry["offset"]))
+                for line in f.read(int(entry["length"])).split(b"\n"):
+                    if line and not _is_text(line):
+                        yield _decode(line)
+
+    def compact(self) -> None:
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        new_index = {}
+        with open(self.path, "rb") as src, open(tmp, "wb") as dst:
+            for source in self.sources():
+                entry = self.index[source]
+                src.seek(int(entry["offset"]))
+                data = src.read(int(entry["length"]))
+                new_index[source] = dict(entry, offset=dst.tell())
+                dst.write(data)
+        tmp.replace(self.path)
+        self.index = new_index
+        self.dead_bytes = 0
+        self._dirty = True
+
+    def flush(self) -> None:
+        live = sum(int(e["length"]) for e in self.index.values())
+        if self.dead_bytes > max(live, COMPACT_MIN_DEAD_BYTES):
+            self.compact()
+        if not self._dirty and self.index_path.exists():
+            return
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        data = {"file_size": self._file_size(), "dead_bytes": self.dead_bytes, "sources": self.index}
+        tmp = self.index_path.with_suffix(self.index_path.suffix + ".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(self.index_path)
+        self._dirty = False
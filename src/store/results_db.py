@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import csv
+import json
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable
+
+
+RESULTS_DB = Path(os.getenv("RESULTS_DB", "data/outputs/results.db"))
+PAGE_SIZE = 50
+EXPORT_BATCH = 1000
+
+RANKING_COLUMNS = ["rank", "cv_source", "avg_distance_topN", "score", "duplicate_of"]
+EXPLANATION_COLUMNS = [
+    "cv_source",
+    "cv_name",
+    "score",
+    "status",
+    "error",
+    "took_sec",
+    "generated_at",
+    "ranking_run",
+    "llm_analysis",
+    "duplicate_of",
+    "ttft_sec",
+    "tokens_per_sec",
+    "prompt_key",
+    "prompt_tokens",
+    "prompt_eval_sec",
+]
+
+UPSERT_EXPLANATION = (
+    f"INSERT OR REPLACE INTO explanations (jd_hash, {', '.join(EXPLANATION_COLUMNS)}) "
+    f"VALUES ({', '.join(['?'] * (len(EXPLANATION_COLUMNS) + 1))})"
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    jd_id TEXT NOT NULL,
+    jd_hash TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    mode TEXT,
+    top_k INTEGER,
+    n_ranked INTEGER,
+    changes TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_jd ON runs (jd_id, created_at);
+
+CREATE TABLE IF NOT EXISTS rankings (
+    run_id TEXT NOT NULL,
+    cv_source TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    avg_distance_topN REAL,
+    score REAL,
+    duplicate_of TEXT,
+    PRIMARY KEY (run_id, cv_source)
+);
+CREATE INDEX IF NOT EXISTS rankings_rank ON rankings (run_id, rank);
+
+CREATE TABLE IF NOT EXISTS explanations (
+    jd_hash TEXT NOT NULL,
+    cv_source TEXT NOT NULL,
+    cv_name TEXT,
+    score REAL,
+    status TEXT,
+    error TEXT,
+    took_sec REAL,
+    generated_at TEXT,
+    ranking_run TEXT,
+    llm_analysis TEXT,
+    duplicate_of TEXT,
+    ttft_sec REAL,
+    tokens_per_sec REAL,
+    prompt_key TEXT,
+    prompt_tokens INTEGER,
+    prompt_eval_sec REAL,
+    PRIMARY KEY (jd_hash, cv_source)
+);
+"""
+
+
+class ResultsDB:
+    def __init__(self, path: Path | str = RESULTS_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "ResultsDB":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def save_run(
+        self,
+        run_id: str,
+        jd_id: str,
+        jd_hash: str,
+        rows: Iterable[dict],
+        mode: str = "",
+        top_k: int = 0,
+        n_ranked: int = 0,
+        changes: dict | None = None,
+    ) -> None:
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO runs (run_id, jd_id, jd_hash, created_at, mode, top_k, n_ranked, changes) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    run_id,
+                    jd_id,
+                    jd_hash,
+                    datetime.now().isoformat(timespec="microseconds"),
+                    mode,
+                    top_k,
+                    n_ranked,
+                    json.dumps(changes or {}, ensure_ascii=False),
+                ),
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO rankings (run_id, cv_source, rank, avg_distance_topN, score, duplicate_of) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (run_id, r["cv_source"], r["rank"], r["avg_distance_topN"], r["score"], r.get("duplicate_of"))
+                    for r in rows
+                ),
+            )
+
+    @staticmethod
+    def _run(row) -> dict | None:
+        if row is None:
+            return None
+        run = dict(row)
+        run["changes"] = json.loads(run.get("changes") or "{}")
+        return run
+
+    def run(self, run_id: str) -> dict | None:
+        return self._run(self.conn.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone())
+
+    def latest_run(self, jd_id: str | None = None) -> dict | None:
+        if jd_id is None:
+            row = self.conn.execute("SELECT * FROM runs ORDER BY created_at DESC LIMIT 1").fetchone()
+        else:
+            row = self.conn.execute(
+                "SELECT * FROM runs WHERE jd_id = ? ORDER BY created_at DESC LIMIT 1", (jd_id,)
+            ).fetchone()
+        return self._run(row)
+
+    def ranking_count(self, run_id: str) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM rankings WHERE run_id = ?", (run_id,)).fetchone()[0]
+
+    def ranking_page(self, run_id: str, offset: int = 0, limit: int = PAGE_SIZE) -> list[dict]:
+        rows = self.conn.execute(
+            "SELECT rank, cv_source, avg_distance_topN, score, duplicate_of FROM rankings "
+            "WHERE run_id = ? ORDER BY rank LIMIT ? OFFSET ?",
+            (run_id, int(limit), int(offset)),
+        )
+        return [dict(r) for r in rows]
+
+    def iter_ranking(self, run_id: str):
+        cur = self.conn.execute(
+            "SELECT rank, cv_source, avg_distance_topN, score, duplicate_of FROM rankings "
+            "WHERE run_id = ? ORDER BY rank",
+            (run_id,),
+        )
+        while True:
+            rows = cur.fetchmany(EXPORT_BATCH)
+            if not rows:
+                return
+            for r in rows:
+                yield dict(r)
+
+    def upsert_explanation(self, jd_hash: str, item: dict) -> None:
+        with self.conn:
+            self.conn.execute(UPSERT_EXPLANATION, (jd_hash, *(item.get(c) for c in EXPLANATION_COLUMNS)))
+
+    def delete_explanations(self, jd_hash: str, sources: Iterable[str], keep_run: str | None = None) -> int:
+        with self.conn:
+            cur = self.conn.executemany(
+                "DELETE FROM explanations WHERE jd_hash = ? AND cv_source = ? AND ranking_run IS NOT ?",
+                ((jd_hash, s, keep_run) for s in sources),
+            )
+        return cur.rowcount
+
+    def explanations(self, jd_hash: str, sources: Iterable[str] | None = None) -> dict[str, dict]:
+        cols = ", ".join(EXPLANATION_COLUMNS)
+        if sources is None:
+            rows = self.conn.execute(f"SELECT {cols} FROM explanations WHERE jd_hash = ?", (jd_hash,)).fetchall()
+        else:
+            sources = list(sources)
+            rows = []
+            for i in range(0, len(sources), 500):
+                part = sources[i : i + 500]
+                rows.extend(
+                    self.conn.execute(
+                        f"SELECT {cols} FROM explanations WHERE jd_hash = ? AND cv_source IN ({', '.join('?' for _ in part)})",
+                        (jd_hash, *part),
+                    ).fetchall()
+                )
+        return {r["cv_source"]: dict(r) for r in rows}
+
+    def explanation_count(self, jd_hash: str) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM explanations WHERE jd_hash = ?", (jd_hash,)).fetchone()[0]
+
+    def write_ranking_csv(self, run_id: str, f) -> None:
+        writer = csv.writer(f)
+        writer.writerow(RANKING_COLUMNS)
+        for r in self.iter_ranking(run_id):
+            writer.writerow([r[c] for c in RANKING_COLUMNS])
+
+    def ranking_json(self, run_id: str) -> str:
+        return json.dumps(list(self.iter_ranking(run_id)), ensure_ascii=False, indent=2)
+
+    def explanations_json(self, jd_hash: str) -> str:
+        items = sorted(self.explanations(jd_hash).values(), key=lambda x: -(x.get("score") or 0.0))
+        return json.dumps(items, ensure_ascii=False, indent=2)
@@ -1,7 +1,9 @@
+import os
+
 APP_NAME = "SIRA CV"
 TAGLINE = "Automatic Resume Screening using LLM"
 LOGO_PATH = "assets/logo.png"
 
-OLLAMA_BASE_URL = "http://localhost:11434"
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 OLLAMA_MODEL = "llama3.2:3b"
 OLLAMA_TIMEOUT_SEC = 120
\ No newline at end of file
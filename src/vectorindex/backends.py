@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import sys
+import types
+from pathlib import Path
+
+from src.lexical.bm25 import BM25Index, ensure_index
+from src.store.chunk_store import ChunkStore
+from src.vectorindex.flat_index import FlatIndex
+
+
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+FLAT_PRECISION = os.getenv("FLAT_PRECISION", "float32")
+FLAT_RESCORE = int(os.getenv("FLAT_RESCORE", "0"))
+PERSIST_DIR = "data/vectorstore"
+CHUNKS_DIR = "data/outputs/chunks"
+COLLECTION_NAME = "resume_chunks"
+
+
+def chroma_client():
+    os.environ["ANONYMIZED_TELEMETRY"] = "False"
+    os.environ["CHROMA_TELEMETRY"] = "False"
+    os.environ["POSTHOG_DISABLED"] = "1"
+
+    logging.getLogger("chromadb").setLevel(logging.CRITICAL)
+    logging.getLogger("posthog").setLevel(logging.CRITICAL)
+
+    dummy = types.ModuleType("posthog")
+    dummy.capture = lambda *args, **kwargs: None
+    dummy.identify = lambda *args, **kwargs: None
+    dummy.flush = lambda *args, **kwargs: None
+    sys.modules["posthog"] = dummy
+
+    import chromadb
+    from chromadb.config import Settings
+
+    return chromadb.Client(
+        Settings(
+            persist_directory=PERSIST_DIR,
+            is_persistent=True,
+            anonymized_telemetry=False,
+        )
+    )
+
+
+def flat_dir() -> Path:
+    return Path(PERSIST_DIR) / f"flat_{COLLECTION_NAME}"
+
+
+def lexical_dir() -> Path:
+    return Path(PERSIST_DIR) / f"bm25_{COLLECTION_NAME}"
+
+
+def open_lexical() -> BM25Index:
+    store = ChunkStore(CHUNKS_DIR)
+    if not len(store):
+        raise FileNotFoundError(f"Chunk store is empty in {CHUNKS_DIR}. Run src/02_preprocessing/chunk_text.py first.")
+    index, rebuilt = ensure_index(store, lexical_dir())
+    if rebuilt:
+        print(f"Lexical index built: {len(index)} chunks, {len(index.terms)} terms")
+    return index
+
+
+def open_index(fingerprint: str | None = None, create: bool = False, reset: bool = False, backend: str | None = None):
+    backend = (backend or VECTOR_BACKEND).strip().lower()
+
+    if backend == "flat":
+        root = flat_dir()
+        if reset and root.exists():
+            shutil.rmtree(root)
+        return FlatIndex.open(
+            root,
+            create=create or reset,
+            metadata={"embedder": fingerprint},
+            precision=FLAT_PRECISION,
+            keep_float32=FLAT_RESCORE > 0,
+            rescore=FLAT_RESCORE,
+            documents=ChunkStore(CHUNKS_DIR),
+        )
+
+    if backend != "chroma":
+        raise ValueError(f"Unknown VECTOR_BACKEND: {backend} (expected 'chroma' or 'flat')")
+
+    client = chroma_client()
+    metadata = {"hnsw:space": "cosine", "embedder": fingerprint}
+    if reset:
+        try:
+            client.delete_collection(COLLECTION_NAME)
+        except Exception:
+            pass
+        return client.create_collection(COLLECTION_NAME, metadata=metadata)
+
+    try:
+        return client.get_collection(COLLECTION_NAME)
+    except Exception:
+        if not create:
+            raise
+        return client.create_collection(COLLECTION_NAME, metadata=metadata)
+
+
+def storage_matches(index) -> bool:
+    if not isinstance(index, FlatIndex):
+        return True
+    return index.precision == FLAT_PRECISION and (index.precision == "float32" or index.keep_float32 == (FLAT_RESCORE > 0))
+
+
+def as_embeddings(index, vectors):
+    return vectors if isinstance(index, FlatIndex) else vectors.tolist()
+
+
+def persist_index(index) -> None:
+    if isinstance(index, FlatIndex):
+        index.persist()
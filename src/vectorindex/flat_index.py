@@ -0,0 +1,558 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.f32"
+F16_FILE = "vectors.f16"
+I8_FILE = "vectors.i8"
+SCALES_FILE = "scales.f32"
+IDS_FILE = "ids.bin"
+ID_ENDS_FILE = "id_ends.i64"
+SOURCE_IDX_FILE = "source_idx.i32"
+CHUNK_INDEX_FILE = "chunk_index.i32"
+HASHES_FILE = "content_hash.s40"
+HASH_DTYPE = "S40"
+COPY_BLOCK = 65536
+SCAN_BLOCK = 65536
+DECODE_BLOCK = 4096
+
+PRECISIONS = ("float32", "float16", "int8")
+
+
+def _normalize_rows(vecs: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vecs / norms
+
+
+def _read_array(path: Path, dtype, n: int) -> tuple[np.ndarray, bool]:
+    arr = np.fromfile(path, dtype=dtype) if path.exists() else np.zeros(0, dtype=dtype)
+    if len(arr) < n:
+        raise ValueError(f"Flat index file {path} is incomplete; rebuild it.")
+    return arr[:n].copy(), len(arr) != n
+
+
+def _write_array(path: Path, arr: np.ndarray, append: bool = False) -> None:
+    if append:
+        with open(path, "ab") as f:
+            f.write(np.ascontiguousarray(arr).tobytes())
+        return
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_bytes(np.ascontiguousarray(arr).tobytes())
+    tmp.replace(path)
+
+
+def quantize_int8(vecs: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    scale = np.abs(vecs).max(axis=1) / 127.0
+    scale[scale == 0] = 1.0
+    q = np.clip(np.round(vecs / scale[:, None]), -127, 127).astype(np.int8)
+    return q, scale.astype(np.float32)
+
+
+class _Column:
+    def __init__(self, path: Path, dtype, width: int):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.width = width
+        self.n_disk = 0
+        self._mm = None
+        self._pending: list[np.ndarray] = []
+        self._pending_cat = None
+
+    def _shape(self, n: int) -> tuple:
+        return (n, self.width) if self.width else (n,)
+
+    def _row_bytes(self) -> int:
+        return self.dtype.itemsize * max(1, self.width)
+
+    def load(self, n: int) -> bool:
+        size = self.path.stat().st_size if self.path.exists() else 0
+        if size < n * self._row_bytes():
+            raise ValueError(f"Flat index file {self.path} is incomplete; rebuild it.")
+        self.n_disk = n
+        self._mm = np.memmap(self.path, dtype=self.dtype, mode="r", shape=self._shape(n)) if n else None
+        return size != n * self._row_bytes()
+
+    def extend(self, arr: np.ndarray) -> None:
+        self._pending.append(np.ascontiguousarray(arr, dtype=self.dtype))
+        self._pending_cat = None
+
+    def _pending_arr(self) -> np.ndarray:
+        if self._pending_cat is None:
+            if not self._pending:
+                self._pending_cat = np.zeros(self._shape(0), dtype=self.dtype)
+            elif len(self._pending) == 1:
+                self._pending_cat = self._pending[0]
+            else:
+                self._pending_cat = np.concatenate(self._pending)
+        return self._pending_cat
+
+    def slice(self, start: int, stop: int) -> np.ndarray:
+        if self._mm is not None and stop <= self.n_disk:
+            return self._mm[start:stop]
+        if start >= self.n_disk:
+            return self._pending_arr()[start - self.n_disk : stop - self.n_disk]
+        return np.concatenate([self._mm[start:], self._pending_arr()[: stop - self.n_disk]])
+
+    def take(self, rows) -> np.ndarray:
+        rows = np.asarray(rows, dtype=np.int64)
+        out = np.empty(self._shape(len(rows)), dtype=self.dtype)
+        disk = rows < self.n_disk
+        if disk.any():
+            out[disk] = self._mm[rows[disk]]
+        if not disk.all():
+            out[~disk] = self._pending_arr()[rows[~disk] - self.n_disk]
+        return out
+
+    def persist(self, keep: np.ndarray | None) -> None:
+        if keep is not None:
+            self.rewrite(self.take(keep[i : i + COPY_BLOCK]) for i in range(0, len(keep), COPY_BLOCK))
+            return
+
+        with open(self.path, "ab") as f:
+            for block in self._pending:
+                f.write(block.tobytes())
+        self._reopen(self.n_disk + len(self._pending_arr()))
+
+    def rewrite(self, blocks) -> None:
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        n = 0
+        with open(tmp, "wb") as f:
+            for block in blocks:
+                block = np.ascontiguousarray(block, dtype=self.dtype)
+                f.write(block.tobytes())
+                n += len(block)
+        self._mm = None
+        tmp.replace(self.path)
+        self._reopen(n)
+
+    def _reopen(self, n: int) -> None:
+        self._pending, self._pending_cat = [], None
+        self.n_disk = n
+        self._mm = np.memmap(self.path, dtype=self.dtype, mode="r", shape=self._shape(n)) if n else None
+
+
+class FlatIndex:
+    def __init__(
+        self,
+        root: Path | str,
+        metadata: dict | None = None,
+        dim: int | None = None,
+        precision: str = "float32",
+        keep_float32: bool = False,
+        rescore: int = 0,
+        documents=None,
+    ):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unsupported precision: {precision} (expected one of {', '.join(PRECISIONS)})")
+
+        self.root = Path(root)
+        self.metadata = dict(metadata or {})
+        self.dim = dim
+        self.precision = precision
+        self.keep_float32 = precision == "float32" or bool(keep_float32)
+        self.rescore = max(0, int(rescore))
+        self.documents = documents
+
+        self.sources: list[str] = []
+        self.source_idx = np.zeros(0, dtype=np.int32)
+        self.chunk_index = np.zeros(0, dtype=np.int32)
+        self.alive = np.zeros(0, dtype=bool)
+        self._id_ends = np.zeros(0, dtype=np.int64)
+        self._source_pos: dict[str, int] = {}
+        self._pos: dict[str, int] | None = {}
+
+        self._ids = _Column(self.root / IDS_FILE, np.uint8, 0)
+        self._hashes = _Column(self.root / HASHES_FILE, HASH_DTYPE, 0)
+        self._cols: dict[str, _Column] = {}
+        self._n_disk = 0
+        self._rewrite = False
+        if dim:
+            self._init_columns()
+
+    @classmethod
+    def open(
+        cls,
+        root: Path | str,
+        create: bool = False,
+        metadata: dict | None = None,
+        precision: str = "float32",
+        keep_float32: bool = False,
+        rescore: int = 0,
+        documents=None,
+    ) -> "FlatIndex":
+        root = Path(root)
+        manifest = root / MANIFEST_FILE
+        if not manifest.exists():
+            if not create:
+                raise FileNotFoundError(f"Flat index not found: {root}")
+            index = cls(
+                root,
+                metadata=metadata,
+                precision=precision,
+                keep_float32=keep_float32,
+                rescore=rescore,
+                documents=documents,
+            )
+            index.persist()
+            return index
+
+        data = json.loads(manifest.read_text(encoding="utf-8"))
+        index = cls(
+            root,
+            metadata=data.get("metadata"),
+            dim=data.get("dim"),
+            precision=data.get("precision", "float32"),
+            keep_float32=data.get("keep_float32", True),
+            rescore=rescore,
+            documents=documents,
+        )
+        index._load(int(data.get("count", 0)), data.get("sources", []))
+        return index
+
+    def _init_columns(self) -> None:
+        cols = {}
+        if self.keep_float32:
+            cols["f32"] = _Column(self.root / VECTORS_FILE, np.float32, self.dim)
+        if self.precision == "float16":
+            cols["f16"] = _Column(self.root / F16_FILE, np.float16, self.dim)
+        if self.precision == "int8":
+            cols["i8"] = _Column(self.root / I8_FILE, np.int8, self.dim)
+            cols["scale"] = _Column(self.root / SCALES_FILE, np.float32, 0)
+        self._cols = cols
+
+    def _load(self, count: int, sources: list[str]) -> None:
+        self.sources = [str(s) for s in sources]
+        self._source_pos = {s: i for i, s in enumerate(self.sources)}
+        self.source_idx, extra_src = _read_array(self.root / SOURCE_IDX_FILE, np.int32, count)
+        self.chunk_index, extra_chk = _read_array(self.root / CHUNK_INDEX_FILE, np.int32, count)
+        self._id_ends, extra_ids = _read_array(self.root / ID_ENDS_FILE, np.int64, count)
+        self.alive = np.ones(count, dtype=bool)
+        self._pos = None
+        self._n_disk = count
+        self._rewrite = extra_src or extra_chk or extra_ids
+
+        if self._ids.load(int(self._id_ends[-1]) if count else 0):
+            self._rewrite = True
+        for col in [self._hashes, *self._cols.values()]:
+            if col.load(count):
+                self._rewrite = True
+
+    def _extend_meta(self, ids, metadatas) -> None:
+        n = len(self.alive)
+        src = np.empty(len(ids), dtype=np.int32)
+        chk = np.empty(len(ids), dtype=np.int32)
+        hashes, encoded = [], []
+        for i, (doc_id, meta) in enumerate(zip(ids, metadatas)):
+            meta = meta or {}
+            source = str(meta.get("source", ""))
+            pos = self._source_pos.get(source)
+            if pos is None:
+                pos = self._source_pos[source] = len(self.sources)
+                self.sources.append(source)
+            src[i] = pos
+            chk[i] = int(meta.get("chunk_index", -1))
+            hashes.append(str(meta.get("content_hash", "")).encode("ascii", errors="ignore"))
+            encoded.append(str(doc_id).encode("utf-8"))
+            if self._pos is not None:
+                self._pos[str(doc_id)] = n + i
+
+        total = int(self._id_ends[-1]) if n else 0
+        ends = total + np.cumsum([len(e) for e in encoded], dtype=np.int64)
+        self._ids.extend(np.frombuffer(b"".join(encoded), dtype=np.uint8))
+        self._hashes.extend(np.asarray(hashes, dtype=HASH_DTYPE))
+        self._id_ends = np.concatenate([self._id_ends, ends])
+        self.source_idx = np.concatenate([self.source_idx, src])
+        self.chunk_index = np.concatenate([self.chunk_index, chk])
+        self.alive = np.concatenate([self.alive, np.ones(len(src), dtype=bool)])
+
+    def _id_bytes(self, rows: np.ndarray) -> list[bytes]:
+        if not len(rows):
+            return []
+        ends = self._id_ends[rows]
+        starts = np.where(rows > 0, self._id_ends[np.maximum(rows - 1, 0)], 0)
+        lo, hi = int(starts.min()), int(ends.max())
+        if hi - lo > 64 * len(rows):
+            return [self._ids.slice(s, e).tobytes() for s, e in zip(starts.tolist(), ends.tolist())]
+        data = self._ids.slice(lo, hi).tobytes()
+        return [data[s - lo : e - lo] for s, e in zip(starts.tolist(), ends.tolist())]
+
+    def _id_list(self, rows) -> list[str]:
+        return [b.decode("utf-8") for b in self._id_bytes(np.asarray(rows, dtype=np.int64))]
+
+    def _positions(self) -> dict[str, int]:
+        if self._pos is None:
+            rows = np.flatnonzero(self.alive)
+            self._pos = dict(zip(self._id_list(rows), rows.tolist()))
+        return self._pos
+
+    def count(self) -> int:
+        return int(self.alive.sum())
+
+    def nbytes(self) -> dict[str, int]:
+        return {col.path.name: col.path.stat().st_size for col in self._cols.values() if col.path.exists()}
+
+    def _block_scores(self, q: np.ndarray, start: int, stop: int, sel: np.ndarray | None = None) -> np.ndarray:
+        def block(name: str) -> np.ndarray:
+            arr = self._cols[name].slice(start, stop)
+            return arr if sel is None else arr[sel]
+
+        if self.precision == "float16":
+            return q @ block("f16").astype(np.float32).T
+        if self.precision == "int8":
+            return (q @ block("i8").astype(np.float32).T) * block("scale")
+        return q @ block("f32").T
+
+    def vectors(self, rows, exact: bool = True) -> np.ndarray:
+        if not len(rows):
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        if self.precision == "float32" or (exact and self.keep_float32):
+            return self._cols["f32"].take(rows)
+        if self.precision == "float16":
+            return self._cols["f16"].take(rows).astype(np.float32)
+        return self._cols["i8"].take(rows).astype(np.float32) * self._cols["scale"].take(rows)[:, None]
+
+    def _mask(self, where: dict | None) -> np.ndarray:
+        mask = self.alive.copy()
+        for key, value in (where or {}).items():
+            if key == "source" and isinstance(value, dict):
+                pos = [self._source_pos[str(v)] for v in value.get("$in", []) if str(v) in self._source_pos]
+                mask &= np.isin(self.source_idx, np.asarray(pos, dtype=np.int32))
+            elif key == "source":
+                pos = self._source_pos.get(str(value), -1)
+                mask &= self.source_idx == pos
+            elif key == "chunk_index":
+                mask &= self.chunk_index == int(value)
+            elif key == "content_hash":
+                mask &= self._hashes.slice(0, len(mask)) == str(value).encode("ascii", errors="ignore")
+            else:
+                raise ValueError(f"Unsupported flat index filter: {key} (expected source, chunk_index or content_hash)")
+        return mask
+
+    def add(self, ids, embeddings, metadatas=None, documents=None) -> None:
+        self.upsert(ids=ids, embeddings=embeddings, metadatas=metadatas, documents=documents)
+
+    def upsert(self, ids, embeddings, metadatas=None, documents=None) -> None:
+        vecs = np.asarray(embeddings, dtype=np.float32)
+        if vecs.ndim != 2 or len(vecs) != len(ids):
+            raise ValueError("embeddings must be a 2-D array with one row per id")
+        if self.dim is None:
+            self.dim = int(vecs.shape[1])
+            self._init_columns()
+        elif vecs.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {vecs.shape[1]} does not match index dimension {self.dim}")
+
+        self.delete(ids=ids)
+        self._extend_meta(ids, metadatas or [{} for _ in ids])
+
+        vecs = _normalize_rows(vecs)
+        if "f32" in self._cols:
+            self._cols["f32"].extend(vecs)
+        if "f16" in self._cols:
+            self._cols["f16"].extend(vecs.astype(np.float16))
+        if "i8" in self._cols:
+            q, scale = quantize_int8(vecs)
+            self._cols["i8"].extend(q)
+            self._cols["scale"].extend(scale)
+
+    def delete(self, ids=None, where: dict | None = None) -> None:
+        pos = self._positions()
+        rows = [pos.pop(doc_id) for doc_id in (ids or []) if doc_id in pos]
+        if where:
+            hit = np.flatnonzero(self._mask(where))
+            for doc_id in self._id_list(hit):
+                pos.pop(doc_id, None)
+            rows.extend(hit.tolist())
+        if rows:
+            self.alive[rows] = False
+            self._rewrite = True
+
+    def get(self, ids=None, where: dict | None = None, include=("metadatas", "documents"), limit=None, offset=0) -> dict:
+        if ids is not None:
+            pos = self._positions()
+            rows = [pos[i] for i in ids if i in pos]
+        else:
+            rows = np.flatnonzero(self._mask(where))
+        rows = rows[offset : (offset + limit) if limit else None]
+        return self._rows_result(rows, include)
+
+    def _metadatas(self, rows: np.ndarray) -> list[dict]:
+        return [
+            {"source": self.sources[s], "chunk_index": c, "content_hash": h.decode("ascii")}
+            for s, c, h in zip(
+                self.source_idx[rows].tolist(),
+                self.chunk_index[rows].tolist(),
+                self._hashes.take(rows).tolist(),
+            )
+        ]
+
+    def _documents(self, metas: list[dict]) -> list[str | None]:
+        if self.documents is None:
+            return [None] * len(metas)
+        chunks = {}
+        for source in {m["source"] for m in metas}:
+            for ch in self.documents.read_source(source):
+                chunks[(source, ch.chunk_index)] = ch
+        out = []
+        for m in metas:
+            ch = chunks.get((m["source"], m["chunk_index"]))
+            fresh = ch is not None and (not m["content_hash"] or ch.content_hash == m["content_hash"])
+            out.append(ch.text if fresh else None)
+        return out
+
+    def _rows_result(self, rows, include) -> dict:
+        rows = np.asarray(rows, dtype=np.int64)
+        out = {"ids": self._id_list(rows)}
+        metas = self._metadatas(rows) if "metadatas" in include or "documents" in include else []
+        if "metadatas" in include:
+            out["metadatas"] = metas
+        if "documents" in include:
+            out["documents"] = self._documents(metas)
+        if "embeddings" in include:
+            out["embeddings"] = self.vectors(rows)
+        return out
+
+    def _scores(self, q: np.ndarray, rows: np.ndarray | None) -> np.ndarray:
+        if rows is not None:
+            return q @ self.vectors(rows, exact=False).T
+        scores = np.empty((len(q), len(self.alive)), dtype=np.float32)
+        for start, stop in self._blocks():
+            scores[:, start:stop] = self._block_scores(q, start, stop)
+        return scores
+
+    def _blocks(self):
+        n = len(self.alive)
+        step = SCAN_BLOCK if self.precision == "float32" else DECODE_BLOCK
+        for start in range(0, n, step):
+            yield start, min(start + step, n)
+
+    def iter_similarities(self, query_embeddings, where: dict | None = None):
+        q = _normalize_rows(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        mask = self._mask(where)
+        for start, stop in self._blocks():
+            sel = np.flatnonzero(mask[start:stop])
+            if not len(sel):
+                continue
+            if len(sel) == stop - start:
+                yield sel + start, self._block_scores(q, start, stop)
+            else:
+                yield sel + start, self._block_scores(q, start, stop, sel)
+
+    def pair_similarities(self, query_embeddings, rows, query_idx) -> np.ndarray:
+        q = _normalize_rows(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        rows, query_idx = np.asarray(rows), np.asarray(query_idx)
+        out = np.empty(len(rows), dtype=np.float32)
+        for i in range(0, len(rows), DECODE_BLOCK):
+            vecs = self.vectors(rows[i : i + DECODE_BLOCK])
+            out[i : i + DECODE_BLOCK] = np.einsum("ij,ij->i", vecs, q[query_idx[i : i + DECODE_BLOCK]])
+        return out
+
+    def similarities(self, query_embedding, rows=None, exact: bool = False) -> np.ndarray:
+        if exact and rows is not None:
+            return self.pair_similarities(query_embedding, rows, np.zeros(len(rows), dtype=np.int64))
+        q = _normalize_rows(np.atleast_2d(np.asarray(query_embedding, dtype=np.float32)))[:1]
+        return self._scores(q, None if rows is None else np.asarray(rows))[0]
+
+    def query(
+        self,
+        query_embeddings,
+        n_results: int = 10,
+        where: dict | None = None,
+        include=("metadatas", "documents", "distances"),
+    ) -> dict:
+        q = _normalize_rows(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        out = {"ids": [], "distances": [], "metadatas": [], "documents": []}
+
+        mask = self._mask(where)
+        n_candidates = int(mask.sum())
+        if not n_candidates or n_results <= 0:
+            return {key: [[] for _ in range(len(q))] for key in out}
+
+        rows = None
+        if n_candidates * 4 < len(mask):
+            rows = np.flatnonzero(mask)
+            scores = self._scores(q, rows)
+        else:
+            scores = self._scores(q, None)
+            if n_candidates < len(mask):
+                scores[:, ~mask] = -np.inf
+
+        k = min(int(n_results), n_candidates)
+        rescore = self.precision != "float32" and self.keep_float32 and self.rescore > 0
+        m = min(k * self.rescore, n_candidates) if rescore else k
+
+        for qi, row in enumerate(scores):
+            local = np.argpartition(-row, m - 1)[:m]
+            sims = row[local]
+            top = local if rows is None else rows[local]
+            if rescore:
+                sims = self._cols["f32"].take(top) @ q[qi]
+            order = np.argsort(-sims, kind="stable")[:k]
+            top, sims = top[order], sims[order]
+
+            res = self._rows_result(top.tolist(), include)
+            out["ids"].append(res["ids"])
+            out["distances"].append((1.0 - sims).tolist())
+            out["metadatas"].append(res.get("metadatas", []))
+            out["documents"].append(res.get("documents", []))
+        return out
+
+    def persist(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        n = len(self.alive)
+
+        if self._rewrite:
+            keep = np.flatnonzero(self.alive)
+            for col in [self._hashes, *self._cols.values()]:
+                col.persist(keep)
+
+            starts = np.where(keep > 0, self._id_ends[np.maximum(keep - 1, 0)], 0)
+            ends = np.cumsum(self._id_ends[keep] - starts, dtype=np.int64)
+            self._ids.rewrite(
+                np.frombuffer(b"".join(self._id_bytes(keep[i : i + COPY_BLOCK])), dtype=np.uint8)
+                for i in range(0, len(keep), COPY_BLOCK)
+            )
+
+            used, remap = np.unique(self.source_idx[keep], return_inverse=True)
+            self.sources = [self.sources[i] for i in used.tolist()]
+            self._source_pos = {s: i for i, s in enumerate(self.sources)}
+            self.source_idx = remap.reshape(-1).astype(np.int32)
+            self.chunk_index = self.chunk_index[keep]
+            self._id_ends = ends
+            self.alive = np.ones(len(keep), dtype=bool)
+            self._pos = None
+            for name, arr in self._meta_arrays():
+                _write_array(self.root / name, arr)
+
+        elif n > self._n_disk:
+            for col in [self._ids, self._hashes, *self._cols.values()]:
+                col.persist(None)
+            for name, arr in self._meta_arrays():
+                _write_array(self.root / name, arr[self._n_disk :], append=True)
+
+        self._rewrite = False
+        self._n_disk = len(self.alive)
+
+        manifest = {
+            "dim": self.dim,
+            "count": self._n_disk,
+            "precision": self.precision,
+            "keep_float32": self.keep_float32,
+            "metadata": self.metadata,
+            "sources": self.sources,
+        }
+        tmp = self.root / (MANIFEST_FILE + ".tmp")
+        tmp.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(self.root / MANIFEST_FILE)
+
+    def _meta_arrays(self) -> list[tuple[str, np.ndarray]]:
+        return [
+            (SOURCE_IDX_FILE, self.source_idx),
+            (CHUNK_INDEX_FILE, self.chunk_index),
+            (ID_ENDS_FILE, self._id_ends),
+        ]
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from src.embeddings.backends import HashEmbedder, SentenceTransformerEmbedder, quantize
+from src.embeddings.hash_embedder import hash_embed_batch
+
+
+class StubModel:
+    """Offline stand-in for SentenceTransformer: the vector encodes the text length."""
+
+    def __init__(self, dim: int = 8):
+        self.dim = dim
+        self.batches: list[list[str]] = []
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, texts, batch_size, convert_to_numpy, normalize_embeddings, show_progress_bar):
+        self.batches.append(list(texts))
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, t in enumerate(texts):
+            out[i, 0] = float(len(t))
+            out[i, 1 + len(t) % (self.dim - 1)] = 1.0
+        out /= np.linalg.norm(out, axis=1, keepdims=True)
+        return out
+
+
+def _stub_embedder(tmp_path, name="model-a", dim=8, precision="float32", batch_size=2):
+    model_dir = tmp_path / name
+    model_dir.mkdir(exist_ok=True)
+    (model_dir / "config.json").write_text(f'{{"name": "{name}"}}', encoding="utf-8")
+    return SentenceTransformerEmbedder(
+        model_path=model_dir, batch_size=batch_size, precision=precision, model=StubModel(dim)
+    )
+
+
+def test_length_sorted_batches_keep_input_order(tmp_path):
+    emb = _stub_embedder(tmp_path)
+    texts = ["bb", "a", "dddd", "", "ccc", "eeeee"]
+
+    out = emb.embed(texts)
+
+    expected = emb.model.encode(texts, len(texts), True, True, False)
+    np.testing.assert_allclose(out, expected, rtol=1e-6)
+    assert [len(t) for b in emb.model.batches[:3] for t in b] == [5, 4, 3, 2, 1, 0]
+
+
+def test_quantize_dtypes_and_tolerance():
+    rng = np.random.default_rng(0)
+    vecs = rng.standard_normal((16, 32)).astype(np.float32)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+
+    f16 = quantize(vecs, "float16")
+    assert f16.dtype == np.float16
+    np.testing.assert_allclose(f16.astype(np.float32), vecs, atol=1e-3)
+
+    i8 = quantize(vecs, "int8")
+    assert i8.dtype == np.int8
+    scale = np.abs(vecs).max(axis=1, keepdims=True) / 127.0
+    np.testing.assert_allclose(i8.astype(np.float32) * scale, vecs, atol=scale.max() / 2 + 1e-6)
+
+    with pytest.raises(ValueError):
+        quantize(vecs, "int4")
+
+
+def test_embed_applies_precision(tmp_path):
+    assert _stub_embedder(tmp_path, precision="float16").embed(["x", "yy"]).dtype == np.float16
+    assert _stub_embedder(tmp_path, precision="int8").embed(["x", "yy"]).dtype == np.int8
+
+
+def test_fingerprint_tracks_model_dim_and_precision(tmp_path):
+    base = _stub_embedder(tmp_path).fingerprint()
+
+    assert _stub_embedder(tmp_path).fingerprint() == base
+    assert _stub_embedder(tmp_path, name="model-b").fingerprint() != base
+    assert _stub_embedder(tmp_path, dim=16).fingerprint() != base
+    assert _stub_embedder(tmp_path, precision="float16").fingerprint() != base
+    assert _stub_embedder(tmp_path, precision="int8").fingerprint() != base
+
+
+def test_hash_embedder_matches_hash_embed_batch():
+    texts = ["Python developer with SQL", "مهندس بيانات", "", "python PYTHON python"]
+    out = HashEmbedder().embed(texts)
+
+    assert out.dtype == np.float32
+    assert out.tobytes() == hash_embed_batch(texts).tobytes()
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import numpy as np
+
+from src.embeddings.cache import EmbeddingCache
+
+
+def test_lowering_max_entries_compacts_cache(tmp_path):
+    vecs = np.arange(2000 * 4, dtype=np.float32).reshape(2000, 4)
+    hashes = [f"h{i}" for i in range(len(vecs))]
+
+    cache = EmbeddingCache("fp", 4, root=tmp_path, max_entries=4096)
+    cache.store(hashes, vecs)
+    cache.lookup(hashes[:100])
+    cache.flush()
+    assert cache.capacity == 2000
+
+    small = EmbeddingCache("fp", 4, root=tmp_path, max_entries=300)
+    assert small.capacity == 300
+    assert len(small) == 300
+    assert small.vec_path.stat().st_size == 300 * 4 * 4
+
+    out, found = small.lookup(hashes)
+    kept = np.flatnonzero(found)
+    assert set(kept[:100].tolist()) == set(range(100))
+    np.testing.assert_array_equal(out[kept], vecs[kept])
+
+    reopened = EmbeddingCache("fp", 4, root=tmp_path, max_entries=300)
+    out2, found2 = reopened.lookup(hashes)
+    np.testing.assert_array_equal(found2, found)
+    np.testing.assert_array_equal(out2[kept], vecs[kept])
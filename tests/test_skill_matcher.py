@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from src.skills.matcher import SkillMatcher, load_dictionary, normalize_skill
+
+
+def test_every_resolvable_name_is_matched():
+    dictionary = load_dictionary()
+    matcher = SkillMatcher(dictionary)
+
+    for name, aliases in dictionary.items():
+        for term in [name, *aliases]:
+            if not normalize_skill(term):
+                continue
+            sid = matcher.resolve(term)
+            assert sid is not None, term
+            assert matcher.skills[sid] in matcher.find(f"worked with {term} daily"), term
+
+
+def test_canonical_name_without_own_alias_matches():
+    matcher = SkillMatcher({"go": ["golang"], "sap": ["sap", "sap fico"]})
+
+    assert matcher.resolve("Go") is not None
+    assert matcher.find("SAP FICO consultant, Go developer") == ["go", "sap"]
+    assert matcher.find("Google Cloud") == []